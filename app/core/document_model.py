@@ -0,0 +1,258 @@
+"""
+Canonical typed model for parsed documents.
+
+The LLM parser returns free-form JSON whose key names vary between documents
+(total vs grand_total vs summary.amount_due, vendor_name vs store_info.name, ...).
+CanonicalDocument resolves all of those alternatives once, right after parsing,
+and is stored next to the raw output under CANONICAL_KEY. Downstream consumers
+call CanonicalDocument.from_document() and read fixed fields; documents saved
+before the canonical form existed are normalized on the fly.
+"""
+
+import re
+from dataclasses import dataclass, field, asdict
+from typing import Any, ClassVar, Dict, List, Optional
+
+CANONICAL_KEY = "canonical"
+
+_NUMBER_RE = re.compile(r"[^0-9.\-]")
+
+
+def to_float(value: Any) -> Optional[float]:
+    """Parses numbers such as 12, "12.50", "$1,234.00"; returns None when not numeric."""
+    if value is None or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        cleaned = _NUMBER_RE.sub("", value)
+        if cleaned in ("", "-", ".", "-."):
+            return None
+        try:
+            return float(cleaned)
+        except ValueError:
+            return None
+    return None
+
+
+def _nested(data: Dict[str, Any], parent: str, key: str) -> Any:
+    parent_obj = data.get(parent)
+    return parent_obj.get(key) if isinstance(parent_obj, dict) else None
+
+
+def _name(value: Any) -> Optional[str]:
+    """Accepts either a plain string or an object with a "name" field."""
+    if isinstance(value, dict):
+        value = value.get("name") or value.get("company_name")
+    if isinstance(value, str) and value.strip():
+        return value.strip()
+    return None
+
+
+def _first(*values: Any) -> Any:
+    for value in values:
+        if value not in (None, "", [], {}):
+            return value
+    return None
+
+
+@dataclass(slots=True)
+class CanonicalLineItem:
+    description: str = ""
+    quantity: float = 1.0
+    price: Optional[float] = None
+    total: Optional[float] = None
+
+    @classmethod
+    def from_raw(cls, item: Any) -> "CanonicalLineItem":
+        if not isinstance(item, dict):
+            return cls(description=str(item))
+        quantity = to_float(_first(item.get("quantity"), item.get("qty")))
+        quantity = 1.0 if quantity is None else quantity
+        price = to_float(_first(item.get("price"), item.get("unit_price"), item.get("rate")))
+        total = to_float(_first(item.get("total"), item.get("amount"), item.get("line_total")))
+        if total is None and price is not None:
+            total = price * quantity
+        description = _first(
+            item.get("description"), item.get("item"), item.get("name"), item.get("item_description")
+        )
+        return cls(str(description or ""), quantity, price, total)
+
+
+@dataclass(slots=True)
+class CanonicalTransaction:
+    date: Optional[str] = None
+    description: str = ""
+    debit: float = 0.0
+    credit: float = 0.0
+
+    @classmethod
+    def from_raw(cls, tx: Any, default_date: Optional[str] = None) -> "CanonicalTransaction":
+        if not isinstance(tx, dict):
+            return cls(date=default_date, description=str(tx))
+        return cls(
+            date=tx.get("date") or default_date,
+            description=str(tx.get("description") or ""),
+            debit=to_float(tx.get("debit")) or 0.0,
+            credit=to_float(tx.get("credit")) or 0.0,
+        )
+
+
+@dataclass(slots=True)
+class CanonicalDocument:
+    """Fixed-field view of a parsed document."""
+
+    SCHEMA_VERSION: ClassVar[int] = 2
+
+    ITEM_KEYS: ClassVar[tuple] = ("line_items", "items", "products", "entries")
+    ITEM_PARENTS: ClassVar[tuple] = ("invoice_details", "receipt_details", "extracted_data", "details", "data")
+
+    document_type: str = "other"
+    total_amount: Optional[float] = None
+    total_text: Optional[str] = None        # total exactly as the parser wrote it (for display)
+    date: Optional[str] = None
+    vendor_name: Optional[str] = None       # issuer / seller
+    customer_name: Optional[str] = None     # receiver / buyer
+    vendor_names: List[str] = field(default_factory=list)     # every issuer candidate, vendor_name first
+    customer_names: List[str] = field(default_factory=list)   # every receiver candidate, customer_name first
+    account_number: Optional[str] = None
+    currency: Optional[str] = None
+    line_items: List[CanonicalLineItem] = field(default_factory=list)
+    transactions: List[CanonicalTransaction] = field(default_factory=list)
+
+    # ------------------------------------------------------------------ #
+    #  Construction
+    # ------------------------------------------------------------------ #
+    @classmethod
+    def from_document(cls, doc: Dict[str, Any]) -> "CanonicalDocument":
+        """Uses the stored canonical form when present, otherwise normalizes the raw dict."""
+        stored = doc.get(CANONICAL_KEY) if isinstance(doc, dict) else None
+        if isinstance(stored, dict) and stored.get("schema_version") == cls.SCHEMA_VERSION:
+            return cls.from_dict(stored)
+        return cls.from_raw(doc or {})
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "CanonicalDocument":
+        """Fast path: rebuilds from a dict produced by to_dict()."""
+        return cls(
+            document_type=data.get("document_type") or "other",
+            total_amount=data.get("total_amount"),
+            total_text=data.get("total_text"),
+            date=data.get("date"),
+            vendor_name=data.get("vendor_name"),
+            customer_name=data.get("customer_name"),
+            vendor_names=list(data.get("vendor_names") or []),
+            customer_names=list(data.get("customer_names") or []),
+            account_number=data.get("account_number"),
+            currency=data.get("currency"),
+            line_items=[CanonicalLineItem(**i) for i in data.get("line_items") or []],
+            transactions=[CanonicalTransaction(**t) for t in data.get("transactions") or []],
+        )
+
+    @classmethod
+    def from_raw(cls, raw: Dict[str, Any]) -> "CanonicalDocument":
+        """Resolves every known alternative key name for each field."""
+        date = _first(
+            raw.get("date"),
+            _nested(raw, "transaction_info", "date"),
+            _nested(raw, "invoice_details", "date"),
+            _nested(raw, "invoice_details", "invoice_date"),
+            raw.get("invoice_date"),
+        )
+        account_number = raw.get("account_number")
+        total = cls._raw_total(raw)
+        vendors = cls._raw_vendors(raw)
+        customers = cls._raw_customers(raw)
+
+        return cls(
+            document_type=str(raw.get("document_type") or "other").strip().lower(),
+            total_amount=to_float(total),
+            total_text=str(total) if total is not None else None,
+            date=str(date) if date is not None else None,
+            vendor_name=vendors[0] if vendors else None,
+            customer_name=customers[0] if customers else None,
+            vendor_names=vendors,
+            customer_names=customers,
+            account_number=str(account_number) if account_number not in (None, "") else None,
+            currency=raw.get("currency") or None,
+            line_items=[CanonicalLineItem.from_raw(i) for i in cls._raw_items(raw)],
+            transactions=[
+                CanonicalTransaction.from_raw(t, date) for t in (raw.get("transactions") or [])
+            ] if isinstance(raw.get("transactions"), list) else [],
+        )
+
+    @staticmethod
+    def _raw_total(raw: Dict[str, Any]) -> Any:
+        payment_info = raw.get("payment_info")
+        payment_amount = (
+            payment_info[0].get("amount")
+            if isinstance(payment_info, list) and payment_info and isinstance(payment_info[0], dict)
+            else None
+        )
+        return _first(
+            raw.get("total_amount"),
+            _nested(raw, "summary", "total_amount"),
+            _nested(raw, "summary", "amount_due"),
+            _nested(raw, "summary", "grand_total"),
+            _nested(raw, "summary", "total"),
+            _nested(raw, "totals", "total_amount"),
+            _nested(raw, "totals", "grand_total"),
+            _nested(raw, "totals", "total"),
+            payment_amount,
+            _nested(raw, "invoice_details", "total_amount"),
+            _nested(raw, "invoice_details", "grand_total"),
+            raw.get("amount_due"),
+            raw.get("grand_total"),
+            raw.get("total"),
+            raw.get("amount"),
+        )
+
+    @staticmethod
+    def _names(values: List[Any]) -> List[str]:
+        """Distinct names in priority order."""
+        names: List[str] = []
+        for value in values:
+            name = _name(value)
+            if name and name not in names:
+                names.append(name)
+        return names
+
+    @classmethod
+    def _raw_vendors(cls, raw: Dict[str, Any]) -> List[str]:
+        keys = ("vendor_name", "store_name", "merchant_name", "issuer_name", "seller_name",
+                "supplier_name", "business_name", "company_name", "from_company", "store_info", "supplier_info",
+                "vendor_info", "vendor")
+        return cls._names([raw.get(key) for key in keys] + [
+            _nested(raw, "invoice_details", "vendor_name"),
+            _nested(raw, "invoice_details", "from"),
+            _nested(raw, "invoice_details", "issued_by"),
+        ])
+
+    @classmethod
+    def _raw_customers(cls, raw: Dict[str, Any]) -> List[str]:
+        keys = ("customer_name", "receiver_name", "client_name", "buyer_name", "to_company",
+                "customer_info", "bill_to")
+        return cls._names([raw.get(key) for key in keys])
+
+    @classmethod
+    def _raw_items(cls, raw: Dict[str, Any]) -> List[Any]:
+        for key in cls.ITEM_KEYS:
+            items = raw.get(key)
+            if isinstance(items, list) and items:
+                return items
+        for parent in cls.ITEM_PARENTS:
+            nested = raw.get(parent)
+            if isinstance(nested, dict):
+                for key in cls.ITEM_KEYS:
+                    items = nested.get(key)
+                    if isinstance(items, list) and items:
+                        return items
+        return []
+
+    # ------------------------------------------------------------------ #
+    #  Serialization
+    # ------------------------------------------------------------------ #
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["schema_version"] = self.SCHEMA_VERSION
+        return data
@@ -0,0 +1,73 @@
+"""
+In-process metrics primitives.
+Counters and fixed-bucket histograms that components own and report through
+their own get_state()/snapshot() methods (served by the admin routes).
+Values are per worker process.
+"""
+
+from bisect import bisect_left
+from typing import Any, Dict, Optional, Sequence
+
+# Seconds; covers queue waits and LLM/embedding call latencies
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class Counter:
+    """Monotonic counter."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram (Prometheus-style upper bounds).
+    Percentiles are estimated as the upper bound of the bucket that holds them.
+    """
+
+    __slots__ = ("bounds", "counts", "count", "sum", "max")
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)   # last slot is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.count:
+            return None
+        rank = pct / 100.0 * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 4) if self.count else None,
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "max": round(self.max, 4) if self.count else None,
+            "buckets": {
+                (str(bound) if i < len(self.bounds) else "+Inf"): n
+                for i, (bound, n) in enumerate(zip(self.bounds + (None,), self.counts))
+                if n
+            },
+        }
@@ -0,0 +1,318 @@
+"""
+Pluggable embedding backends.
+Selected with EMBEDDING_BACKEND:
+    remote   – EmbeddingGemma server over HTTP (default)
+    hashing  – in-process feature hashing with numpy; no model, no network
+    local    – in-process sentence-transformers model on CPU
+               (requires the sentence-transformers package)
+Vectors from different backends are not comparable; reindex after switching.
+"""
+
+import os
+import asyncio
+import base64
+import time
+import logging
+import re
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.core.exceptions import ConfigurationError
+from app.infrastructure.embeddings.embedding_metrics import CallTiming, server_time_from_headers
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "remote").lower()
+EMBEDDING_SERVER_URL = os.getenv("EMBEDDING_SERVER_URL", "http://localhost:8000")
+# 768-d by default so it fills the default EMBEDDING_DIMENSION
+EMBEDDING_LOCAL_MODEL = os.getenv("EMBEDDING_LOCAL_MODEL", "sentence-transformers/all-mpnet-base-v2")
+
+# Connection pool for the embedding server (shared by all requests in a worker)
+EMBEDDING_MAX_CONNECTIONS = int(os.getenv("EMBEDDING_MAX_CONNECTIONS", "20"))
+EMBEDDING_MAX_KEEPALIVE = int(os.getenv("EMBEDDING_MAX_KEEPALIVE", "10"))
+EMBEDDING_KEEPALIVE_EXPIRY = float(os.getenv("EMBEDDING_KEEPALIVE_EXPIRY", "30"))
+EMBEDDING_TIMEOUT = float(os.getenv("EMBEDDING_TIMEOUT", "60"))
+EMBEDDING_CONNECT_TIMEOUT = float(os.getenv("EMBEDDING_CONNECT_TIMEOUT", "5"))
+# HTTP/2 is negotiated over TLS (https URLs) and needs the optional 'h2' package
+EMBEDDING_HTTP2 = os.getenv("EMBEDDING_HTTP2", "true").lower() == "true"
+# Vector encoding requested from the server: json (float lists), base64 or binary
+# (little-endian float32). Responses are decoded by shape, so a server that
+# ignores the request and answers with JSON lists still works.
+EMBEDDING_TRANSPORT = os.getenv("EMBEDDING_TRANSPORT", "binary").lower()
+
+try:
+    import h2  # noqa: F401
+    _HTTP2_AVAILABLE = True
+except ImportError:
+    _HTTP2_AVAILABLE = False
+
+
+class EmbeddingBackend(ABC):
+    """
+    Turns a list of texts into an (n, dimension) float32 matrix.
+    HTTP backends fill the optional `timing` with round-trip, server and payload figures.
+    """
+
+    name = "base"
+
+    def __init__(self, dimension: int):
+        self.dimension = dimension
+
+    @property
+    def cache_namespace(self) -> Optional[str]:
+        """
+        Identifies the vector space, so caches and vector tables never mix vectors
+        from different models. None while the model is not known yet.
+        """
+        return self.name
+
+    @abstractmethod
+    def embed(self, texts: List[str], embedding_type: str = "document", timing: Optional[CallTiming] = None) -> np.ndarray:
+        """(len(texts), dimension) float32 matrix."""
+
+    async def embed_async(
+        self, texts: List[str], embedding_type: str = "document", timing: Optional[CallTiming] = None
+    ) -> np.ndarray:
+        """Default: run the synchronous embed in the executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.embed, texts, embedding_type, timing)
+
+    def health(self) -> Dict[str, Any]:
+        """Readiness of the backend; in-process backends are always ready."""
+        return {"healthy": True, "model_loaded": True, "model_name": self.name}
+
+    async def health_async(self) -> Dict[str, Any]:
+        return self.health()
+
+    async def aclose(self) -> None:
+        pass
+
+
+class RemoteEmbeddingBackend(EmbeddingBackend):
+    """EmbeddingGemma server (POST /embed, GET /health) through pooled keep-alive clients."""
+
+    name = "remote"
+
+    def __init__(self, dimension: int, server_url: str = EMBEDDING_SERVER_URL):
+        super().__init__(dimension)
+        import httpx
+
+        self._httpx = httpx
+        self.server_url = server_url.rstrip("/")
+        # The async client is created on first use inside the event loop
+        self._client = httpx.Client(**self._client_options())
+        self._async_client = None
+        # Reported by the server's /health; identifies the vector space
+        self.model_name: Optional[str] = None
+
+    def _client_options(self) -> dict:
+        """Pool limits, timeouts and protocol settings shared by the sync and async clients."""
+        httpx = self._httpx
+        return {
+            "timeout": httpx.Timeout(EMBEDDING_TIMEOUT, connect=EMBEDDING_CONNECT_TIMEOUT),
+            "limits": httpx.Limits(
+                max_connections=EMBEDDING_MAX_CONNECTIONS,
+                max_keepalive_connections=EMBEDDING_MAX_KEEPALIVE,
+                keepalive_expiry=EMBEDDING_KEEPALIVE_EXPIRY,
+            ),
+            "http2": EMBEDDING_HTTP2 and _HTTP2_AVAILABLE,
+        }
+
+    def _get_async_client(self):
+        if self._async_client is None or self._async_client.is_closed:
+            self._async_client = self._httpx.AsyncClient(**self._client_options())
+        return self._async_client
+
+    def _payload(self, texts: List[str], embedding_type: str) -> dict:
+        payload = {
+            "text": texts,
+            "normalize": True,
+            "dimension": self.dimension,
+            "embedding_type": embedding_type,
+        }
+        if EMBEDDING_TRANSPORT != "json":
+            payload["encoding"] = EMBEDDING_TRANSPORT
+        return payload
+
+    @staticmethod
+    def _record(timing: Optional[CallTiming], resp, started: float):
+        if timing is None:
+            return
+        timing.http_s = time.perf_counter() - started
+        timing.server_s = server_time_from_headers(resp.headers)
+        timing.request_bytes = len(resp.request.content)
+        timing.response_bytes = len(resp.content)
+
+    def _decode(self, resp) -> np.ndarray:
+        """
+        Embedding matrix from any supported response:
+            application/octet-stream  – raw little-endian float32 rows
+            {"embeddings_b64": "..."} – the whole matrix, base64
+            {"embeddings": ["...", ...]} – one base64 vector per text
+            {"embeddings": [[...], ...]} – JSON float lists
+        Binary forms are read with np.frombuffer (read-only, no per-float parsing).
+        """
+        resp.raise_for_status()
+        if resp.headers.get("content-type", "").startswith("application/octet-stream"):
+            return np.frombuffer(resp.content, dtype="<f4").reshape(-1, self.dimension)
+
+        data = resp.json()
+        if "embeddings_b64" in data:
+            return np.frombuffer(base64.b64decode(data["embeddings_b64"]), dtype="<f4").reshape(-1, self.dimension)
+        embeddings = data["embeddings"]
+        if embeddings and isinstance(embeddings[0], str):
+            raw = b"".join(base64.b64decode(vector) for vector in embeddings)
+            return np.frombuffer(raw, dtype="<f4").reshape(len(embeddings), -1)
+        return np.array(embeddings, dtype=np.float32)
+
+    def embed(self, texts: List[str], embedding_type: str = "document", timing: Optional[CallTiming] = None) -> np.ndarray:
+        started = time.perf_counter()
+        resp = self._client.post(f"{self.server_url}/embed", json=self._payload(texts, embedding_type))
+        self._record(timing, resp, started)
+        return self._decode(resp)
+
+    async def embed_async(
+        self, texts: List[str], embedding_type: str = "document", timing: Optional[CallTiming] = None
+    ) -> np.ndarray:
+        started = time.perf_counter()
+        resp = await self._get_async_client().post(
+            f"{self.server_url}/embed", json=self._payload(texts, embedding_type)
+        )
+        self._record(timing, resp, started)
+        return self._decode(resp)
+
+    @property
+    def cache_namespace(self) -> Optional[str]:
+        return f"remote:{self.model_name}" if self.model_name else None
+
+    def _health(self, resp) -> Dict[str, Any]:
+        resp.raise_for_status()
+        health = resp.json()
+        self.model_name = health.get("model_name") or self.model_name
+        return {"healthy": True, **health}
+
+    def health(self) -> Dict[str, Any]:
+        return self._health(self._client.get(f"{self.server_url}/health", timeout=15.0))
+
+    async def health_async(self) -> Dict[str, Any]:
+        return self._health(await self._get_async_client().get(f"{self.server_url}/health"))
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        self._client.close()
+
+
+_TOKEN = re.compile(r"\w+")
+
+
+class HashingEmbeddingBackend(EmbeddingBackend):
+    """
+    Signed feature hashing of word unigrams/bigrams and character trigrams,
+    L2-normalised. Lexical similarity only, but deterministic, dependency-free
+    and sub-millisecond, so the stack keeps working with no model server.
+    """
+
+    name = "hashing"
+
+    def _features(self, text: str) -> List[str]:
+        words = _TOKEN.findall(text.lower())
+        features = list(words)
+        features += [f"{a} {b}" for a, b in zip(words, words[1:])]
+        for word in words:
+            padded = f"#{word}#"
+            features += [f"#3{padded[i:i + 3]}" for i in range(len(padded) - 2)]
+        return features
+
+    def _vector(self, text: str) -> np.ndarray:
+        # crc32 is stable across processes, unlike hash()
+        digests = np.array([zlib.crc32(f.encode("utf-8")) for f in self._features(text)], dtype=np.int64)
+        signs = np.where(digests & 0x80000000, 1.0, -1.0).astype(np.float32)
+        vector = np.bincount(digests % self.dimension, weights=signs, minlength=self.dimension).astype(np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def embed(self, texts: List[str], embedding_type: str = "document", timing: Optional[CallTiming] = None) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dimension), dtype=np.float32)
+        return np.stack([self._vector(text) for text in texts])
+
+    async def embed_async(
+        self, texts: List[str], embedding_type: str = "document", timing: Optional[CallTiming] = None
+    ) -> np.ndarray:
+        # Cheap enough for request-sized batches; offload large ones
+        if len(texts) <= 64:
+            return self.embed(texts, embedding_type)
+        return await super().embed_async(texts, embedding_type, timing)
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    """
+    CPU sentence-transformers model loaded in-process. Models with named
+    prompts (e.g. EmbeddingGemma's "query"/"document") get the matching one;
+    output longer than `dimension` is truncated and re-normalised, and a model
+    with fewer dimensions is rejected.
+    """
+
+    name = "local"
+
+    def __init__(self, dimension: int, model_name: str = EMBEDDING_LOCAL_MODEL):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ConfigurationError(
+                "EMBEDDING_BACKEND=local requires the 'sentence-transformers' package",
+                config_key="EMBEDDING_BACKEND",
+            ) from e
+
+        self.model_name = model_name
+        self._model = SentenceTransformer(model_name, device="cpu")
+        native = self._model.get_sentence_embedding_dimension()
+        if native < dimension:
+            # Vectors of another size would not fit the vector table or the index
+            raise ConfigurationError(
+                f"{model_name} produces {native}-dim vectors but EMBEDDING_DIMENSION is {dimension}; "
+                f"pick a model with at least {dimension} dimensions or lower EMBEDDING_DIMENSION",
+                config_key="EMBEDDING_LOCAL_MODEL",
+            )
+        super().__init__(dimension)
+        logger.info(f"Loaded local embedding model {model_name} (dim={dimension})")
+
+    def embed(self, texts: List[str], embedding_type: str = "document", timing: Optional[CallTiming] = None) -> np.ndarray:
+        prompts = getattr(self._model, "prompts", None) or {}
+        vectors = self._model.encode(
+            texts,
+            prompt_name=embedding_type if embedding_type in prompts else None,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+        ).astype(np.float32)
+        if vectors.shape[1] > self.dimension:
+            vectors = vectors[:, :self.dimension]
+            vectors /= np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        return vectors
+
+    @property
+    def cache_namespace(self) -> str:
+        return f"local:{self.model_name}"
+
+    def health(self) -> Dict[str, Any]:
+        return {"healthy": True, "model_loaded": True, "model_name": self.model_name}
+
+
+def create_embedding_backend(dimension: int, name: Optional[str] = None) -> EmbeddingBackend:
+    """Backend for `name` (default EMBEDDING_BACKEND)."""
+    name = (name or EMBEDDING_BACKEND).lower()
+    if name == "remote":
+        return RemoteEmbeddingBackend(dimension)
+    if name == "hashing":
+        return HashingEmbeddingBackend(dimension)
+    if name == "local":
+        return SentenceTransformerBackend(dimension)
+    raise ConfigurationError(
+        f"Unsupported EMBEDDING_BACKEND: '{name}'. Use 'remote', 'hashing' or 'local'.",
+        config_key="EMBEDDING_BACKEND",
+    )
@@ -0,0 +1,371 @@
+"""
+Two-tier embedding cache.
+Vectors are keyed by a hash of (backend, embedding_type, dimension, text):
+    memory – per-process LRU of recent vectors
+    disk   – fixed-size memory-mapped float32 matrix shared by every worker on
+             the host, with a SQLite index (key -> row slot, last use) for
+             lookup and least-recently-used eviction
+Repeated summaries on reindex and common chat queries are served without a
+call to the embedding server.
+"""
+
+import os
+import queue
+import asyncio
+import hashlib
+import sqlite3
+import tempfile
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from app.core.metrics import Counter
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_MEMORY_ITEMS = int(os.getenv("EMBEDDING_CACHE_MEMORY_ITEMS", "10000"))
+# 0 disables the disk tier
+EMBEDDING_CACHE_DISK_ITEMS = int(os.getenv("EMBEDDING_CACHE_DISK_ITEMS", "50000"))
+EMBEDDING_CACHE_DIR = os.getenv(
+    "EMBEDDING_CACHE_DIR", os.path.join(tempfile.gettempdir(), "ocr_rag_embedding_cache")
+)
+# Disk writes waiting for the writer thread; further writes are dropped (memory tier still has them)
+EMBEDDING_CACHE_WRITE_QUEUE = int(os.getenv("EMBEDDING_CACHE_WRITE_QUEUE", "10000"))
+
+_WRITE_BATCH = 256
+_WRITER_IDLE_S = 1.0
+
+
+def cache_key(text: str, dimension: int, embedding_type: str, namespace: str = "") -> str:
+    """`namespace` separates vectors from different backends/models."""
+    return hashlib.sha256(f"{namespace}\x00{embedding_type}\x00{dimension}\x00{text}".encode("utf-8")).hexdigest()
+
+
+class _DiskVectorStore:
+    """
+    Memory-mapped vector rows plus a SQLite index. Blocking; called from the
+    cache's writer thread and executor, never from the event loop.
+    A row is published (ready=1) only after its vector is written, and readers
+    re-check the mapping after copying the row, so a slot being recycled by
+    another process is never returned under the wrong key.
+    """
+
+    def __init__(self, directory: str, dimension: int, capacity: int):
+        os.makedirs(directory, exist_ok=True)
+        self.dimension = dimension
+        self.capacity = capacity
+        self._lock = threading.Lock()
+
+        vectors_path = os.path.join(directory, f"embeddings_{dimension}.f32")
+        self._conn = sqlite3.connect(
+            os.path.join(directory, f"embeddings_{dimension}.db"),
+            timeout=5.0, isolation_level=None, check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, slot INTEGER NOT NULL, last_used REAL NOT NULL, ready INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_last_used ON entries (last_used)")
+
+        size = capacity * dimension * 4
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            if not os.path.exists(vectors_path) or os.path.getsize(vectors_path) != size:
+                # New file or a different capacity: start over
+                np.memmap(vectors_path, dtype=np.float32, mode="w+", shape=(capacity, dimension)).flush()
+                self._conn.execute("DELETE FROM entries")
+            self._conn.execute("COMMIT")
+        except Exception:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(capacity, dimension))
+
+    def _slot(self, key: str) -> Optional[int]:
+        row = self._conn.execute("SELECT slot FROM entries WHERE key = ? AND ready = 1", (key,)).fetchone()
+        return row[0] if row else None
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        """Read-only lookup; last use is recorded separately through touch()."""
+        with self._lock:
+            slot = self._slot(key)
+            if slot is None:
+                return None
+            vector = np.array(self._vectors[slot])
+            if self._slot(key) != slot:
+                return None
+            return vector
+
+    def touch(self, used: Dict[str, float]):
+        """Records last use for many keys in one transaction."""
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                cur.executemany("UPDATE entries SET last_used = ? WHERE key = ?", [(t, k) for k, t in used.items()])
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+    def put_many(self, items: List[Tuple[str, np.ndarray]]) -> int:
+        """Stores vectors in one transaction; returns how many older entries were evicted."""
+        items = items[-self.capacity:]
+        with self._lock:
+            cur = self._conn.cursor()
+            placed: List[Tuple[str, int, np.ndarray]] = []
+            evicted = 0
+            now = time.time()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                count = cur.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+                for key, vector in items:
+                    if cur.execute("SELECT 1 FROM entries WHERE key = ?", (key,)).fetchone():
+                        continue
+                    if count < self.capacity:
+                        slot = count
+                        count += 1
+                    else:
+                        old_key, slot = cur.execute(
+                            "SELECT key, slot FROM entries ORDER BY last_used LIMIT 1"
+                        ).fetchone()
+                        cur.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                        evicted += 1
+                    cur.execute(
+                        "INSERT INTO entries (key, slot, last_used, ready) VALUES (?, ?, ?, 0)", (key, slot, now)
+                    )
+                    placed.append((key, slot, vector))
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+            if not placed:
+                return evicted
+            # No msync: the mapping is shared, so other workers see the rows through
+            # the page cache, and losing unsynced rows in a host crash only costs misses
+            for _, slot, vector in placed:
+                self._vectors[slot] = vector
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                cur.executemany("UPDATE entries SET ready = 1 WHERE key = ?", [(key,) for key, _, _ in placed])
+                cur.execute("COMMIT")
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+            return evicted
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM entries WHERE ready = 1").fetchone()[0]
+
+
+class EmbeddingCache:
+    """
+    Memory LRU in front of the optional disk store, with hit/miss counters.
+    Disk reads block on SQLite, so async callers use the *_async lookups, which
+    run them in the default executor. Disk writes and last-use updates never
+    block the caller: a background thread applies them in batches.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        memory_items: int = EMBEDDING_CACHE_MEMORY_ITEMS,
+        disk_items: int = EMBEDDING_CACHE_DISK_ITEMS,
+        directory: str = EMBEDDING_CACHE_DIR,
+        namespace: Union[str, Callable[[], Optional[str]]] = "",
+    ):
+        """
+        `namespace` may be a callable evaluated on every lookup, so it follows a
+        backend whose model is only learned at run time; while it returns None
+        nothing is cached.
+        """
+        self.dimension = dimension
+        self.namespace = namespace
+        self.memory_items = memory_items
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()  # the sync batch API may run in worker threads
+
+        self._memory_hits = Counter()
+        self._disk_hits = Counter()
+        self._misses = Counter()
+        self._memory_evictions = Counter()
+        self._disk_evictions = Counter()
+        self._disk_writes_dropped = Counter()
+
+        self._disk: Optional[_DiskVectorStore] = None
+        if disk_items > 0:
+            try:
+                self._disk = _DiskVectorStore(directory, dimension, disk_items)
+                logger.info(f"Embedding disk cache at {directory} ({disk_items} vectors of dim {dimension})")
+            except Exception as e:
+                logger.warning(f"Embedding disk cache unavailable, using memory only: {e}")
+
+        self._writes: "queue.Queue" = queue.Queue(maxsize=EMBEDDING_CACHE_WRITE_QUEUE)
+        self._used: Dict[str, float] = {}
+        if self._disk is not None:
+            threading.Thread(target=self._write_loop, name="embedding-cache-writer", daemon=True).start()
+
+    def _namespace(self) -> Optional[str]:
+        return self.namespace() if callable(self.namespace) else self.namespace
+
+    def _memory_lookup(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        rows: List[Optional[np.ndarray]] = []
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self._memory_hits.inc()
+                rows.append(vector)
+        return rows
+
+    def _disk_lookup(self, keys: List[str]) -> List[Optional[np.ndarray]]:
+        """Blocking SQLite reads; async callers run this in an executor."""
+        vectors: List[Optional[np.ndarray]] = []
+        for key in keys:
+            try:
+                vectors.append(self._disk.get(key))
+            except Exception as e:
+                logger.warning(f"Embedding disk cache read failed: {e}")
+                vectors.append(None)
+        return vectors
+
+    def _merge_disk(
+        self, keys: List[str], rows: List[Optional[np.ndarray]], missing: List[int], found: List[Optional[np.ndarray]]
+    ):
+        now = time.time()
+        for i, vector in zip(missing, found):
+            if vector is None:
+                continue
+            rows[i] = vector
+            self._disk_hits.inc()
+            self._remember(keys[i], vector)
+            with self._lock:
+                self._used[keys[i]] = now
+
+    def get_many(self, texts: List[str], embedding_type: str) -> List[Optional[np.ndarray]]:
+        """Cached vectors in order, None where missing. Blocks on the disk tier."""
+        namespace = self._namespace()
+        if namespace is None:
+            self._misses.inc(len(texts))
+            return [None] * len(texts)
+        keys = [cache_key(text, self.dimension, embedding_type, namespace) for text in texts]
+        rows = self._memory_lookup(keys)
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing and self._disk is not None:
+            self._merge_disk(keys, rows, missing, self._disk_lookup([keys[i] for i in missing]))
+        self._misses.inc(sum(row is None for row in rows))
+        return rows
+
+    async def get_many_async(self, texts: List[str], embedding_type: str) -> List[Optional[np.ndarray]]:
+        """Same as get_many; memory hits are served inline, disk reads off the event loop."""
+        namespace = self._namespace()
+        if namespace is None:
+            self._misses.inc(len(texts))
+            return [None] * len(texts)
+        keys = [cache_key(text, self.dimension, embedding_type, namespace) for text in texts]
+        rows = self._memory_lookup(keys)
+        missing = [i for i, row in enumerate(rows) if row is None]
+        if missing and self._disk is not None:
+            found = await asyncio.get_running_loop().run_in_executor(
+                None, self._disk_lookup, [keys[i] for i in missing]
+            )
+            self._merge_disk(keys, rows, missing, found)
+        self._misses.inc(sum(row is None for row in rows))
+        return rows
+
+    def get(self, text: str, embedding_type: str) -> Optional[np.ndarray]:
+        return self.get_many([text], embedding_type)[0]
+
+    async def get_async(self, text: str, embedding_type: str) -> Optional[np.ndarray]:
+        return (await self.get_many_async([text], embedding_type))[0]
+
+    def put(self, text: str, embedding_type: str, vector: np.ndarray) -> None:
+        """Stores in memory now; the disk write is queued for the writer thread."""
+        namespace = self._namespace()
+        if vector is None or len(vector) != self.dimension or namespace is None:
+            return
+        key = cache_key(text, self.dimension, embedding_type, namespace)
+        vector = np.asarray(vector, dtype=np.float32)
+        self._remember(key, vector)
+        if self._disk is not None:
+            try:
+                self._writes.put_nowait((key, vector))
+            except queue.Full:
+                self._disk_writes_dropped.inc()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until queued disk writes and last-use updates are applied."""
+        if self._disk is None:
+            return True
+        done = threading.Event()
+        self._writes.put(done)
+        return done.wait(timeout)
+
+    def _write_loop(self):
+        while True:
+            try:
+                item = self._writes.get(timeout=_WRITER_IDLE_S)
+            except queue.Empty:
+                item = None
+            batch: List[Tuple[str, np.ndarray]] = []
+            waiters: List[threading.Event] = []
+            while item is not None:
+                if isinstance(item, threading.Event):
+                    waiters.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= _WRITE_BATCH:
+                    break
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    item = None
+
+            if batch:
+                try:
+                    self._disk_evictions.inc(self._disk.put_many(batch))
+                except Exception as e:
+                    logger.warning(f"Embedding disk cache write failed: {e}")
+            with self._lock:
+                used, self._used = self._used, {}
+            if used:
+                try:
+                    self._disk.touch(used)
+                except Exception as e:
+                    logger.warning(f"Embedding disk cache last-use update failed: {e}")
+            for waiter in waiters:
+                waiter.set()
+
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._memory[key] = vector
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+                self._memory_evictions.inc()
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self._memory_hits.value + self._disk_hits.value
+        lookups = hits + self._misses.value
+        return {
+            "memory_items": len(self._memory),
+            "memory_capacity": self.memory_items,
+            "disk_items": len(self._disk) if self._disk is not None else None,
+            "disk_capacity": self._disk.capacity if self._disk is not None else None,
+            "disk_write_backlog": self._writes.qsize() if self._disk is not None else None,
+            "memory_hits": int(self._memory_hits.value),
+            "disk_hits": int(self._disk_hits.value),
+            "misses": int(self._misses.value),
+            "hit_rate": round(hits / lookups, 4) if lookups else None,
+            "memory_evictions": int(self._memory_evictions.value),
+            "disk_evictions": int(self._disk_evictions.value),
+            "disk_writes_dropped": int(self._disk_writes_dropped.value),
+        }
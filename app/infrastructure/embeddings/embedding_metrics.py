@@ -0,0 +1,148 @@
+"""
+Embedding call instrumentation.
+Each backend call is timed and split into:
+    queue   – time the texts waited in the micro-batcher (window + batch slots)
+    network – HTTP round trip minus the server's own processing time
+    server  – processing time the server reports (x-process-time or Server-Timing)
+Batch sizes, payload sizes and failures by kind are tracked too. Calls slower
+than EMBEDDING_SLOW_CALL_MS are logged with the split.
+"""
+
+import os
+import re
+import logging
+from dataclasses import dataclass
+from typing import Any, Dict, Mapping, Optional
+
+from app.core.metrics import Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_SLOW_CALL_MS = float(os.getenv("EMBEDDING_SLOW_CALL_MS", "2000"))
+
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)
+PAYLOAD_BYTES_BUCKETS = (1_024, 4_096, 16_384, 65_536, 262_144, 1_048_576, 4_194_304, 16_777_216)
+
+_SERVER_TIMING_DUR = re.compile(r"dur=([\d.]+)")
+
+
+def server_time_from_headers(headers: Mapping[str, str]) -> Optional[float]:
+    """Server processing seconds from `x-process-time` (seconds) or `Server-Timing: ...;dur=<ms>`."""
+    value = headers.get("x-process-time")
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            pass
+    timing = headers.get("server-timing")
+    if timing:
+        durations = [float(ms) for ms in _SERVER_TIMING_DUR.findall(timing)]
+        if durations:
+            return sum(durations) / 1000.0
+    return None
+
+
+@dataclass
+class CallTiming:
+    """Filled in by HTTP backends for one call."""
+    http_s: Optional[float] = None
+    server_s: Optional[float] = None
+    request_bytes: Optional[int] = None
+    response_bytes: Optional[int] = None
+
+    @property
+    def network_s(self) -> Optional[float]:
+        if self.http_s is None:
+            return None
+        return max(0.0, self.http_s - (self.server_s or 0.0))
+
+
+def failure_kind(e: BaseException) -> str:
+    status = getattr(getattr(e, "response", None), "status_code", None)
+    if status is not None:
+        return "http_5xx" if status >= 500 else "http_4xx"
+    name = type(e).__name__
+    if "Timeout" in name:
+        return "timeout"
+    if "Connect" in name:
+        return "connect"
+    if "unavailable" in str(e):
+        return "unavailable"
+    return "other"
+
+
+class EmbeddingMetrics:
+    """Counters and histograms for backend calls (cache hits never reach here)."""
+
+    def __init__(self, slow_call_ms: float = EMBEDDING_SLOW_CALL_MS):
+        self.slow_call_ms = slow_call_ms
+        self.calls = Counter()
+        self.texts = Counter()
+        self.slow_calls = Counter()
+        self.failures: Dict[str, Counter] = {}
+        self.batch_size = Histogram(BATCH_SIZE_BUCKETS)
+        self.total_s = Histogram()
+        self.queue_s = Histogram()
+        self.network_s = Histogram()
+        self.server_s = Histogram()
+        self.request_bytes = Histogram(PAYLOAD_BYTES_BUCKETS)
+        self.response_bytes = Histogram(PAYLOAD_BYTES_BUCKETS)
+
+    def observe_call(
+        self,
+        backend: str,
+        texts: int,
+        seconds: float,
+        queued: float = 0.0,
+        timing: Optional[CallTiming] = None,
+        error: Optional[BaseException] = None,
+    ):
+        self.calls.inc()
+        self.texts.inc(texts)
+        self.batch_size.observe(texts)
+        self.total_s.observe(seconds)
+        self.queue_s.observe(queued)
+        if timing is not None:
+            if timing.network_s is not None:
+                self.network_s.observe(timing.network_s)
+            if timing.server_s is not None:
+                self.server_s.observe(timing.server_s)
+            if timing.request_bytes is not None:
+                self.request_bytes.observe(timing.request_bytes)
+            if timing.response_bytes is not None:
+                self.response_bytes.observe(timing.response_bytes)
+        if error is not None:
+            self.failures.setdefault(failure_kind(error), Counter()).inc()
+
+        total_ms = (seconds + queued) * 1000
+        if total_ms >= self.slow_call_ms:
+            self.slow_calls.inc()
+            split = f"queue {queued * 1000:.0f} ms"
+            if timing is not None and timing.http_s is not None:
+                split += f", network {timing.network_s * 1000:.0f} ms"
+                if timing.server_s is not None:
+                    split += f", server {timing.server_s * 1000:.0f} ms"
+            logger.warning(
+                f"Slow embedding call ({backend}): {texts} texts in {total_ms:.0f} ms ({split})"
+                + (f", failed: {error}" if error is not None else "")
+            )
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "calls": int(self.calls.value),
+            "texts": int(self.texts.value),
+            "slow_calls": int(self.slow_calls.value),
+            "slow_call_ms": self.slow_call_ms,
+            "failures": {kind: int(counter.value) for kind, counter in self.failures.items()},
+            "batch_size": self.batch_size.snapshot(),
+            "latency_s": {
+                "total": self.total_s.snapshot(),
+                "queue": self.queue_s.snapshot(),
+                "network": self.network_s.snapshot(),
+                "server": self.server_s.snapshot(),
+            },
+            "payload_bytes": {
+                "request": self.request_bytes.snapshot(),
+                "response": self.response_bytes.snapshot(),
+            },
+        }
@@ -1,21 +1,32 @@
 """
-Generates vector embeddings by calling the EmbeddingGemma Server API.
+Generates vector embeddings through the configured backend
+(EMBEDDING_BACKEND; by default the EmbeddingGemma Server API).
 Server docs: POST /embed, GET /health at EMBEDDING_SERVER_URL.
 """
 
 import os
+import time
 import numpy as np
-import asyncio
-import httpx
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from threading import Lock
 
 import logging
 
+from app.infrastructure.embeddings.backends import (
+    EmbeddingBackend,
+    create_embedding_backend,
+    EMBEDDING_BACKEND,
+)
+from app.infrastructure.embeddings.micro_batcher import EmbeddingMicroBatcher
+from app.infrastructure.embeddings.embedding_cache import EmbeddingCache, EMBEDDING_CACHE_ENABLED
+from app.infrastructure.embeddings.health_monitor import EmbeddingHealthMonitor
+from app.infrastructure.embeddings.embedding_metrics import CallTiming, EmbeddingMetrics
+
 logger = logging.getLogger(__name__)
 
-EMBEDDING_SERVER_URL = os.getenv("EMBEDDING_SERVER_URL", "http://localhost:8000")
 EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "768"))
+# Coalesce concurrent single-text requests into batched backend calls
+EMBEDDING_MICRO_BATCHING = os.getenv("EMBEDDING_MICRO_BATCHING", "true").lower() == "true"
 
 
 class EmbeddingService:
@@ -25,31 +36,26 @@ class EmbeddingService:
 
     def __init__(
         self,
-        server_url: str = EMBEDDING_SERVER_URL,
+        backend: Optional[EmbeddingBackend] = None,
         dimension: int = EMBEDDING_DIMENSION,
     ):
         logger.info(
-            f"Initializing EmbeddingService (EmbeddingGemma API at {server_url}, dim={dimension})"
+            f"Initializing EmbeddingService (backend={backend.name if backend else EMBEDDING_BACKEND}, dim={dimension})"
+        )
+        # Construction does no network I/O: the remote backend connects lazily through
+        # long-lived keep-alive clients, and health is tracked by a background
+        # monitor started (and stopped) from the app lifespan.
+        self.backend = backend or create_embedding_backend(dimension)
+        self.embedding_dim = self.backend.dimension
+        self.health = EmbeddingHealthMonitor(self.backend)
+        self.metrics = EmbeddingMetrics()
+        self._batcher: Optional[EmbeddingMicroBatcher] = (
+            EmbeddingMicroBatcher(self._call_backend_async) if EMBEDDING_MICRO_BATCHING else None
+        )
+        self._cache: Optional[EmbeddingCache] = (
+            EmbeddingCache(self.embedding_dim, namespace=lambda: self.backend.cache_namespace)
+            if EMBEDDING_CACHE_ENABLED else None
         )
-        self.server_url = server_url.rstrip("/")
-        self.embedding_dim = dimension
-
-        # Synchronous health check on init
-        try:
-            resp = httpx.get(f"{self.server_url}/health", timeout=15.0)
-            resp.raise_for_status()
-            health = resp.json()
-            if health.get("model_loaded"):
-                logger.info(
-                    f"EmbeddingGemma server is healthy — model: {health.get('model_name')}"
-                )
-            else:
-                logger.warning("EmbeddingGemma server reports model not loaded yet.")
-        except Exception as e:
-            logger.error(f"EmbeddingGemma health check failed: {e}")
-            raise RuntimeError(
-                f"Cannot reach EmbeddingGemma server at {self.server_url}: {e}"
-            )
 
     @classmethod
     def get_instance(cls) -> "EmbeddingService":
@@ -60,8 +66,124 @@ class EmbeddingService:
                     cls._instance = cls()
         return cls._instance
 
+    async def aclose(self) -> None:
+        """Stops health monitoring and releases backend resources such as pooled HTTP clients."""
+        await self.health.stop()
+        await self.backend.aclose()
+
+    def _ensure_available(self):
+        if not self.health.is_available():
+            raise RuntimeError(f"Embedding backend '{self.backend.name}' is unavailable: {self.health.last_error}")
+
+    def _record_outcome(self, error: Optional[BaseException]):
+        if error is None:
+            self.health.record_success()
+            return
+        # Client errors (4xx) are about the request, not the backend's health
+        status = getattr(getattr(error, "response", None), "status_code", None)
+        if status is None or status >= 500:
+            self.health.record_failure(error)
+
+    def _call_backend(self, texts: List[str], embedding_type: str) -> np.ndarray:
+        try:
+            self._ensure_available()
+        except RuntimeError as e:
+            self.metrics.observe_call(self.backend.name, len(texts), 0.0, error=e)
+            raise
+        timing = CallTiming()
+        started = time.perf_counter()
+        try:
+            vectors = self.backend.embed(texts, embedding_type, timing)
+        except Exception as e:
+            self._record_outcome(e)
+            self.metrics.observe_call(
+                self.backend.name, len(texts), time.perf_counter() - started, timing=timing, error=e
+            )
+            raise
+        self._record_outcome(None)
+        self.metrics.observe_call(self.backend.name, len(texts), time.perf_counter() - started, timing=timing)
+        return vectors
+
+    async def _call_backend_async(self, texts: List[str], embedding_type: str, queued: float = 0.0) -> np.ndarray:
+        """`queued` is how long the texts waited in the micro-batcher."""
+        try:
+            self._ensure_available()
+        except RuntimeError as e:
+            self.metrics.observe_call(self.backend.name, len(texts), 0.0, queued, error=e)
+            raise
+        timing = CallTiming()
+        started = time.perf_counter()
+        try:
+            vectors = await self.backend.embed_async(texts, embedding_type, timing)
+        except Exception as e:
+            self._record_outcome(e)
+            self.metrics.observe_call(
+                self.backend.name, len(texts), time.perf_counter() - started, queued, timing, error=e
+            )
+            raise
+        self._record_outcome(None)
+        self.metrics.observe_call(self.backend.name, len(texts), time.perf_counter() - started, queued, timing)
+        return vectors
+
+    @staticmethod
+    def _clean_texts(texts: List[str]) -> List[str]:
+        return [(t.strip() if t else "") for t in texts if t is not None]
+
+    def _cache_lookup(
+        self, texts: List[str], embedding_type: str
+    ) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """Cached vectors (None where missing) and the indices still to embed."""
+        if self._cache is None:
+            return [None] * len(texts), list(range(len(texts)))
+        rows = self._cache.get_many(texts, embedding_type)
+        return rows, [i for i, row in enumerate(rows) if row is None]
+
+    async def _cache_lookup_async(
+        self, texts: List[str], embedding_type: str
+    ) -> Tuple[List[Optional[np.ndarray]], List[int]]:
+        """_cache_lookup with the disk tier read off the event loop."""
+        if self._cache is None:
+            return [None] * len(texts), list(range(len(texts)))
+        rows = await self._cache.get_many_async(texts, embedding_type)
+        return rows, [i for i, row in enumerate(rows) if row is None]
+
+    def _cache_fill(
+        self,
+        rows: List[Optional[np.ndarray]],
+        missing: List[int],
+        texts: List[str],
+        embedding_type: str,
+        vectors: np.ndarray,
+        store: bool = True,
+    ) -> np.ndarray:
+        if len(vectors) != len(missing):
+            raise RuntimeError(f"Embedding backend returned {len(vectors)} vectors for {len(missing)} texts")
+        for i, vector in zip(missing, vectors):
+            rows[i] = vector
+            if store and self._cache is not None:
+                self._cache.put(texts[i], embedding_type, vector)
+        return np.stack(rows).astype(np.float32, copy=False)
+
+    def cache_stats(self) -> Optional[dict]:
+        """Hit/miss counters and sizes of the embedding cache, if enabled."""
+        return self._cache.stats() if self._cache is not None else None
+
+    def get_state(self) -> dict:
+        """Backend health, call metrics, cache stats and batching settings for monitoring."""
+        return {
+            "backend": self.backend.name,
+            "dimension": self.embedding_dim,
+            "health": self.health.snapshot(),
+            "metrics": self.metrics.snapshot(),
+            "cache": self.cache_stats(),
+            "micro_batching": {
+                "max_batch_size": self._batcher.max_batch_size,
+                "window_ms": self._batcher.window * 1000,
+            } if self._batcher is not None else None,
+        }
+
     # ------------------------------------------------------------------ #
-    #  Synchronous batch embedding (used by ContextRetriever)
+    #  Synchronous batch embedding (scripts and worker threads)
     # ------------------------------------------------------------------ #
     def generate_embeddings_batch(
         self,
@@ -70,36 +192,51 @@ class EmbeddingService:
     ) -> np.ndarray:
         """
         Generate embeddings for a batch of texts synchronously.
-        Calls the EmbeddingGemma /embed endpoint.
+        Cached texts are served locally; the rest go to the backend in one call.
         """
         if not texts:
             return np.array([])
 
-        valid_texts = [
-            (t.strip() if t else "") for t in texts if t is not None
-        ]
-
         try:
-            payload = {
-                "text": valid_texts,
-                "normalize": True,
-                "dimension": self.embedding_dim,
-                "embedding_type": embedding_type,
-            }
-            resp = httpx.post(
-                f"{self.server_url}/embed",
-                json=payload,
-                timeout=60.0,
-            )
-            resp.raise_for_status()
-            data = resp.json()
-            return np.array(data["embeddings"], dtype=np.float32)
+            texts = self._clean_texts(texts)
+            rows, missing = self._cache_lookup(texts, embedding_type)
+            vectors = self._call_backend([texts[i] for i in missing], embedding_type) if missing else []
+            return self._cache_fill(rows, missing, texts, embedding_type, vectors)
         except Exception as e:
             logger.error(f"Batch embedding generation failed: {e}")
             raise RuntimeError(f"Embedding generation failed: {e}")
 
     # ------------------------------------------------------------------ #
-    #  Async single-text embedding (used by DocumentIndexer)
+    #  Async batch embedding
+    # ------------------------------------------------------------------ #
+    async def generate_embeddings_batch_async(
+        self,
+        texts: List[str],
+        embedding_type: str = "document",
+        use_cache: bool = True,
+    ) -> np.ndarray:
+        """
+        Generate embeddings for a batch of texts without blocking the event loop.
+        Same caching, request and result shape as generate_embeddings_batch.
+        use_cache=False always asks the backend and stores nothing (bulk rebuilds).
+        """
+        if not texts:
+            return np.array([])
+
+        try:
+            texts = self._clean_texts(texts)
+            if use_cache:
+                rows, missing = await self._cache_lookup_async(texts, embedding_type)
+            else:
+                rows, missing = [None] * len(texts), list(range(len(texts)))
+            vectors = await self._call_backend_async([texts[i] for i in missing], embedding_type) if missing else []
+            return self._cache_fill(rows, missing, texts, embedding_type, vectors, store=use_cache)
+        except Exception as e:
+            logger.error(f"Async batch embedding generation failed: {e}")
+            raise RuntimeError(f"Embedding generation failed: {e}")
+
+    # ------------------------------------------------------------------ #
+    #  Async single-text embedding (used by DocumentIndexer and ContextRetriever)
     # ------------------------------------------------------------------ #
     async def generate_embedding_async(
         self,
@@ -108,37 +245,46 @@ class EmbeddingService:
     ) -> np.ndarray:
         """
         Generate embedding for a single text string asynchronously.
-        Uses httpx.AsyncClient to avoid blocking the event loop.
+        Served from the cache when possible; otherwise concurrent calls of the
+        same embedding_type are micro-batched into one backend call unless
+        EMBEDDING_MICRO_BATCHING is off.
         """
         if not text or not text.strip():
             logger.warning("Empty text provided for embedding generation.")
             return np.array([])
 
+        text = text.strip()
         try:
-            payload = {
-                "text": text,
-                "normalize": True,
-                "dimension": self.embedding_dim,
-                "embedding_type": embedding_type,
-            }
-            async with httpx.AsyncClient(timeout=60.0) as client:
-                resp = await client.post(
-                    f"{self.server_url}/embed",
-                    json=payload,
-                )
-                resp.raise_for_status()
-                data = resp.json()
-
-            embeddings = data["embeddings"]
-            if not embeddings or len(embeddings) == 0:
-                return np.array([])
-
-            return np.array(embeddings[0], dtype=np.float32)
+            if self._cache is not None:
+                cached = await self._cache.get_async(text, embedding_type)
+                if cached is not None:
+                    return cached
+
+            if self._batcher is not None:
+                embedding = await self._batcher.embed(text, embedding_type)
+            else:
+                embeddings = await self._call_backend_async([text], embedding_type)
+                if len(embeddings) == 0:
+                    return np.array([])
+                embedding = embeddings[0]
+
+            if self._cache is not None:
+                self._cache.put(text, embedding_type, embedding)
+            return embedding
 
         except Exception as e:
             logger.error(f"Async embedding generation failed: {e}")
             raise RuntimeError(f"Async embedding generation failed: {e}")
 
+    async def model_id(self) -> Optional[str]:
+        """Backend and model producing the vectors (see cache_namespace); asks the backend if unknown."""
+        if self.backend.cache_namespace is None:
+            try:
+                await self.backend.health_async()
+            except Exception as e:
+                logger.warning(f"Could not read the embedding model from the backend: {e}")
+        return self.backend.cache_namespace
+
     def get_embedding_dimension(self) -> int:
         """Get the dimension of the embeddings (default 768 for EmbeddingGemma)."""
         return self.embedding_dim
@@ -147,3 +293,16 @@ class EmbeddingService:
 def get_embedding_service() -> EmbeddingService:
     """Dependency injection helper."""
     return EmbeddingService.get_instance()
+
+
+async def start_embedding_service() -> EmbeddingService:
+    """Creates the singleton (no I/O) and starts its background health monitor."""
+    service = get_embedding_service()
+    service.health.start()
+    return service
+
+
+async def close_embedding_service() -> None:
+    """Stops monitoring and releases the singleton's connections if it was ever created."""
+    if EmbeddingService._instance is not None:
+        await EmbeddingService._instance.aclose()
@@ -0,0 +1,117 @@
+"""
+Background health monitoring for the embedding backend.
+Started from the app lifespan instead of blocking service construction: the
+monitor polls the backend's health endpoint, and real calls report their
+outcome too, so requests fail fast while the backend is known to be down
+and resume as soon as it recovers.
+"""
+
+import os
+import asyncio
+import time
+import logging
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_HEALTH_INTERVAL = float(os.getenv("EMBEDDING_HEALTH_INTERVAL", "15"))
+EMBEDDING_HEALTH_TIMEOUT = float(os.getenv("EMBEDDING_HEALTH_TIMEOUT", "5"))
+# Consecutive failed calls/checks before requests are failed fast
+EMBEDDING_FAILURE_THRESHOLD = int(os.getenv("EMBEDDING_FAILURE_THRESHOLD", "3"))
+
+
+class EmbeddingHealthMonitor:
+    """
+    Tracks backend availability.
+    Status is unknown until the first check or call; while it is unknown or
+    healthy, requests go through. After EMBEDDING_FAILURE_THRESHOLD consecutive
+    failures requests are rejected immediately until a check or probe succeeds.
+    """
+
+    def __init__(self, backend: Any, interval: float = EMBEDDING_HEALTH_INTERVAL):
+        self._backend = backend
+        self.interval = interval
+        self.healthy: Optional[bool] = None
+        self.model_name: Optional[str] = None
+        self.last_check: Optional[float] = None   # wall clock, for reporting
+        self.last_error: Optional[str] = None
+        self.consecutive_failures = 0
+        self._last_attempt = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def is_available(self) -> bool:
+        if self.healthy is not False:
+            return True
+        # Half-open: let one request probe per interval (covers scripts without the monitor)
+        now = time.monotonic()
+        if now - self._last_attempt >= self.interval:
+            self._last_attempt = now
+            return True
+        return False
+
+    def record_success(self):
+        if self.healthy is False:
+            logger.info("Embedding backend recovered")
+        self.healthy = True
+        self.consecutive_failures = 0
+        self.last_error = None
+
+    def record_failure(self, error: BaseException):
+        self.consecutive_failures += 1
+        self._last_attempt = time.monotonic()
+        self.last_error = str(error) or type(error).__name__
+        if self.consecutive_failures >= EMBEDDING_FAILURE_THRESHOLD and self.healthy is not False:
+            logger.error(f"Embedding backend marked unavailable: {self.last_error}")
+            self.healthy = False
+
+    async def check(self) -> bool:
+        """One health probe; updates and returns the status."""
+        self.last_check = time.time()
+        try:
+            health = await asyncio.wait_for(self._backend.health_async(), timeout=EMBEDDING_HEALTH_TIMEOUT)
+        except Exception as e:
+            self.record_failure(e)
+            return False
+
+        self.model_name = health.get("model_name", self.model_name)
+        if health.get("model_loaded", True):
+            self.record_success()
+            return True
+        self.record_failure(RuntimeError("model not loaded yet"))
+        return False
+
+    async def _run(self):
+        while True:
+            was = self.healthy
+            await self.check()
+            if was is None:
+                if self.healthy:
+                    logger.info(f"Embedding backend is healthy — model: {self.model_name}")
+                else:
+                    logger.warning(f"Embedding backend not ready yet: {self.last_error}")
+            # Re-check sooner while down so recovery is noticed quickly
+            await asyncio.sleep(self.interval if self.healthy else min(self.interval, 5.0))
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "backend": getattr(self._backend, "name", None),
+            "healthy": self.healthy,
+            "model_name": self.model_name,
+            "last_check": self.last_check,
+            "last_error": self.last_error,
+            "consecutive_failures": self.consecutive_failures,
+            "monitoring": self._task is not None and not self._task.done(),
+        }
@@ -0,0 +1,109 @@
+"""
+Micro-batching for embedding requests.
+Concurrent single-text requests of the same embedding_type are held for a
+short window (or until the batch is full) and sent as one backend call, so
+server load scales with batches rather than with individual texts.
+"""
+
+import os
+import asyncio
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_BATCH_MAX_SIZE = int(os.getenv("EMBEDDING_BATCH_MAX_SIZE", "32"))
+EMBEDDING_BATCH_WINDOW_MS = float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "5"))
+# Batches in flight at once; further full batches wait for a free slot
+EMBEDDING_BATCH_MAX_CONCURRENCY = int(os.getenv("EMBEDDING_BATCH_MAX_CONCURRENCY", "4"))
+
+# Called as embed_batch(texts, embedding_type, queued=<seconds the oldest text waited>)
+BatchEmbedFn = Callable[..., Awaitable[np.ndarray]]
+
+
+@dataclass
+class _PendingBatch:
+    texts: List[str] = field(default_factory=list)
+    futures: List[asyncio.Future] = field(default_factory=list)
+    timer: Optional[asyncio.TimerHandle] = None
+    started: float = field(default_factory=time.monotonic)
+
+
+class EmbeddingMicroBatcher:
+    """
+    Coalesces embed(text, embedding_type) calls into batched `embed_batch` calls.
+    A batch is sent when it reaches `max_batch_size` or `window_ms` after its
+    first text arrived, whichever comes first. Each caller gets its own row;
+    a failed batch fails every caller in it.
+    """
+
+    def __init__(
+        self,
+        embed_batch: BatchEmbedFn,
+        max_batch_size: int = EMBEDDING_BATCH_MAX_SIZE,
+        window_ms: float = EMBEDDING_BATCH_WINDOW_MS,
+        max_concurrency: int = EMBEDDING_BATCH_MAX_CONCURRENCY,
+    ):
+        self._embed_batch = embed_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.window = max(0.0, window_ms) / 1000.0
+        self._max_concurrency = max(1, max_concurrency)
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._pending: Dict[str, _PendingBatch] = {}
+        self._tasks: set = set()
+
+    async def embed(self, text: str, embedding_type: str = "document") -> np.ndarray:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        batch = self._pending.get(embedding_type)
+        if batch is None:
+            batch = self._pending[embedding_type] = _PendingBatch()
+            batch.timer = loop.call_later(self.window, self._flush, embedding_type)
+        batch.texts.append(text)
+        batch.futures.append(future)
+
+        if len(batch.texts) >= self.max_batch_size:
+            self._flush(embedding_type)
+        return await future
+
+    def _flush(self, embedding_type: str):
+        batch = self._pending.pop(embedding_type, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+
+        # Callers that gave up while waiting don't need their text embedded
+        live = [(t, f) for t, f in zip(batch.texts, batch.futures) if not f.done()]
+        if not live:
+            return
+        task = asyncio.get_running_loop().create_task(self._send(embedding_type, live, batch.started))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _send(self, embedding_type: str, items: List[tuple], started: float):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._max_concurrency)
+        # Identical texts in one batch (e.g. a popular query) are embedded once
+        texts = list(dict.fromkeys(text for text, _ in items))
+        try:
+            async with self._semaphore:
+                vectors = await self._embed_batch(texts, embedding_type, queued=time.monotonic() - started)
+            if len(vectors) != len(texts):
+                raise RuntimeError(f"Embedding backend returned {len(vectors)} vectors for {len(texts)} texts")
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(texts)} ({embedding_type}) failed: {e}")
+            for _, future in items:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        by_text = dict(zip(texts, vectors))
+        for text, future in items:
+            if not future.done():
+                future.set_result(by_text[text])
@@ -0,0 +1,162 @@
+"""
+Reduced-size embedding storage.
+    truncate_dimension – Matryoshka-style: keep the leading dimensions and
+                         re-normalise (EmbeddingGemma is trained for 768/512/256/128)
+    int8               – per-vector symmetric int8 quantization
+QuantizedVectorIndex searches the compact vectors first and rescores the top
+candidates against full precision, recovering most of the lost recall.
+
+Truncation alone is lossy (recall@10 around 0.7 at 256 dims in
+benchmark_quantization.py). In the vector store, set EMBEDDING_RESCORE_MULTIPLIER
+to re-rank candidates against the full vectors, kept int8-quantized in a side
+table that is read only for candidate rows:
+    CREATE TABLE embedding_rescore (
+        id BIGINT PRIMARY KEY REFERENCES embeddings(id) ON DELETE CASCADE,
+        codes BYTEA NOT NULL, scale REAL NOT NULL);
+Rows without a side-table entry keep their truncated score.
+"""
+
+import os
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.exceptions import ConfigurationError
+
+# Dimension vectors are stored/searched at in the vector store; 0 keeps the full dimension
+EMBEDDING_STORAGE_DIMENSION = int(os.getenv("EMBEDDING_STORAGE_DIMENSION", "0"))
+# Candidates fetched per result and re-ranked against the int8 full vectors in
+# RESCORE_TABLE when the storage dimension truncates; 0 disables rescoring
+EMBEDDING_RESCORE_MULTIPLIER = int(os.getenv("EMBEDDING_RESCORE_MULTIPLIER", "0"))
+
+# Side table of int8 full-dimension vectors, keyed by embeddings.id
+RESCORE_TABLE = "embedding_rescore"
+
+# float16 is not offered: numpy has no BLAS kernel for it, so every search
+# would upcast the whole matrix
+SUPPORTED_DTYPES = ("float32", "int8")
+
+
+def truncate_dimension(vectors: np.ndarray, dimension: int) -> np.ndarray:
+    """Keeps the first `dimension` components of each vector and re-normalises."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if dimension <= 0 or dimension >= vectors.shape[-1]:
+        return vectors
+    truncated = vectors[..., :dimension]
+    norms = np.linalg.norm(truncated, axis=-1, keepdims=True)
+    return truncated / np.maximum(norms, 1e-12)
+
+
+def storage_is_lossy() -> bool:
+    """True when stored vectors are truncated and searches are not rescored."""
+    return EMBEDDING_STORAGE_DIMENSION > 0 and EMBEDDING_RESCORE_MULTIPLIER <= 0
+
+
+def storage_vector(vector: np.ndarray) -> np.ndarray:
+    """Vector as stored in the vector store (truncated to EMBEDDING_STORAGE_DIMENSION if set)."""
+    return truncate_dimension(vector, EMBEDDING_STORAGE_DIMENSION)
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8: returns (codes, scales) with vectors ~= codes * scales."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def dequantize_int8(codes: np.ndarray, scales: np.ndarray) -> np.ndarray:
+    return codes.astype(np.float32) * scales[:, None]
+
+
+def pack_int8(vector: np.ndarray) -> Tuple[bytes, float]:
+    """One vector as (int8 codes, scale), the RESCORE_TABLE row format."""
+    codes, scales = quantize_int8(np.asarray(vector, dtype=np.float32).reshape(1, -1))
+    return codes.tobytes(), float(scales[0])
+
+
+def unpack_int8(codes: bytes, scale: float) -> np.ndarray:
+    return np.frombuffer(codes, dtype=np.int8).astype(np.float32) * np.float32(scale)
+
+
+class QuantizedVectorIndex:
+    """
+    In-memory inner-product index over compact vectors.
+    search() scores every stored vector at `storage_dimension`/`dtype`, keeps
+    `top_k * rescore_multiplier` candidates and re-ranks them with the
+    full-precision vectors (kept only when rescoring is enabled).
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        storage_dimension: Optional[int] = None,
+        dtype: str = "int8",
+        rescore_multiplier: int = 4,
+    ):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ConfigurationError(
+                f"Unsupported vector dtype '{dtype}'. Use one of {SUPPORTED_DTYPES}.", config_key="dtype"
+            )
+        self.dimension = dimension
+        self.storage_dimension = min(storage_dimension or dimension, dimension)
+        self.dtype = dtype
+        self.rescore_multiplier = rescore_multiplier
+
+        self._keys: List[str] = []
+        self._codes = np.zeros((0, self.storage_dimension), dtype=np.int8 if dtype == "int8" else np.float32)
+        self._scales = np.zeros(0, dtype=np.float32)
+        self._full: Optional[np.ndarray] = (
+            np.zeros((0, dimension), dtype=np.float32) if rescore_multiplier > 0 else None
+        )
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, keys: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+        compact = truncate_dimension(vectors, self.storage_dimension)
+        if self.dtype == "int8":
+            codes, scales = quantize_int8(compact)
+            self._scales = np.concatenate([self._scales, scales])
+        else:
+            codes = compact
+        self._codes = np.concatenate([self._codes, codes])
+        if self._full is not None:
+            self._full = np.concatenate([self._full, vectors])
+        self._keys.extend(keys)
+
+    def _approximate_scores(self, query: np.ndarray) -> np.ndarray:
+        compact = truncate_dimension(query, self.storage_dimension)
+        if self.dtype == "int8":
+            # Dot product on the codes, then apply the per-vector scale
+            return (self._codes.astype(np.float32) @ compact) * self._scales
+        return self._codes @ compact
+
+    def search(self, query: np.ndarray, top_k: int = 5) -> List[Tuple[str, float]]:
+        if not self._keys:
+            return []
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        scores = self._approximate_scores(query)
+
+        n_candidates = len(self._keys)
+        if self._full is not None:
+            n_candidates = min(n_candidates, top_k * self.rescore_multiplier)
+        else:
+            n_candidates = min(n_candidates, top_k)
+        candidates = np.argpartition(-scores, n_candidates - 1)[:n_candidates]
+
+        if self._full is not None:
+            scores_c = self._full[candidates] @ query
+        else:
+            scores_c = scores[candidates]
+        order = np.argsort(-scores_c)[:top_k]
+        return [(self._keys[candidates[i]], float(scores_c[i])) for i in order]
+
+    def nbytes(self) -> Dict[str, int]:
+        """Bytes used by the searched (compact) vectors and by the rescoring copy."""
+        return {
+            "search": int(self._codes.nbytes + self._scales.nbytes),
+            "rescore": int(self._full.nbytes) if self._full is not None else 0,
+        }
@@ -8,8 +8,9 @@ import asyncio
 import json
 import re
 import os
+import time
 import logging
-from typing import Optional, Dict, Any, Union, Tuple
+from typing import Optional, Dict, Any, Union, Tuple, List, AsyncIterator
 from dotenv import load_dotenv
 
 from langchain_google_genai import ChatGoogleGenerativeAI
@@ -18,13 +19,30 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.language_models import BaseChatModel
 
 from app.infrastructure.rate_limiter import get_rate_limiter, APIProvider
+from app.infrastructure.rate_limiter.cost import estimate_tokens
+from app.infrastructure.parser.parse_router import ParseRouter, ProviderRoute
+from app.infrastructure.parser.incremental_json import IncrementalJSONParser, ParseEvent
 from app.core.exceptions import ConfigurationError, ExternalServiceError
+from app.core.document_model import CanonicalDocument, CANONICAL_KEY
 from app.infrastructure.firebase.user_repository import FirestoreUserRepository
 from app.infrastructure.encryption_service import FernetEncryptionService
 
 logger = logging.getLogger(__name__)
 load_dotenv()
 
+PARSER_BATCH_MAX_INPUT_TOKENS = int(os.getenv("PARSER_BATCH_MAX_INPUT_TOKENS", "6000"))
+PARSER_BATCH_MAX_DOCUMENTS = int(os.getenv("PARSER_BATCH_MAX_DOCUMENTS", "8"))
+PARSER_BATCH_MAX_DOCUMENT_TOKENS = int(os.getenv("PARSER_BATCH_MAX_DOCUMENT_TOKENS", "1500"))
+
+# Optional second provider, e.g. "gemini-2.5-flash" behind a Groq primary
+PARSER_FALLBACK_MODEL = os.getenv("PARSER_FALLBACK_MODEL", "")
+# Hedge after the primary exceeds this latency percentile (e.g. "95"); empty disables hedging
+PARSER_HEDGE_PERCENTILE = os.getenv("PARSER_HEDGE_PERCENTILE", "")
+PARSER_HEDGE_MIN_SAMPLES = int(os.getenv("PARSER_HEDGE_MIN_SAMPLES", "20"))
+
+# Base URL of stub_llm_server.py; when set every model is served by the stub
+LLM_STUB_URL = os.getenv("LLM_STUB_URL", "")
+
 class ParserPromptManager:
     """Manages document analysis prompts."""
     
@@ -70,6 +88,19 @@ You MUST return a JSON object with these REQUIRED top-level fields:
 Output ONLY the raw JSON object. Do not include markdown formatting or explanations.
 """
 
+    BATCH_PARSE_INSTRUCTIONS = """
+BATCH MODE: The input contains several independent documents. Each one starts with a line
+"<<<DOCUMENT n>>>" and ends with a line "<<<END DOCUMENT n>>>", where n is its number.
+Analyze every document separately using the rules above and never mix data between documents.
+
+Return ONLY one raw JSON object of the form:
+{{"documents": [{{"doc_index": 1, ...fields for document 1...}}, {{"doc_index": 2, ...}}]}}
+with exactly one entry per input document, in the same order, each carrying its "doc_index".
+"""
+
+    DOC_START = "<<<DOCUMENT {index}>>>"
+    DOC_END = "<<<END DOCUMENT {index}>>>"
+
     @classmethod
     def get_parse_template(cls) -> ChatPromptTemplate:
         """Returns the formatted prompt template."""
@@ -77,6 +108,72 @@ Output ONLY the raw JSON object. Do not include markdown formatting or explanati
             ("system", cls.DOCUMENT_PARSE_PROMPT),
             ("human", "{context}")
         ])
+
+    @classmethod
+    def get_batch_parse_template(cls) -> ChatPromptTemplate:
+        """Returns the multi-document prompt template."""
+        return ChatPromptTemplate.from_messages([
+            ("system", cls.DOCUMENT_PARSE_PROMPT + cls.BATCH_PARSE_INSTRUCTIONS),
+            ("human", "{context}")
+        ])
+
+    @classmethod
+    def build_batch_context(cls, texts: List[str]) -> str:
+        """Wraps each document in numbered delimiters (1-based)."""
+        parts = []
+        for i, text in enumerate(texts, 1):
+            parts.append(f"{cls.DOC_START.format(index=i)}\n{text.strip()}\n{cls.DOC_END.format(index=i)}")
+        return "\n\n".join(parts)
+
+    @classmethod
+    def estimate_call_tokens(cls, context: str, batch: bool = False) -> int:
+        """Input + output tokens for one parse call; the JSON output roughly mirrors the input."""
+        instructions = cls.DOCUMENT_PARSE_PROMPT + (cls.BATCH_PARSE_INSTRUCTIONS if batch else "")
+        return estimate_tokens(instructions) + 2 * estimate_tokens(context)
+
+
+class ParserBatchPlanner:
+    """Packs short OCR texts into multi-document batches under a token budget."""
+
+    def __init__(
+        self,
+        max_input_tokens: int = PARSER_BATCH_MAX_INPUT_TOKENS,
+        max_documents: int = PARSER_BATCH_MAX_DOCUMENTS,
+        max_document_tokens: int = PARSER_BATCH_MAX_DOCUMENT_TOKENS,
+    ):
+        self.max_input_tokens = max_input_tokens
+        self.max_documents = max_documents
+        self.max_document_tokens = max_document_tokens
+
+    def plan(self, texts: List[str]) -> Tuple[List[List[int]], List[int]]:
+        """
+        Splits document indices into batches and single-document leftovers.
+        Documents too large to share a request are parsed on their own.
+        """
+        batches: List[List[int]] = []
+        singles: List[int] = []
+        current: List[int] = []
+        current_tokens = 0
+
+        for i, text in enumerate(texts):
+            tokens = estimate_tokens(text) + 16  # delimiter overhead
+            if tokens > self.max_document_tokens:
+                singles.append(i)
+                continue
+            if current and (current_tokens + tokens > self.max_input_tokens or len(current) >= self.max_documents):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(i)
+            current_tokens += tokens
+
+        if current:
+            batches.append(current)
+
+        # A batch of one gains nothing over the regular prompt
+        for batch in [b for b in batches if len(b) == 1]:
+            batches.remove(batch)
+            singles.extend(batch)
+        return batches, sorted(singles)
     
 class LLMModelFactory:
     """Factory for initializing LLM providers with associated rate limiters."""
@@ -85,22 +182,47 @@ class LLMModelFactory:
     def create(model_name: str, timeout: float, api_key: Optional[str] = None) -> Tuple[BaseChatModel, Any]:
         """Creates the appropriate LLM instance based on model name."""
         model_name_lower = model_name.lower()
-        if any(x in model_name_lower for x in ["llama", "mixtral"]):
+        is_groq = any(x in model_name_lower for x in ["llama", "mixtral"])
+        if LLM_STUB_URL:
+            return LLMModelFactory._init_stub(model_name, timeout, is_groq)
+        if is_groq:
             return LLMModelFactory._init_groq(model_name, timeout, api_key)
         return LLMModelFactory._init_gemini(model_name)
 
+    @staticmethod
+    def _init_stub(model_name: str, timeout: float, is_groq: bool) -> Tuple[ChatGroq, Any]:
+        """Local stub server; keeps the real provider's limiter so load tests see production limits."""
+        if is_groq:
+            limiter = get_rate_limiter(provider=APIProvider.GROQ, name="groq_processing")
+        else:
+            limiter = get_rate_limiter(provider=APIProvider.GEMINI_FREE, name="gemini_processing")
+        model = ChatGroq(
+            model=model_name,
+            groq_api_key="stub",
+            http_async_client=limiter.http_async_client(),
+            base_url=LLM_STUB_URL,
+            temperature=0,
+            timeout=timeout,
+            max_retries=2
+        )
+        logger.info(f"LLMModelFactory: {model_name} served by stub at {LLM_STUB_URL}")
+        return model, limiter
+
     @staticmethod
     def _init_groq(model_name: str, timeout: float, api_key: Optional[str] = None) -> Tuple[ChatGroq, Any]:
+        # A user-supplied key gets its own limiter; the system key shares "groq_processing"
+        user_key = api_key
         if not api_key:
             api_key = os.getenv("GROQ_API_KEY")
         
         if not api_key:
             raise ConfigurationError("GROQ_API_KEY missing", config_key="GROQ_API_KEY")
 
-        limiter = get_rate_limiter(provider=APIProvider.GROQ, name="groq_processing")
+        limiter = get_rate_limiter(provider=APIProvider.GROQ, name="groq_processing", api_key=user_key)
         model = ChatGroq(
             model=model_name,
             groq_api_key=api_key,
+            http_async_client=limiter.http_async_client(),
             temperature=0,
             timeout=timeout,
             max_retries=2
@@ -144,6 +266,44 @@ class ParserOutputProcessor:
         logger.warning(f"Failed to extract JSON from: {output[:100]}...")
         return {"error": "JSON extraction failed", "raw_output": output}
 
+    @staticmethod
+    def split_batch_output(output: str, count: int) -> Dict[int, Dict[str, Any]]:
+        """
+        Splits a multi-document response into {position: parsed_doc} (0-based).
+        Entries are matched by "doc_index"; positional matching is used only
+        when no index is given and the count lines up.
+        """
+        parsed = ParserOutputProcessor.extract_json(output)
+        if isinstance(parsed, dict):
+            documents = parsed.get("documents")
+        else:
+            documents = parsed
+        if not isinstance(documents, list):
+            return {}
+
+        results: Dict[int, Dict[str, Any]] = {}
+        positional = len(documents) == count
+        for pos, doc in enumerate(documents):
+            if not isinstance(doc, dict):
+                continue
+            index = doc.pop("doc_index", None)
+            try:
+                position = int(index) - 1 if index is not None else (pos if positional else -1)
+            except (TypeError, ValueError):
+                position = -1
+            if 0 <= position < count and position not in results:
+                results[position] = doc
+        return results
+
+    @staticmethod
+    def is_valid(parsed: Any) -> bool:
+        """Minimal validation for a single parsed document."""
+        return (
+            isinstance(parsed, dict)
+            and "error" not in parsed
+            and isinstance(parsed.get("document_type"), str)
+        )
+
     @staticmethod
     def normalize_doc_type(doc_type: Optional[str]) -> str:
         """Standardizes document type naming."""
@@ -157,7 +317,7 @@ class GeminiParserService:
     Delegates prompts, model creation, and processing to internal components.
     """
 
-    def __init__(self, model_name: str = "llama-3.3-70b-versatile"):
+    def __init__(self, model_name: str = "llama-3.3-70b-versatile", fallback_model: str = PARSER_FALLBACK_MODEL):
     # def __init__(self, model_name: str = "gemini-2.5-flash"):  
         self.model_name = model_name
         self.api_timeout = 120.0
@@ -169,53 +329,102 @@ class GeminiParserService:
             logger.error(f"Failed to initialize Parser Service: {e}")
             raise ConfigurationError(f"LLM initialization failed: {e}")
 
-    async def parse_async(self, text: str, image_url: Optional[str] = None, user_id: Optional[str] = None) -> Dict[str, Any]:
-        """Main parsing entry point."""
+        # Secondary provider is optional: a missing key only disables failover
+        self.fallback_routes: List[ProviderRoute] = []
+        if fallback_model and fallback_model != model_name:
+            try:
+                llm, limiter = LLMModelFactory.create(fallback_model, self.api_timeout)
+                self.fallback_routes.append(ProviderRoute(fallback_model, llm, limiter))
+                logger.info(f"Parser failover provider ready with {fallback_model}")
+            except Exception as e:
+                logger.warning(f"Parser failover provider {fallback_model} unavailable: {e}")
+
+        self.router = ParseRouter(
+            hedge_percentile=float(PARSER_HEDGE_PERCENTILE) if PARSER_HEDGE_PERCENTILE else None,
+            hedge_min_samples=PARSER_HEDGE_MIN_SAMPLES,
+        )
+
+    async def _resolve_llm(self, user_id: Optional[str]) -> Tuple[BaseChatModel, Any]:
+        """Returns the (llm, limiter) pair, preferring the user's own Groq key."""
+        current_llm = self.llm
+        current_limiter = self.rate_limiter
+
+        # If user_id is provided and we are using a Groq model, try to fetch user's key
+        if user_id and any(x in self.model_name.lower() for x in ["llama", "mixtral"]):
+            try:
+                # Resolve key dynamically
+                repo = FirestoreUserRepository()
+                encryption = FernetEncryptionService()
+
+                encrypted_key = await repo.get_groq_key(user_id)
+                if encrypted_key:
+                    decrypted_key = encryption.decrypt(encrypted_key)
+                    # Create specific instance for this request
+                    current_llm, current_limiter = LLMModelFactory.create(
+                        self.model_name, self.api_timeout, api_key=decrypted_key
+                    )
+                    logger.info(f"Using custom Groq key for user {user_id}")
+            except Exception as e:
+                logger.warning(f"Failed to load user Groq key, falling back to system key: {e}")
+
+        return current_llm, current_limiter
+
+    async def _resolve_routes(self, user_id: Optional[str]) -> List[ProviderRoute]:
+        """Primary route (possibly on the user's key) followed by any failover providers."""
+        current_llm, current_limiter = await self._resolve_llm(user_id)
+        return [ProviderRoute(self.model_name, current_llm, current_limiter)] + self.fallback_routes
+
+    @staticmethod
+    def _finalize(parsed: Dict[str, Any], image_url: Optional[str]) -> Dict[str, Any]:
+        """Shared post-processing for single and batch results."""
+        parsed["document_type"] = ParserOutputProcessor.normalize_doc_type(parsed.get("document_type"))
+        if image_url:
+            parsed["image_url"] = str(image_url)
+        # Resolve alternative key names once so consumers read fixed fields
+        if "error" not in parsed:
+            parsed[CANONICAL_KEY] = CanonicalDocument.from_raw(parsed).to_dict()
+        return parsed
+
+    async def parse_async(
+        self,
+        text: str,
+        image_url: Optional[str] = None,
+        user_id: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Main parsing entry point.
+        `tenant_id` (company id) is the fair-queuing key in the rate limiter; defaults to user_id.
+        """
         if not text or not text.strip():
             return {"error": "Empty input text", "document_type": "other"}
 
+        tenant = tenant_id or user_id
+        # Lets the limiter reject or drop the request once it can no longer finish in time
+        deadline = time.monotonic() + self.api_timeout
         try:
-            # Determine LLM instance to use
-            current_llm = self.llm
-            current_limiter = self.rate_limiter
-            
-            # If user_id is provided and we are using a Groq model, try to fetch user's key
-            if user_id and any(x in self.model_name.lower() for x in ["llama", "mixtral"]):
-                try:
-                    # Resolve key dynamically
-                    repo = FirestoreUserRepository()
-                    encryption = FernetEncryptionService()
-                    
-                    encrypted_key = await repo.get_groq_key(user_id)
-                    if encrypted_key:
-                        decrypted_key = encryption.decrypt(encrypted_key)
-                        # Create specific instance for this request
-                        current_llm, current_limiter = LLMModelFactory.create(
-                            self.model_name, self.api_timeout, api_key=decrypted_key
-                        )
-                        logger.info(f"Using custom Groq key for user {user_id}")
-                except Exception as e:
-                    logger.warning(f"Failed to load user Groq key, falling back to system key: {e}")
-
+            # Determine LLM instances to use
+            routes = await self._resolve_routes(user_id)
             template = ParserPromptManager.get_parse_template()
-            chain = template | current_llm
-            
-            logger.debug(f"Invoking LLM {self.model_name} with priority queue.")
-            result = await asyncio.wait_for(
-                current_limiter.execute_with_retry(
-                    chain.ainvoke, {"context": text}, priority=10
-                ),
+
+            async def invoke(route: ProviderRoute) -> Dict[str, Any]:
+                chain = template | route.llm
+                logger.debug(f"Invoking LLM {route.name} with priority queue.")
+                result = await route.limiter.execute_with_retry(
+                    chain.ainvoke, {"context": text}, priority=10,
+                    estimated_tokens=ParserPromptManager.estimate_call_tokens(text),
+                    tenant=tenant,
+                    deadline=deadline,
+                )
+                return ParserOutputProcessor.extract_json(result.content)
+
+            parsed, _ = await asyncio.wait_for(
+                self.router.run(routes, invoke, ParserOutputProcessor.is_valid),
                 timeout=self.api_timeout
             )
             
-            parsed = ParserOutputProcessor.extract_json(result.content)
-            
             # Post-process
-            parsed["document_type"] = ParserOutputProcessor.normalize_doc_type(parsed.get("document_type"))
-            if image_url:
-                parsed["image_url"] = str(image_url)
-
-            return parsed
+            return self._finalize(parsed, image_url)
 
         except asyncio.TimeoutError:
             logger.error(f"Timeout for {self.model_name}")
@@ -224,3 +433,148 @@ class GeminiParserService:
             logger.error(f"Parsing cycle failed: {e}")
             raise ExternalServiceError(f"Parsing failed: {e}", service_name="LLM_Parser")
 
+    async def parse_stream_async(
+        self,
+        text: str,
+        image_url: Optional[str] = None,
+        user_id: Optional[str] = None,
+        tenant_id: Optional[str] = None,
+    ) -> AsyncIterator[ParseEvent]:
+        """
+        Streaming variant of parse_async.
+        Yields ("field", key, value) and ("item", key, value) events while the
+        model is still generating, then ("done", "", parsed) carrying the same
+        dict parse_async would return. Streams from the primary provider only,
+        since failover and hedging need a complete answer to validate.
+        """
+        if not text or not text.strip():
+            yield ("done", "", {"error": "Empty input text", "document_type": "other"})
+            return
+
+        try:
+            current_llm, current_limiter = await self._resolve_llm(user_id)
+            chain = ParserPromptManager.get_parse_template() | current_llm
+            parser = IncrementalJSONParser()
+
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + self.api_timeout
+
+            logger.debug(f"Streaming LLM {self.model_name} with priority queue.")
+            stream = current_limiter.stream_with_retry(
+                lambda: chain.astream({"context": text}),
+                priority=10,
+                estimated_tokens=ParserPromptManager.estimate_call_tokens(text),
+                tenant=tenant_id or user_id,
+                deadline=time.monotonic() + self.api_timeout,
+            )
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(stream.__anext__(), timeout=max(0.0, deadline - loop.time()))
+                except StopAsyncIteration:
+                    break
+                for kind, key, value in parser.feed(chunk.content or ""):
+                    if key == "document_type":
+                        value = ParserOutputProcessor.normalize_doc_type(value)
+                    yield (kind, key, value)
+
+            if parser.complete and not parser.failed:
+                parsed = parser.document
+            else:
+                parsed = ParserOutputProcessor.extract_json(parser.text)
+
+            yield ("done", "", self._finalize(parsed, image_url))
+
+        except asyncio.TimeoutError:
+            logger.error(f"Streaming timeout for {self.model_name}")
+            raise ExternalServiceError("LLM API timeout", service_name="LLM_Parser")
+        except ExternalServiceError:
+            raise
+        except Exception as e:
+            logger.error(f"Streaming parse failed: {e}")
+            raise ExternalServiceError(f"Parsing failed: {e}", service_name="LLM_Parser")
+
+    async def parse_batch_async(
+        self,
+        texts: List[str],
+        image_urls: Optional[List[Optional[str]]] = None,
+        user_id: Optional[str] = None,
+        planner: Optional[ParserBatchPlanner] = None,
+        tenant_id: Optional[str] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Parses many short documents with as few LLM calls as possible.
+        Results are returned in input order. Any document missing from or
+        invalid in a batch response is re-parsed on its own; documents that
+        still fail come back as {"error": ..., "document_type": "other"}.
+        """
+        image_urls = image_urls or [None] * len(texts)
+        results: List[Optional[Dict[str, Any]]] = [None] * len(texts)
+
+        pending = []
+        for i, text in enumerate(texts):
+            if not text or not text.strip():
+                results[i] = {"error": "Empty input text", "document_type": "other"}
+            else:
+                pending.append(i)
+
+        batches, singles = (planner or ParserBatchPlanner()).plan([texts[i] for i in pending])
+        batches = [[pending[j] for j in batch] for batch in batches]
+        retry = [pending[j] for j in singles]
+
+        if batches:
+            routes = await self._resolve_routes(user_id)
+
+            outcomes = await asyncio.gather(
+                *(self._run_batch(routes, [texts[i] for i in batch], tenant_id or user_id) for batch in batches),
+                return_exceptions=True,
+            )
+            for batch, outcome in zip(batches, outcomes):
+                if isinstance(outcome, BaseException):
+                    logger.warning(f"Batch of {len(batch)} failed, falling back to single parsing: {outcome}")
+                    retry.extend(batch)
+                    continue
+                for pos, i in enumerate(batch):
+                    parsed = outcome.get(pos)
+                    if ParserOutputProcessor.is_valid(parsed):
+                        results[i] = self._finalize(parsed, image_urls[i])
+                    else:
+                        retry.append(i)
+
+        if retry:
+            logger.info(f"Parsing {len(retry)} document(s) individually")
+            singles_out = await asyncio.gather(
+                *(self.parse_async(texts[i], image_urls[i], user_id=user_id, tenant_id=tenant_id) for i in retry),
+                return_exceptions=True,
+            )
+            for i, outcome in zip(retry, singles_out):
+                if isinstance(outcome, BaseException):
+                    results[i] = {"error": str(outcome), "document_type": "other"}
+                else:
+                    results[i] = outcome
+
+        return results
+
+    async def _run_batch(
+        self, routes: List[ProviderRoute], texts: List[str], tenant: Optional[str] = None
+    ) -> Dict[int, Dict[str, Any]]:
+        """Sends one multi-document request and splits the response."""
+        context = ParserPromptManager.build_batch_context(texts)
+        template = ParserPromptManager.get_batch_parse_template()
+        deadline = time.monotonic() + self.api_timeout
+
+        async def invoke(route: ProviderRoute) -> Dict[int, Dict[str, Any]]:
+            chain = template | route.llm
+            logger.debug(f"Invoking LLM {route.name} with a batch of {len(texts)} documents.")
+            result = await route.limiter.execute_with_retry(
+                chain.ainvoke, {"context": context}, priority=10,
+                estimated_tokens=ParserPromptManager.estimate_call_tokens(context, batch=True),
+                tenant=tenant,
+                deadline=deadline,
+            )
+            return ParserOutputProcessor.split_batch_output(result.content, len(texts))
+
+        split, _ = await asyncio.wait_for(
+            self.router.run(routes, invoke, bool),
+            timeout=self.api_timeout,
+        )
+        return split
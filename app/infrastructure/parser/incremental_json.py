@@ -0,0 +1,171 @@
+"""
+Incremental JSON parser for streamed LLM output.
+Consumes text chunks and emits top-level fields and the elements of selected
+top-level arrays (e.g. bank statement transactions) as soon as each one is
+complete, instead of waiting for the whole completion.
+"""
+
+import json
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ("field", key, value) for a completed top-level field,
+# ("item", key, value) for a completed element of a streamed array.
+ParseEvent = Tuple[str, str, Any]
+
+STREAMED_ARRAYS = ("transactions", "line_items", "items")
+
+
+class IncrementalJSONParser:
+    """
+    Single-pass scanner over one top-level JSON object.
+    Text before the opening brace (e.g. a markdown fence) and after the
+    closing brace is ignored. Only the slices of completed values are
+    handed to json.loads, so every character is scanned once.
+    """
+
+    def __init__(self, stream_arrays: Iterable[str] = STREAMED_ARRAYS):
+        self.stream_arrays = set(stream_arrays)
+        self.document: Dict[str, Any] = {}
+        self.complete = False
+        self.failed = False
+
+        self._buf = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "root"       # root | key | colon | value | scalar | after_value
+        self._key: Optional[str] = None
+        self._key_start: Optional[int] = None
+        self._value_start: Optional[int] = None
+        self._array_key: Optional[str] = None
+        self._item_start: Optional[int] = None
+
+    @property
+    def text(self) -> str:
+        """Everything fed so far, for fallback extraction."""
+        return self._buf
+
+    def feed(self, chunk: str) -> List[ParseEvent]:
+        """Consumes a chunk and returns the events it completed."""
+        self._buf += chunk
+        events: List[ParseEvent] = []
+        if self.complete or self.failed:
+            return events
+
+        try:
+            self._scan(events)
+        except ValueError as e:
+            logger.warning(f"Incremental JSON parse failed, will fall back to full extraction: {e}")
+            self.failed = True
+        return events
+
+    def _scan(self, events: List[ParseEvent]):
+        buf = self._buf
+        i = self._pos
+        n = len(buf)
+
+        while i < n and not self.complete:
+            c = buf[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._key_start is not None:
+                        self._key = json.loads(buf[self._key_start:i + 1])
+                        self._key_start = None
+                        self._expect = "colon"
+                i += 1
+                continue
+
+            if self._expect == "root":
+                if c == "{":
+                    self._depth = 1
+                    self._expect = "key"
+                i += 1
+                continue
+
+            if c in " \t\r\n":
+                i += 1
+                continue
+
+            if self._depth == 1:
+                self._scan_top_level(c, i, events)
+            else:
+                self._scan_nested(c, i, events)
+            i += 1
+
+        self._pos = i
+
+    def _scan_top_level(self, c: str, i: int, events: List[ParseEvent]):
+        if self._expect == "key":
+            if c == '"':
+                self._in_string = True
+                self._key_start = i
+            elif c == "}":
+                self.complete = True
+        elif self._expect == "colon":
+            if c == ":":
+                self._expect = "value"
+        elif self._expect == "value":
+            self._value_start = i
+            if c in "{[":
+                self._depth += 1
+                if c == "[" and self._key in self.stream_arrays:
+                    self._array_key = self._key
+                    self.document[self._key] = []
+            else:
+                self._expect = "scalar"
+                if c == '"':
+                    self._in_string = True
+        elif self._expect in ("scalar", "after_value"):
+            if c in ",}":
+                if self._expect == "scalar":
+                    self._emit_field(json.loads(self._buf[self._value_start:i]), events)
+                self._expect = "key"
+                if c == "}":
+                    self.complete = True
+
+    def _scan_nested(self, c: str, i: int, events: List[ParseEvent]):
+        at_item_level = self._array_key is not None and self._depth == 2
+
+        if c in "{[":
+            if at_item_level and self._item_start is None:
+                self._item_start = i
+            self._depth += 1
+        elif c in "}]":
+            if at_item_level and c == "]" and self._item_start is not None:
+                # Closing the array right after a scalar element
+                self._emit_item(json.loads(self._buf[self._item_start:i]), events)
+            self._depth -= 1
+            if self._array_key is not None and self._depth == 2 and self._item_start is not None:
+                self._emit_item(json.loads(self._buf[self._item_start:i + 1]), events)
+            if self._depth == 1:
+                if self._array_key is None:
+                    self._emit_field(json.loads(self._buf[self._value_start:i + 1]), events)
+                self._array_key = None
+                self._expect = "after_value"
+        elif c == ",":
+            if at_item_level and self._item_start is not None:
+                self._emit_item(json.loads(self._buf[self._item_start:i]), events)
+        else:
+            if at_item_level and self._item_start is None:
+                self._item_start = i
+            if c == '"':
+                self._in_string = True
+
+    def _emit_field(self, value: Any, events: List[ParseEvent]):
+        self.document[self._key] = value
+        events.append(("field", self._key, value))
+
+    def _emit_item(self, value: Any, events: List[ParseEvent]):
+        self.document[self._array_key].append(value)
+        events.append(("item", self._array_key, value))
+        self._item_start = None
@@ -0,0 +1,158 @@
+"""
+Multi-provider routing for parser LLM calls.
+Fails over to the next configured provider and optionally hedges a slow
+primary call with a duplicate request, taking the first valid result.
+"""
+
+import asyncio
+import time
+import logging
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from app.core.exceptions import ExternalServiceError
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ProviderRoute:
+    """One provider the router can send a parse request to."""
+    name: str
+    llm: Any
+    limiter: Any
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies for one provider."""
+
+    def __init__(self, window: int = 200):
+        self._samples: Deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        self._samples.append(seconds)
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+        return ordered[idx]
+
+
+class ParseRouter:
+    """
+    Runs a request against an ordered list of providers.
+    - Failover: when a provider errors or returns invalid output, the next one is tried.
+    - Hedging: when the primary has not answered within its latency percentile,
+      the next provider is started in parallel and the first valid result wins.
+    Each provider keeps its own rate limiter, so a throttled provider never
+    consumes another provider's budget.
+    """
+
+    def __init__(
+        self,
+        hedge_percentile: Optional[float] = None,
+        hedge_min_samples: int = 20,
+        min_hedge_delay: float = 1.0,
+    ):
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.min_hedge_delay = min_hedge_delay
+        self._latency: Dict[str, LatencyTracker] = {}
+
+    def _tracker(self, name: str) -> LatencyTracker:
+        if name not in self._latency:
+            self._latency[name] = LatencyTracker()
+        return self._latency[name]
+
+    def hedge_delay(self, route: ProviderRoute) -> Optional[float]:
+        """Seconds to wait on a route before hedging; None if hedging is off or not warmed up."""
+        if self.hedge_percentile is None:
+            return None
+        tracker = self._tracker(route.name)
+        if len(tracker) < self.hedge_min_samples:
+            return None
+        return max(self.min_hedge_delay, tracker.percentile(self.hedge_percentile))
+
+    @staticmethod
+    async def _order(routes: List[ProviderRoute]) -> List[ProviderRoute]:
+        """Moves providers that are cooling down after a 429 to the back."""
+        throttled = [await r.limiter.is_throttled() for r in routes]
+        return [r for r, t in zip(routes, throttled) if not t] + [r for r, t in zip(routes, throttled) if t]
+
+    async def run(
+        self,
+        routes: List[ProviderRoute],
+        invoke: Callable[[ProviderRoute], Awaitable[Any]],
+        validate: Callable[[Any], bool],
+    ) -> Tuple[Any, ProviderRoute]:
+        """
+        Returns (result, route) for the first valid result.
+        If every provider answers but none validly, the last answer is returned
+        so callers keep their existing error-dict behaviour.
+        """
+        queue = await self._order(routes)
+        tasks: Dict[asyncio.Task, Tuple[ProviderRoute, float]] = {}
+        last_result: Optional[Tuple[Any, ProviderRoute]] = None
+        last_error: Optional[BaseException] = None
+        hedged = False
+
+        def launch():
+            route = queue.pop(0)
+            task = asyncio.ensure_future(invoke(route))
+            tasks[task] = (route, time.monotonic())
+            return route
+
+        try:
+            primary = launch()
+            while tasks:
+                timeout = None
+                if queue and not hedged:
+                    timeout = self.hedge_delay(primary)
+
+                done, _ = await asyncio.wait(tasks, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    hedged = True
+                    route = launch()
+                    logger.info(f"Parser hedge: {primary.name} slower than p{self.hedge_percentile:g}, also trying {route.name}")
+                    continue
+
+                for task in done:
+                    route, started = tasks.pop(task)
+                    if task.exception() is not None:
+                        last_error = task.exception()
+                        logger.warning(f"Parser provider {route.name} failed: {last_error}")
+                        continue
+                    result = task.result()
+                    if validate(result):
+                        now = time.monotonic()
+                        self._tracker(route.name).record(now - started)
+                        # Losers (e.g. a slow primary beaten by the hedge) took at least this
+                        # long; without the lower bound their percentile drifts fast
+                        for loser, loser_started in tasks.values():
+                            self._tracker(loser.name).record(now - loser_started)
+                        return result, route
+                    logger.warning(f"Parser provider {route.name} returned invalid output")
+                    last_result = (result, route)
+
+                # Failover once nothing is left in flight
+                if not tasks and queue:
+                    route = launch()
+                    logger.info(f"Parser failover to {route.name}")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        if last_result is not None:
+            return last_result
+        raise ExternalServiceError(
+            f"All parser providers failed: {last_error}",
+            service_name="LLM_Parser",
+            original_error=last_error,
+        )
@@ -4,21 +4,73 @@ Rate Limiter Package.
 Exposes the public API for rate limiting using the new modular structure.
 """
 
+import os
+import time
+import hashlib
+import logging
+from collections import OrderedDict
 from typing import Dict, Optional
 
 from app.infrastructure.rate_limiter.types import APIProvider
 from app.infrastructure.rate_limiter.service import RateLimiter
 
-__all__ = ["get_rate_limiter", "RateLimiter", "APIProvider"]
+__all__ = ["get_rate_limiter", "list_rate_limiters", "RateLimiter", "APIProvider", "key_fingerprint"]
+
+logger = logging.getLogger(__name__)
+
+# Limiters for user-supplied API keys are evicted once idle this long, or
+# least-recently-used first once there are more than RATE_LIMIT_MAX_KEYED.
+RATE_LIMIT_KEY_IDLE_SECONDS = float(os.getenv("RATE_LIMIT_KEY_IDLE_SECONDS", "3600"))
+RATE_LIMIT_MAX_KEYED = int(os.getenv("RATE_LIMIT_MAX_KEYED", "256"))
 
 _registry: Dict[str, RateLimiter] = {}
+_keyed: "OrderedDict[str, float]" = OrderedDict()   # registry name -> last access (monotonic)
+
+
+def key_fingerprint(api_key: str) -> str:
+    """Stable, non-reversible id for an API key (safe to log and to use as a store key)."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+
 
 def get_rate_limiter(
     name: str = "default",
     provider: APIProvider = APIProvider.GEMINI_FREE,
+    api_key: Optional[str] = None,
     **kwargs
 ) -> RateLimiter:
-    """Singleton Registry access."""
+    """
+    Singleton Registry access.
+    With `api_key`, returns a limiter dedicated to that key, so each
+    user-supplied key gets its own quota instead of sharing `name`'s bucket.
+    """
+    if api_key:
+        name = f"{name}:{key_fingerprint(api_key)}"
+        _keyed[name] = time.monotonic()
+        _keyed.move_to_end(name)
+
     if name not in _registry:
-        _registry[name] = RateLimiter(provider)
+        _registry[name] = RateLimiter(provider, name=name)
+        if api_key:
+            _evict_idle_keyed()
     return _registry[name]
+
+
+def list_rate_limiters() -> Dict[str, RateLimiter]:
+    """Copy of the registry (name -> limiter), for monitoring."""
+    return dict(_registry)
+
+
+def _evict_idle_keyed():
+    """Drops keyed limiters that are idle past the TTL, then LRU ones over the size cap."""
+    now = time.monotonic()
+    for name, last_used in list(_keyed.items()):
+        over_cap = len(_keyed) > RATE_LIMIT_MAX_KEYED
+        expired = now - last_used > RATE_LIMIT_KEY_IDLE_SECONDS
+        if not (over_cap or expired):
+            break  # ordered by last access, so the rest are newer
+        limiter = _registry.get(name)
+        if limiter is not None and not limiter.is_idle():
+            continue
+        _keyed.pop(name)
+        _registry.pop(name, None)
+        logger.debug(f"Evicted idle rate limiter {name}")
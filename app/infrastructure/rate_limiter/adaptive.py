@@ -0,0 +1,98 @@
+"""
+Adaptive Limits from Provider Response Headers.
+
+OpenAI-compatible providers (Groq included) report their real limits on every
+response:
+    x-ratelimit-limit-requests / x-ratelimit-remaining-requests / x-ratelimit-reset-requests
+    x-ratelimit-limit-tokens   / x-ratelimit-remaining-tokens   / x-ratelimit-reset-tokens
+    retry-after (on 429)
+An httpx response hook feeds them to the RateLimiter, which resizes its
+buckets to the key's actual tier and pauses before the quota runs out.
+"""
+
+import re
+import logging
+from dataclasses import dataclass
+from typing import Any, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+
+
+def parse_duration(value: Optional[str]) -> Optional[float]:
+    """Parses "7.66s", "2m59.56s", "120ms", "1h2m" or plain seconds ("30") into seconds."""
+    if value is None:
+        return None
+    value = value.strip().lower()
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    scale = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+    return sum(float(number) * scale[unit] for number, unit in parts)
+
+
+def _int(value: Optional[str]) -> Optional[int]:
+    try:
+        return int(float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+@dataclass
+class RateLimitHeaders:
+    """Rate limit state reported by the provider on one response."""
+    limit_requests: Optional[int] = None
+    remaining_requests: Optional[int] = None
+    reset_requests: Optional[float] = None
+    limit_tokens: Optional[int] = None
+    remaining_tokens: Optional[int] = None
+    reset_tokens: Optional[float] = None
+    retry_after: Optional[float] = None
+
+    @classmethod
+    def parse(cls, headers: Mapping[str, str]) -> Optional["RateLimitHeaders"]:
+        """Returns None when the response carries no rate limit headers."""
+        parsed = cls(
+            limit_requests=_int(headers.get("x-ratelimit-limit-requests")),
+            remaining_requests=_int(headers.get("x-ratelimit-remaining-requests")),
+            reset_requests=parse_duration(headers.get("x-ratelimit-reset-requests")),
+            limit_tokens=_int(headers.get("x-ratelimit-limit-tokens")),
+            remaining_tokens=_int(headers.get("x-ratelimit-remaining-tokens")),
+            reset_tokens=parse_duration(headers.get("x-ratelimit-reset-tokens")),
+            retry_after=parse_duration(headers.get("retry-after")),
+        )
+        if all(v is None for v in vars(parsed).values()):
+            return None
+        return parsed
+
+
+def headers_from_error(e: BaseException) -> Optional[RateLimitHeaders]:
+    """Headers of the HTTP response attached to an SDK error (groq/openai APIStatusError), if any."""
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers is None:
+        return None
+    return RateLimitHeaders.parse(headers)
+
+
+def build_observing_client(limiter: Any, timeout: float = 60.0) -> "httpx.AsyncClient":
+    """
+    httpx client for the provider SDK (e.g. ChatGroq(http_async_client=...))
+    that reports every response's rate limit headers to `limiter`.
+    """
+    import httpx  # only needed by the LLM factories; keeps the limiter core dependency-free
+
+    async def on_response(response: "httpx.Response"):
+        headers = RateLimitHeaders.parse(response.headers)
+        if headers is not None:
+            try:
+                await limiter.apply_rate_limit_headers(headers)
+            except Exception as e:
+                logger.warning(f"Failed to apply rate limit headers: {e}")
+
+    return httpx.AsyncClient(timeout=timeout, event_hooks={"response": [on_response]})
@@ -6,26 +6,39 @@ Circuit Breaker Pattern for Rate Limiting.
 import time
 from typing import Optional
 
+from app.infrastructure.rate_limiter.store import StateStore
+
 class CircuitBreaker:
     """
     Manages the 'Cooldown' state when an external API returns a 429.
+    With a shared store, a trip in one worker cools down every worker.
     """
-    def __init__(self, default_cooldown: float):
+    def __init__(self, default_cooldown: float, store: Optional[StateStore] = None, key: str = ""):
         self._default_cooldown = default_cooldown
         self._retry_after_ts: float = 0.0
+        self._store = store
+        self._key = key
 
-    def trip(self, wait_seconds: Optional[float] = None):
+    async def trip(self, wait_seconds: Optional[float] = None):
         """Activates the circuit breaker."""
         wait = wait_seconds if wait_seconds is not None else self._default_cooldown
+        if self._store is not None:
+            await self._store.set_cooldown(self._key, wait)
+            return
         self._retry_after_ts = time.monotonic() + wait
 
-    def reset(self):
+    async def reset(self):
         """Resets the circuit breaker (on success)."""
+        if self._store is not None:
+            await self._store.clear_cooldown(self._key)
+            return
         self._retry_after_ts = 0.0
 
-    def is_open(self) -> bool:
+    async def is_open(self) -> bool:
         """Returns True if we are mostly likely still blocked."""
-        return time.monotonic() < self._retry_after_ts
+        return await self.time_remaining() > 0.0
 
-    def time_remaining(self) -> float:
+    async def time_remaining(self) -> float:
+        if self._store is not None:
+            return await self._store.cooldown_remaining(self._key)
         return max(0.0, self._retry_after_ts - time.monotonic())
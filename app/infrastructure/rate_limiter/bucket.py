@@ -4,34 +4,84 @@ Token Bucket Algorithm Implementation.
 """
 
 import time
+from typing import Optional
+
+from app.infrastructure.rate_limiter.store import StateStore
 
 class TokenBucket:
     """
-    Pure logic component. Handles token math.
-    Not aware of async, threads, or retries.
+    Pure logic component. Handles token math; not aware of threads or retries.
+    With a shared store, the token state lives there under `key` instead,
+    which is why balance operations are awaitable.
     """
-    def __init__(self, capacity: int, refill_rate: float):
+    def __init__(self, capacity: int, refill_rate: float, store: Optional[StateStore] = None, key: str = ""):
         self._capacity = float(capacity)
         self._tokens = float(capacity)
         self._refill_rate = refill_rate
         self._last_refill = time.monotonic()
+        self._store = store
+        self._key = key
 
-    def try_consume(self, cost: float = 1.0) -> bool:
+    async def try_consume(self, cost: float = 1.0) -> bool:
         """Attempts to consume tokens. Returns True if successful."""
+        if self._store is not None:
+            return await self._store.consume(self._key, cost, self._capacity, self._refill_rate) <= 0.0
         self._refill()
         if self._tokens >= cost:
             self._tokens -= cost
             return True
         return False
 
-    def get_wait_time(self, cost: float) -> float:
+    async def get_wait_time(self, cost: float) -> float:
         """Returns seconds to wait until enough tokens are available."""
+        if self._store is not None:
+            return await self._store.wait_time(self._key, cost, self._capacity, self._refill_rate)
         self._refill()
         needed = cost - self._tokens
         if needed <= 0:
             return 0.0
         return needed / self._refill_rate
 
+    async def adjust(self, delta: float):
+        """Charges (positive) or refunds (negative) tokens after the fact; may leave a debt."""
+        if self._store is not None:
+            await self._store.adjust(self._key, delta, self._capacity, self._refill_rate)
+            return
+        self._refill()
+        self._tokens = min(self._capacity, self._tokens - delta)
+
+    async def sync(self, available: float):
+        """Lowers the balance to what the provider reports as remaining (never raises it)."""
+        if self._store is not None:
+            await self._store.cap(self._key, available, self._capacity, self._refill_rate)
+            return
+        self._refill()
+        self._tokens = min(self._tokens, available)
+
+    def reconfigure(self, capacity: float, refill_rate: float):
+        """Resizes the bucket at runtime, e.g. to the limits reported by the provider."""
+        if self._store is None:
+            self._refill()
+            self._tokens = min(float(capacity), self._tokens)
+        self._capacity = float(capacity)
+        self._refill_rate = refill_rate
+
+    async def available(self) -> float:
+        """Current balance (negative while a debt from adjust() is being paid off), for monitoring."""
+        if self._store is not None:
+            wait = await self._store.wait_time(self._key, self._capacity, self._capacity, self._refill_rate)
+            return self._capacity - wait * self._refill_rate
+        self._refill()
+        return self._tokens
+
+    @property
+    def capacity(self) -> float:
+        return self._capacity
+
+    @property
+    def refill_rate(self) -> float:
+        return self._refill_rate
+
     def _refill(self):
         now = time.monotonic()
         elapsed = now - self._last_refill
@@ -0,0 +1,185 @@
+"""
+Adaptive Concurrency (In-Flight) Limiting.
+
+The token bucket controls how often calls start; this caps how many are open
+at once. The cap follows AIMD: it grows by ~1 per round trip while calls are
+fast, and shrinks multiplicatively on 429s, timeouts, or when latency drifts
+well above its baseline (the provider is queueing us).
+
+Latency is compared per unit of request size (1k estimated tokens), using the
+median of a recent window against a baseline that follows the window's lows
+but drifts back up, so a mix of short receipts and long statements is not
+mistaken for overload. Slots are granted by the PriorityScheduler together
+with the rate limit token, so priority and tenant fairness still apply and a
+token is never spent while the call waits for a slot.
+"""
+
+import asyncio
+import time
+import logging
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+_OVERLOAD_MARKERS = ("429", "rate limit", "timeout", "timed out", "503", "overloaded")
+
+
+def is_overload_error(e: BaseException) -> bool:
+    """True for errors that mean the provider is saturated."""
+    if isinstance(e, asyncio.TimeoutError):
+        return True
+    err = str(e).lower()
+    return any(marker in err for marker in _OVERLOAD_MARKERS)
+
+
+class ConcurrencySlot:
+    """Handle for one in-flight call; lets streaming callers report time-to-first-token."""
+
+    def __init__(self, size: float = 1.0):
+        self.started = time.monotonic()
+        self.size = size
+        self.latency: Optional[float] = None
+
+    def set_latency(self, seconds: float):
+        self.latency = seconds
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    AIMD in-flight limit.
+    - Windowed median of size-normalised latency within `latency_tolerance` x
+      baseline: limit += 1 / limit (only while the limit is actually being used).
+    - Overload error or median above that: limit *= backoff_ratio.
+    Slots are taken with try_acquire() (by the scheduler) and returned when the
+    slot() block ends; `on_release` is called whenever one frees up.
+    """
+
+    def __init__(
+        self,
+        initial_limit: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        backoff_ratio: float = 0.75,
+        latency_tolerance: float = 2.0,
+        window: int = 50,
+        baseline_drift: float = 0.02,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.latency_tolerance = latency_tolerance
+        self.baseline_drift = baseline_drift
+        self.on_release: Optional[Callable[[], None]] = None
+
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self._in_flight = 0
+
+        self._samples: Deque[float] = deque(maxlen=window)  # seconds per size unit
+        self._baseline: Optional[float] = None   # no-load normalised latency estimate
+        self._recent: Optional[float] = None     # fast EWMA of raw latency (round trip)
+        self._increases = 0
+        self._decreases = 0
+        self._completed = 0
+        self._last_decrease = 0.0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def has_capacity(self) -> bool:
+        return self._in_flight < self.limit
+
+    def try_acquire(self) -> bool:
+        """Takes a slot if one is free."""
+        if not self.has_capacity():
+            return False
+        self._in_flight += 1
+        return True
+
+    def release(self, latency: Optional[float] = None, overloaded: bool = False, failed: bool = False,
+                size: float = 1.0) -> None:
+        """Returns a slot and adapts the limit from the call's outcome (none if latency is None)."""
+        self._in_flight -= 1
+        if overloaded:
+            self._decrease()
+        elif not failed and latency is not None:
+            self._on_success(latency, size)
+        if self.on_release is not None:
+            self.on_release()
+
+    @asynccontextmanager
+    async def slot(self, size: float = 1.0) -> AsyncIterator[ConcurrencySlot]:
+        """
+        Runs a call in a slot already taken with try_acquire() and releases it.
+        `size` is the request size in units of 1k estimated tokens.
+        """
+        handle = ConcurrencySlot(size)
+        overloaded = failed = False
+        try:
+            yield handle
+        except BaseException as e:
+            overloaded = is_overload_error(e)
+            failed = True
+            raise
+        finally:
+            latency = handle.latency if handle.latency is not None else time.monotonic() - handle.started
+            self.release(latency, overloaded=overloaded, failed=failed, size=size)
+
+    def _normalised_p50(self) -> Optional[float]:
+        if not self._samples:
+            return None
+        ordered = sorted(self._samples)
+        return ordered[len(ordered) // 2]
+
+    def _on_success(self, latency: float, size: float = 1.0):
+        self._completed += 1
+        self._recent = latency if self._recent is None else 0.7 * self._recent + 0.3 * latency
+        self._samples.append(latency / max(1.0, size))
+        current = self._normalised_p50()
+
+        # Baseline follows the window's lows but drifts back up, so one lucky
+        # fast period cannot pin it and make normal latency look like overload
+        if self._baseline is None or current < self._baseline:
+            self._baseline = current
+        else:
+            self._baseline += (current - self._baseline) * self.baseline_drift
+
+        if current > self.latency_tolerance * self._baseline:
+            self._decrease()
+            return
+
+        # Only grow when the current limit is the bottleneck
+        if self._in_flight + 1 >= self.limit and self._limit < self.max_limit:
+            self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+            self._increases += 1
+
+    def _decrease(self):
+        # One multiplicative decrease per round trip; a burst of 429s is one signal
+        now = time.monotonic()
+        if now - self._last_decrease < (self._recent or 1.0):
+            return
+        self._last_decrease = now
+        new_limit = max(self.min_limit, self._limit * self.backoff_ratio)
+        if int(new_limit) < self.limit:
+            logger.info(f"Concurrency limit reduced {self.limit} -> {int(new_limit)}")
+        self._limit = new_limit
+        self._decreases += 1
+
+    def snapshot(self) -> Dict[str, float]:
+        current = self._normalised_p50()
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "latency_ms": round(self._recent * 1000, 1) if self._recent is not None else None,
+            "p50_ms_per_unit": round(current * 1000, 1) if current is not None else None,
+            "baseline_ms_per_unit": round(self._baseline * 1000, 1) if self._baseline is not None else None,
+            "completed": self._completed,
+            "increases": self._increases,
+            "decreases": self._decreases,
+        }
@@ -0,0 +1,64 @@
+"""
+Token Cost Estimation for LLM Calls.
+Estimates a request's input + output tokens before the call (tiktoken when
+installed) and reads the real count from usage metadata afterwards.
+"""
+
+import os
+from typing import Any, Optional
+
+try:
+    import tiktoken
+    _TOKEN_ENCODING = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _TOKEN_ENCODING = None
+
+# Output tokens assumed per call until usage metadata corrects it
+RATE_LIMIT_OUTPUT_TOKEN_ESTIMATE = int(os.getenv("RATE_LIMIT_OUTPUT_TOKEN_ESTIMATE", "500"))
+
+
+def estimate_tokens(text: str) -> int:
+    """Token estimate using tiktoken when available, ~4 chars/token otherwise."""
+    if _TOKEN_ENCODING is not None:
+        return len(_TOKEN_ENCODING.encode(text, disallowed_special=()))
+    return len(text) // 4 + 1
+
+
+def estimate_payload_tokens(payload: Any) -> int:
+    """
+    Input tokens for a call argument: a string, a prompt-variables dict,
+    a list of messages (langchain or dicts) or a prompt value.
+    """
+    if payload is None:
+        return 0
+    if isinstance(payload, str):
+        return estimate_tokens(payload)
+    if isinstance(payload, dict):
+        if "content" in payload:
+            return estimate_payload_tokens(payload["content"]) + 4
+        return sum(estimate_payload_tokens(v) for v in payload.values())
+    if isinstance(payload, (list, tuple)):
+        return sum(estimate_payload_tokens(item) for item in payload)
+    if hasattr(payload, "to_messages"):
+        return estimate_payload_tokens(payload.to_messages())
+    if hasattr(payload, "content"):
+        return estimate_payload_tokens(payload.content) + 4  # per-message overhead
+    return 0
+
+
+def estimate_call_tokens(payload: Any, output_tokens: int = RATE_LIMIT_OUTPUT_TOKEN_ESTIMATE) -> int:
+    """Input estimate plus the expected completion size."""
+    return estimate_payload_tokens(payload) + output_tokens
+
+
+def usage_tokens(result: Any) -> Optional[int]:
+    """Total tokens reported by the provider, or None if the result carries no usage."""
+    usage = getattr(result, "usage_metadata", None)
+    if isinstance(usage, dict) and usage.get("total_tokens"):
+        return int(usage["total_tokens"])
+
+    metadata = getattr(result, "response_metadata", None) or {}
+    token_usage = metadata.get("token_usage") or metadata.get("usage") or {}
+    if isinstance(token_usage, dict) and token_usage.get("total_tokens"):
+        return int(token_usage["total_tokens"])
+    return None
@@ -1,83 +1,413 @@
-
 """
 Priority Queue Scheduler for API Requests.
 """
 
 import asyncio
+import math
+import os
 import time
-import heapq
 import logging
-from typing import List, Optional
-from dataclasses import dataclass, field
+from collections import deque
+from typing import Deque, Dict, List, Optional
+from dataclasses import dataclass
 
+from app.core.exceptions import RateLimitExceededError
+from app.core.metrics import Counter, Histogram
 from app.infrastructure.rate_limiter.bucket import TokenBucket
 from app.infrastructure.rate_limiter.breaker import CircuitBreaker
+from app.infrastructure.rate_limiter.concurrency import AdaptiveConcurrencyLimiter
 
 logger = logging.getLogger(__name__)
 
-@dataclass(order=True)
+DEFAULT_TENANT = "default"
+
+
+def _parse_weights(raw: str) -> Dict[str, float]:
+    """Parses "tenantA=2,tenantB=0.5" into a weight map."""
+    weights: Dict[str, float] = {}
+    for part in raw.split(","):
+        if "=" in part:
+            tenant, _, weight = part.partition("=")
+            try:
+                weights[tenant.strip()] = max(0.01, float(weight))
+            except ValueError:
+                logger.warning(f"Ignoring invalid tenant weight: {part!r}")
+    return weights
+
+
+# Relative share of capacity per tenant; unlisted tenants get 1.0
+RATE_LIMIT_TENANT_WEIGHTS = _parse_weights(os.getenv("RATE_LIMIT_TENANT_WEIGHTS", ""))
+
+
+@dataclass
 class _QueueItem:
-    """Internal item for the priority queue."""
+    """Internal item for the scheduler queues."""
     priority: int
     timestamp: float
-    future: asyncio.Future = field(compare=False)
+    future: asyncio.Future
+    tokens: float = 0.0
+    tenant: str = DEFAULT_TENANT
+    deadline: Optional[float] = None  # time.monotonic() by which the slot must be granted
+
+
+@dataclass
+class _TenantStats:
+    queued: int = 0
+    released: int = 0
+    avg_wait: float = 0.0   # EWMA of queue wait for released requests
+
+
+class _FairQueue:
+    """
+    Deficit round robin over tenants within one priority level.
+    Every request costs one unit; each visit credits a tenant its weight, so a
+    tenant with weight 2 gets twice the releases of a weight-1 tenant while
+    both have work queued. Requests of one tenant stay FIFO.
+    """
+
+    def __init__(self, weights: Dict[str, float]):
+        self._weights = weights
+        self._queues: Dict[str, Deque[_QueueItem]] = {}
+        self._active: Deque[str] = deque()
+        self._deficit: Dict[str, float] = {}
+        self.size = 0
+        self.tokens = 0.0
+
+    def __len__(self) -> int:
+        return len(self._active)
+
+    def push(self, item: _QueueItem):
+        queue = self._queues.get(item.tenant)
+        if queue is None:
+            queue = self._queues[item.tenant] = deque()
+            self._active.append(item.tenant)
+            self._deficit[item.tenant] = 0.0
+        queue.append(item)
+        self.size += 1
+        self.tokens += item.tokens
+
+    def head(self) -> _QueueItem:
+        """Next item to release; advances the round robin until a tenant has credit."""
+        while True:
+            tenant = self._active[0]
+            if self._deficit[tenant] >= 1.0:
+                return self._queues[tenant][0]
+            self._deficit[tenant] += self._weights.get(tenant, 1.0)
+            if self._deficit[tenant] < 1.0:
+                self._active.rotate(-1)
+
+    def pop(self) -> _QueueItem:
+        item = self.head()
+        tenant = item.tenant
+        queue = self._queues[tenant]
+        queue.popleft()
+        self.size -= 1
+        self.tokens -= item.tokens
+        self._deficit[tenant] -= 1.0
+        if not queue:
+            # Idle tenants don't bank credit (standard DRR)
+            self._drop_tenant(tenant)
+        elif self._deficit[tenant] < 1.0:
+            self._active.rotate(-1)
+        return item
+
+    def remove(self, item: _QueueItem) -> bool:
+        """Drops a cancelled or expired item from anywhere in the queue without releasing it."""
+        queue = self._queues.get(item.tenant)
+        if queue is None or item not in queue:
+            return False
+        queue.remove(item)
+        self.size -= 1
+        self.tokens -= item.tokens
+        if not queue:
+            self._drop_tenant(item.tenant)
+        return True
+
+    def _drop_tenant(self, tenant: str):
+        del self._queues[tenant]
+        del self._deficit[tenant]
+        self._active.remove(tenant)
+
+    def items(self) -> List[_QueueItem]:
+        return [item for queue in self._queues.values() for item in queue]
+
 
 class PriorityScheduler:
     """
     Async Priority Queue Management.
     Ensures high-priority requests (user chat) skip the line before low-priority (parsing).
+    Within a priority level, tenants (companies) share capacity by weighted
+    deficit round robin, so one bulk upload cannot starve everyone else.
+
+    Event-driven: the processor sleeps exactly until the next token refills or
+    the breaker cooldown ends, and is woken early by enqueues and breaker
+    changes (notify). Queue state lives on a single event loop, so no lock is
+    needed; with a shared store the bucket calls are awaited, and the head is
+    re-checked afterwards in case its caller gave up meanwhile.
     """
-    def __init__(self, bucket: TokenBucket, breaker: CircuitBreaker):
+    def __init__(
+        self,
+        bucket: TokenBucket,
+        breaker: CircuitBreaker,
+        token_bucket: Optional[TokenBucket] = None,
+        provider: str = "default",
+        concurrency: Optional[AdaptiveConcurrencyLimiter] = None,
+    ):
+        self._provider = provider
         self._bucket = bucket
         self._breaker = breaker
-        self._queue: List[_QueueItem] = []
-        self._lock = asyncio.Lock()
+        self._token_bucket = token_bucket
+        self._concurrency = concurrency
+        if concurrency is not None:
+            concurrency.on_release = self.notify
+        self._levels: Dict[int, _FairQueue] = {}
+        self._weights: Dict[str, float] = dict(RATE_LIMIT_TENANT_WEIGHTS)
+        self._stats: Dict[str, _TenantStats] = {}
+        self._wakeup: Optional[asyncio.Event] = None
         self._processor_task: Optional[asyncio.Task] = None
 
-    async def wait_for_slot(self, priority: int) -> None:
-        """Blocks until a slot is available based on priority."""
-        # 1. Optimistic Check: If queue is empty and tokens exist, go!
-        async with self._lock:
-            if not self._queue and not self._breaker.is_open() and self._bucket.try_consume(1.0):
-                return
-            
-            # 2. Enqueue
-            loop = asyncio.get_running_loop()
-            future = loop.create_future()
-            heapq.heappush(self._queue, _QueueItem(priority, time.monotonic(), future))
-            
-            # 3. Ensure background processor is running
-            if not self._processor_task or self._processor_task.done():
-                self._processor_task = loop.create_task(self._process_queue())
-
-        # 4. Wait for our turn
-        await future
+        # Metrics
+        self._queue_wait = Histogram()
+        self._fast_path = Counter()
+        self._rejected = Counter()
+        self._expired = Counter()
+
+    async def wait_for_slot(
+        self,
+        priority: int,
+        tokens: float = 0.0,
+        tenant: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> None:
+        """
+        Blocks until a slot is available based on priority.
+        With a concurrency limiter, returning means an in-flight slot is held
+        too; the caller must run the call in `concurrency.slot()` to return it.
+        `tokens` is the request's LLM token cost, charged to the TPM bucket if configured.
+        `tenant` groups requests for fair queuing (company or user id).
+        `deadline` (time.monotonic()) bounds the wait: requests that cannot be
+        served in time are rejected up front with RateLimitExceededError, and
+        ones that expire while queued are removed without spending tokens.
+        """
+        tenant = tenant or DEFAULT_TENANT
+        stats = self._stats.setdefault(tenant, _TenantStats())
+
+        # 1. Optimistic Check: If queue is empty and budget exists, go!
+        if not self._levels and await self._acquire(tokens) <= 0:
+            stats.released += 1
+            self._fast_path.inc()
+            self._queue_wait.observe(0.0)
+            return
+
+        now = time.monotonic()
+        if deadline is not None:
+            expected = await self.estimate_wait(priority, tokens)
+            if now + expected > deadline:
+                self._rejected.inc()
+                raise RateLimitExceededError(
+                    f"{self._provider} queue cannot serve request before its deadline "
+                    f"(expected wait {expected:.1f}s, {max(0.0, deadline - now):.1f}s left)",
+                    self._provider,
+                    retry_after=math.ceil(expected),
+                )
+
+        # 2. Enqueue
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        level = self._levels.get(priority)
+        if level is None:
+            level = self._levels[priority] = _FairQueue(self._weights)
+        item = _QueueItem(priority, now, future, tokens, tenant, deadline)
+        level.push(item)
+        stats.queued += 1
+        future.add_done_callback(lambda f: self._discard(item) if f.cancelled() else None)
+
+        # 3. Ensure background processor is running, or wake it up
+        if not self._processor_task or self._processor_task.done():
+            self._processor_task = loop.create_task(self._process_queue())
+        else:
+            self.notify()
+
+        # 4. Wait for our turn (cancellation or timeout dequeues via the done callback)
+        try:
+            if deadline is None:
+                await future
+            else:
+                await asyncio.wait_for(future, timeout=max(0.0, deadline - time.monotonic()))
+        except asyncio.TimeoutError:
+            self._expired.inc()
+            raise RateLimitExceededError(
+                f"{self._provider} request expired in queue", self._provider, retry_after=1
+            )
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled() and future.exception() is None:
+                # Released just as the caller was cancelled; hand the slot back
+                self._return_slot()
+            raise
+
+    async def estimate_wait(self, priority: int, tokens: float = 0.0) -> float:
+        """
+        Seconds until a new request at `priority` would be released, given the
+        work already queued at the same or higher priority and the refill rates.
+        """
+        ahead = [level for p, level in self._levels.items() if p <= priority]
+        wait = await self._bucket.get_wait_time(1.0 + sum(level.size for level in ahead))
+        if self._token_bucket is not None and tokens > 0:
+            queued_tokens = sum(level.tokens for level in ahead)
+            wait = max(wait, await self._token_bucket.get_wait_time(queued_tokens + tokens))
+        return max(wait, await self._breaker.time_remaining())
+
+    def _discard(self, item: _QueueItem):
+        """Removes a cancelled/expired item; idempotent."""
+        level = self._levels.get(item.priority)
+        if level is None or not level.remove(item):
+            return
+        if not level:
+            del self._levels[item.priority]
+        self._stats[item.tenant].queued -= 1
+
+    def set_tenant_weight(self, tenant: str, weight: float) -> None:
+        """Gives a tenant a larger (or smaller) share of capacity than the default 1.0."""
+        self._weights[tenant] = max(0.01, weight)
+
+    def queue_depth(self) -> int:
+        return sum(level.size for level in self._levels.values())
+
+    def get_state(self) -> Dict[str, object]:
+        """Queue depth per priority level, admission counters and the queue wait histogram."""
+        return {
+            "queue_depth": self.queue_depth(),
+            "queue_depth_by_priority": {p: level.size for p, level in sorted(self._levels.items())},
+            "released_immediately": int(self._fast_path.value),
+            "rejected_deadline": int(self._rejected.value),
+            "expired_in_queue": int(self._expired.value),
+            "queue_wait_s": self._queue_wait.snapshot(),
+        }
+
+    def tenant_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-tenant queue depth, oldest queued age and average wait (seconds)."""
+        now = time.monotonic()
+        oldest: Dict[str, float] = {}
+        for level in self._levels.values():
+            for item in level.items():
+                oldest[item.tenant] = max(oldest.get(item.tenant, 0.0), now - item.timestamp)
+        return {
+            tenant: {
+                "queued": stats.queued,
+                "released": stats.released,
+                "avg_wait_s": round(stats.avg_wait, 3),
+                "oldest_wait_s": round(oldest.get(tenant, 0.0), 3),
+            }
+            for tenant, stats in self._stats.items()
+        }
+
+    def _release(self, level: _FairQueue, priority: int):
+        item = level.pop()
+        if not level:
+            del self._levels[priority]
+        stats = self._stats[item.tenant]
+        stats.queued -= 1
+        stats.released += 1
+        wait = time.monotonic() - item.timestamp
+        stats.avg_wait = wait if stats.released == 1 else 0.8 * stats.avg_wait + 0.2 * wait
+        self._queue_wait.observe(wait)
+        if not item.future.done():
+            item.future.set_result(True)
+        else:
+            self._return_slot()
+
+    def notify(self) -> None:
+        """Wakes the processor to re-evaluate (enqueue, breaker trip/reset, freed slot)."""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _return_slot(self):
+        if self._concurrency is not None:
+            self._concurrency.release()
+
+    async def _acquire(self, tokens: float) -> float:
+        """
+        Takes an in-flight slot, one request and `tokens` from every configured
+        dimension at once. Returns 0 on success, otherwise seconds until all of
+        them could be available (inf: until a slot frees up and notify() runs).
+        The slot is checked first so no token is spent on a call that must wait.
+        """
+        if self._concurrency is not None and not self._concurrency.has_capacity():
+            return math.inf
+        cooldown = await self._breaker.time_remaining()
+        if cooldown > 0:
+            return cooldown
+
+        charge_tokens = self._token_bucket is not None and tokens > 0
+        wait = await self._bucket.get_wait_time(1.0)
+        if charge_tokens:
+            wait = max(wait, await self._token_bucket.get_wait_time(tokens))
+        if wait > 0:
+            return wait
+
+        # Both dimensions looked available; a shared store may still lose a race
+        if not await self._bucket.try_consume(1.0):
+            return await self._bucket.get_wait_time(1.0)
+        if charge_tokens and not await self._token_bucket.try_consume(tokens):
+            await self._bucket.adjust(-1.0)
+            return await self._token_bucket.get_wait_time(tokens)
+        if self._concurrency is not None and not self._concurrency.try_acquire():
+            # Taken by another caller while a shared store was consulted
+            await self._refund(tokens, slot=False)
+            return math.inf
+        return 0.0
+
+    async def _refund(self, tokens: float, slot: bool = True):
+        if slot:
+            self._return_slot()
+        await self._bucket.adjust(-1.0)
+        if self._token_bucket is not None and tokens > 0:
+            await self._token_bucket.adjust(-tokens)
 
     async def _process_queue(self):
-        """Background loop to process the queue."""
-        while True:
-            try:
-                async with self._lock:
-                    if not self._queue:
-                        self._processor_task = None
-                        return
-
-                    # Check Cooldown
-                    if self._breaker.is_open():
-                        wait = self._breaker.time_remaining()
-                    # Check Tokens
-                    elif self._bucket.try_consume(1.0):
-                        # SUCCESS: Release top item
-                        item = heapq.heappop(self._queue)
-                        if not item.future.done():
-                            item.future.set_result(True)
-                        continue # Check next immediately
-                    else:
-                        wait = self._bucket.get_wait_time(1.0)
-                
-                # Sleep without holding lock
-                await asyncio.sleep(min(wait, 1.0) if wait > 0 else 0.1)
-
-            except Exception as e:
-                logger.error(f"Scheduler error: {e}")
-                await asyncio.sleep(1.0)
+        """Background loop: releases queued requests as tokens become available."""
+        loop = asyncio.get_running_loop()
+        # Created per run so the event always belongs to the running loop
+        self._wakeup = asyncio.Event()
+        try:
+            while self._levels:
+                try:
+                    priority = min(self._levels)
+                    level = self._levels[priority]
+                    head = level.head()
+                    # Skip entries whose caller gave up, before spending any tokens
+                    if head.future.done():
+                        self._discard(head)
+                        continue
+                    if head.deadline is not None and time.monotonic() >= head.deadline:
+                        self._discard(head)
+                        self._expired.inc()
+                        head.future.set_exception(RateLimitExceededError(
+                            f"{self._provider} request expired in queue", self._provider, retry_after=1
+                        ))
+                        continue
+                    wait = await self._acquire(head.tokens)
+                    if wait <= 0:
+                        if self._levels.get(priority) is not level or level.head() is not head:
+                            # The caller gave up while a shared store was consulted
+                            await self._refund(head.tokens)
+                            continue
+                        self._release(level, priority)
+                        continue
+
+                    # Timed wakeup at the refill/cooldown deadline; notify() wakes earlier
+                    # (and is the only wakeup while waiting for an in-flight slot)
+                    self._wakeup.clear()
+                    timer = loop.call_later(wait, self._wakeup.set) if not math.isinf(wait) else None
+                    try:
+                        await self._wakeup.wait()
+                    finally:
+                        if timer is not None:
+                            timer.cancel()
+
+                except Exception as e:
+                    logger.error(f"Scheduler error: {e}")
+                    await asyncio.sleep(1.0)
+        finally:
+            self._wakeup = None
+            self._processor_task = None
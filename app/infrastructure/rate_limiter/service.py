@@ -6,71 +6,347 @@ Rate Limiter Service Facade.
 import asyncio
 import logging
 import re
-from typing import Callable, Any
+import time
+from collections import deque
+from typing import AsyncIterator, Callable, Any, Deque, Dict, Optional
 
 from app.core.exceptions import RateLimitExceededError, ExternalServiceError
+from app.core.metrics import Counter, Histogram
 from app.infrastructure.rate_limiter.types import APIProvider, LimitConfig
 from app.infrastructure.rate_limiter.bucket import TokenBucket
 from app.infrastructure.rate_limiter.breaker import CircuitBreaker
 from app.infrastructure.rate_limiter.scheduler import PriorityScheduler
+from app.infrastructure.rate_limiter.store import get_state_store
+from app.infrastructure.rate_limiter.cost import estimate_call_tokens, usage_tokens
+from app.infrastructure.rate_limiter.concurrency import AdaptiveConcurrencyLimiter
+from app.infrastructure.rate_limiter.adaptive import RateLimitHeaders, headers_from_error, build_observing_client
 
 logger = logging.getLogger(__name__)
 
+_END_OF_STREAM = object()
+
 class RateLimiter:
     """
     Public Facade. Coordinates Retry and Rate Limiting logic.
     """
-    def __init__(self, provider: APIProvider):
+    def __init__(self, provider: APIProvider, name: str = "default"):
         self.provider = provider
+        self.name = name
         self.config = LimitConfig.default_for(provider)
         
-        # Composition
-        self._bucket = TokenBucket(self.config.max_tokens, self.config.refill_rate)
-        self._breaker = CircuitBreaker(self.config.cooldown_after_429)
-        self._scheduler = PriorityScheduler(self._bucket, self._breaker)
+        # Composition (state is shared across workers when a store is configured)
+        store = get_state_store()
+        self._bucket = TokenBucket(self.config.max_tokens, self.config.refill_rate, store, key=name)
+        self._breaker = CircuitBreaker(self.config.cooldown_after_429, store, key=name)
+        self._token_bucket: Optional[TokenBucket] = None
+        if self.config.tokens_per_minute:
+            tpm = self.config.tokens_per_minute
+            self._token_bucket = TokenBucket(tpm, tpm / 60.0, store, key=f"{name}:tokens")
+        # In-flight cap (per process); the bucket above only limits how often calls start.
+        # The scheduler grants a slot together with the bucket token.
+        self.concurrency = AdaptiveConcurrencyLimiter(
+            initial_limit=self.config.initial_concurrency,
+            max_limit=self.config.max_concurrency,
+        )
+        self._scheduler = PriorityScheduler(
+            self._bucket, self._breaker, self._token_bucket,
+            provider=provider.value, concurrency=self.concurrency,
+        )
+        self._ttft: Deque[float] = deque(maxlen=200)  # streaming time-to-first-token samples
+        self._http_client = None
+        self._quota_paused = False  # breaker opened from headers, not by a failed call
+
+        # Metrics (per process, reported by snapshot())
+        self._calls = Counter()
+        self._successes = Counter()
+        self._failures = Counter()
+        self._retries = Counter()
+        self._rate_limited = Counter()
+        self._breaker_trips = Counter()
+        self._breaker_open_s = Counter()
+        self._call_latency = Histogram()
+
+    async def is_throttled(self) -> bool:
+        """True while the circuit breaker is cooling down after a 429."""
+        return await self._breaker.is_open()
+
+    def tenant_stats(self) -> Dict[str, Dict[str, float]]:
+        """Per-tenant queue depth and wait times."""
+        return self._scheduler.tenant_stats()
+
+    def is_idle(self) -> bool:
+        """Nothing queued or in flight, so the limiter can be dropped safely."""
+        return self._scheduler.queue_depth() == 0 and self.concurrency.in_flight == 0
+
+    async def snapshot(self) -> Dict[str, Any]:
+        """Point-in-time view of this limiter for monitoring."""
+        cooldown = await self._breaker.time_remaining()
+        return {
+            "name": self.name,
+            "provider": self.provider.value,
+            "throttled": cooldown > 0,
+            "cooldown_remaining_s": round(cooldown, 2),
+            "queue_depth": self._scheduler.queue_depth(),
+            "concurrency": self.concurrency.snapshot(),
+            "ttft_p50_ms": self._ttft_percentile(50),
+            "ttft_p95_ms": self._ttft_percentile(95),
+        }
+
+    async def get_state(self) -> Dict[str, Any]:
+        """
+        Full live state for the admin endpoint: snapshot() plus bucket levels,
+        scheduler queues, per-tenant stats, counters and latency histograms.
+        """
+        state = await self.snapshot()
+        state["limits"] = {
+            "requests_per_window": self._bucket.capacity,
+            "request_window_s": self.config.request_limit_window,
+            "tokens_per_minute": self._token_bucket.capacity if self._token_bucket is not None else None,
+        }
+        state["available"] = {
+            "requests": round(await self._bucket.available(), 2),
+            "tokens": round(await self._token_bucket.available(), 1) if self._token_bucket is not None else None,
+        }
+        state["quota_paused"] = self._quota_paused
+        state["scheduler"] = self._scheduler.get_state()
+        state["tenants"] = self._scheduler.tenant_stats()
+        state["counters"] = {
+            "calls": int(self._calls.value),
+            "successes": int(self._successes.value),
+            "failures": int(self._failures.value),
+            "retries": int(self._retries.value),
+            "rate_limited_429": int(self._rate_limited.value),
+            "breaker_trips": int(self._breaker_trips.value),
+            "breaker_open_s_total": round(self._breaker_open_s.value, 1),
+        }
+        state["call_latency_s"] = self._call_latency.snapshot()
+        return state
+
+    def http_async_client(self):
+        """Shared httpx client for provider SDKs; feeds response rate limit headers back here."""
+        if self._http_client is None:
+            self._http_client = build_observing_client(self)
+        return self._http_client
+
+    async def apply_rate_limit_headers(self, headers: RateLimitHeaders):
+        """
+        Adapts to the limits the provider reports for this key:
+        resizes the buckets to the real tier, lowers balances to the reported
+        remaining quota, and pauses when a quota is exhausted until it resets.
+        """
+        changed = False
+
+        if self._token_bucket is not None:
+            if headers.limit_tokens and headers.limit_tokens != self._token_bucket.capacity:
+                logger.info(f"[{self.name}] Provider TPM is {headers.limit_tokens} (was {self._token_bucket.capacity:g})")
+                self._token_bucket.reconfigure(headers.limit_tokens, headers.limit_tokens / 60.0)
+                changed = True
+            if headers.remaining_tokens is not None:
+                await self._token_bucket.sync(headers.remaining_tokens)
+
+        if self.config.request_limit_window == 60.0:
+            if headers.limit_requests and headers.limit_requests != self._bucket.capacity:
+                logger.info(f"[{self.name}] Provider RPM is {headers.limit_requests} (was {self._bucket.capacity:g})")
+                self._bucket.reconfigure(headers.limit_requests, headers.limit_requests / 60.0)
+                changed = True
+            if headers.remaining_requests is not None:
+                await self._bucket.sync(headers.remaining_requests)
+
+        # Quota exhausted: wait for the provider's reset instead of collecting 429s
+        exhausted = [
+            reset for remaining, reset in (
+                (headers.remaining_requests, headers.reset_requests),
+                (headers.remaining_tokens, headers.reset_tokens),
+            )
+            if remaining is not None and remaining <= 0 and reset
+        ]
+        if exhausted:
+            await self._trip_breaker(max(exhausted))
+            self._quota_paused = True
+            changed = True
+
+        if changed:
+            self._scheduler.notify()
+
+    def _ttft_percentile(self, pct: float) -> Optional[float]:
+        if not self._ttft:
+            return None
+        ordered = sorted(self._ttft)
+        return round(ordered[min(len(ordered) - 1, int(pct / 100.0 * len(ordered)))] * 1000, 1)
 
     async def execute_with_retry(
         self,
         func: Callable[..., Any],
         *args: Any,
         priority: int = 10,
+        estimated_tokens: Optional[int] = None,
+        tenant: Optional[str] = None,
+        deadline: Optional[float] = None,
         **kwargs: Any,
     ) -> Any:
         """
         Executes a function with rate limiting, retries, and backoff.
+        `estimated_tokens` is the expected input + output token count; when omitted
+        it is estimated from the first argument. The charge is corrected from the
+        result's usage metadata once the call returns.
+        `tenant` (company or user id) gets a fair share of queued capacity.
+        `deadline` (time.monotonic()) makes the queue reject or drop the request
+        once it cannot start in time, and stops retries that would overshoot it.
         """
         attempt = 0
         backoff = self.config.initial_backoff
+        estimated_tokens = self._estimate_tokens(args[0] if args else None, estimated_tokens)
+        cost = self._token_cost(estimated_tokens)
 
         while attempt <= self.config.max_retries:
-            try:
-                # 1. Wait for permission (Rate Limit)
-                await self._scheduler.wait_for_slot(priority)
+            # 1. Wait for permission (Rate Limit + in-flight slot); queue rejections are not retried
+            await self._scheduler.wait_for_slot(priority, tokens=cost, tenant=tenant, deadline=deadline)
 
-                # 2. Execute
-                result = await func(*args, **kwargs)
+            self._calls.inc()
+            try:
+                # 2. Execute in the granted in-flight slot
+                async with self.concurrency.slot(estimated_tokens / 1000.0) as slot:
+                    result = await func(*args, **kwargs)
                 
                 # 3. Success
-                self._breaker.reset()
+                self._call_latency.observe(time.monotonic() - slot.started)
+                self._successes.inc()
+                await self._settle_tokens(cost, usage_tokens(result))
+                await self._on_success()
                 return result
 
             except Exception as e:
                 attempt += 1
-                if not self._should_retry(e, attempt):
-                    raise
-                
                 # 4. Handle Failure & Backoff
-                wait_time = self._calculate_wait_time(e, backoff)
-                logger.warning(f"[{self.provider.value}] Failed (Attempt {attempt}). Retrying in {wait_time:.1f}s. Error: {e}")
-                
-                if isinstance(e, RateLimitExceededError) or "429" in str(e):
-                    self._breaker.trip(wait_time)
-                
+                wait_time = await self._retry_delay(e, attempt, backoff, deadline)
+                if wait_time is None:
+                    raise
                 await asyncio.sleep(wait_time)
                 backoff = min(backoff * 2, self.config.max_backoff)
         
         raise RateLimitExceededError(f"Max retries exceeded for {self.provider.value}", self.provider.value)
 
+    async def stream_with_retry(
+        self,
+        stream_factory: Callable[[], AsyncIterator[Any]],
+        priority: int = 10,
+        payload: Any = None,
+        estimated_tokens: Optional[int] = None,
+        tenant: Optional[str] = None,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[Any]:
+        """
+        Streaming counterpart of execute_with_retry.
+        `stream_factory` opens a fresh stream per attempt (e.g. lambda: llm.astream(messages)).
+        Failures before the first chunk are retried with the same backoff and
+        breaker handling; once a chunk has been yielded errors propagate, since
+        the caller has already seen partial output. Time to first token is
+        recorded and used as the concurrency limiter's latency signal.
+        `payload` is only used to estimate the token cost when `estimated_tokens` is omitted.
+        """
+        attempt = 0
+        backoff = self.config.initial_backoff
+        estimated_tokens = self._estimate_tokens(payload, estimated_tokens)
+        cost = self._token_cost(estimated_tokens)
+
+        while attempt <= self.config.max_retries:
+            await self._scheduler.wait_for_slot(priority, tokens=cost, tenant=tenant, deadline=deadline)
+
+            started = False
+            self._calls.inc()
+            try:
+                async with self.concurrency.slot(estimated_tokens / 1000.0) as slot:
+                    stream = stream_factory().__aiter__()
+                    first = await anext(stream, _END_OF_STREAM)
+
+                    ttft = time.monotonic() - slot.started
+                    slot.set_latency(ttft)
+                    self._ttft.append(ttft)
+                    self._call_latency.observe(ttft)
+                    self._successes.inc()
+                    await self._on_success()
+                    if first is _END_OF_STREAM:
+                        return
+
+                    started = True
+                    used = usage_tokens(first) or 0
+                    yield first
+                    async for chunk in stream:
+                        used += usage_tokens(chunk) or 0
+                        yield chunk
+                    await self._settle_tokens(cost, used or None)
+                    return
+
+            except Exception as e:
+                if started:
+                    raise
+                attempt += 1
+                wait_time = await self._retry_delay(e, attempt, backoff, deadline)
+                if wait_time is None:
+                    raise
+                await asyncio.sleep(wait_time)
+                backoff = min(backoff * 2, self.config.max_backoff)
+
+        raise RateLimitExceededError(f"Max retries exceeded for {self.provider.value}", self.provider.value)
+
+    async def _on_success(self):
+        if self._quota_paused:
+            if await self._breaker.is_open():
+                return  # the provider said the quota resets later; a success doesn't change that
+            self._quota_paused = False
+        was_open = await self._breaker.is_open()
+        await self._breaker.reset()
+        if was_open:
+            self._scheduler.notify()
+
+    async def _retry_delay(self, e: Exception, attempt: int, backoff: float, deadline: Optional[float]) -> Optional[float]:
+        """
+        Seconds to wait before the next attempt, tripping the breaker on 429s.
+        None means the error should be raised (not retryable, or no time left).
+        """
+        self._failures.inc()
+        rate_limited = isinstance(e, RateLimitExceededError) or "429" in str(e)
+        if rate_limited:
+            self._rate_limited.inc()
+        if not self._should_retry(e, attempt):
+            return None
+
+        wait_time = self._calculate_wait_time(e, backoff)
+        if rate_limited:
+            await self._trip_breaker(wait_time)
+            self._scheduler.notify()
+
+        if deadline is not None and time.monotonic() + wait_time >= deadline:
+            logger.warning(f"[{self.provider.value}] Failed (Attempt {attempt}); no time left before deadline. Error: {e}")
+            return None
+
+        self._retries.inc()
+        logger.warning(f"[{self.provider.value}] Failed (Attempt {attempt}). Retrying in {wait_time:.1f}s. Error: {e}")
+        return wait_time
+
+    async def _trip_breaker(self, seconds: float):
+        await self._breaker.trip(seconds)
+        self._breaker_trips.inc()
+        self._breaker_open_s.inc(seconds)
+
+    @staticmethod
+    def _estimate_tokens(payload: Any, estimated_tokens: Optional[int]) -> int:
+        """Expected input + output tokens for one call (also the latency normaliser)."""
+        return estimated_tokens if estimated_tokens is not None else estimate_call_tokens(payload)
+
+    def _token_cost(self, estimated_tokens: int) -> float:
+        """Tokens to reserve for one call; clamped so a huge job can still run alone."""
+        if self._token_bucket is None:
+            return 0.0
+        return float(min(estimated_tokens, self._token_bucket.capacity))
+
+    async def _settle_tokens(self, charged: float, actual: Optional[int]):
+        """Replaces the up-front estimate with the provider-reported usage."""
+        if self._token_bucket is None:
+            return
+        if actual is not None and actual != charged:
+            await self._token_bucket.adjust(actual - charged)
+
     def _should_retry(self, e: Exception, attempt: int) -> bool:
         """Determines if the error is retryable."""
         if attempt > self.config.max_retries:
@@ -83,7 +359,17 @@ class RateLimiter:
         return any(x in err for x in ["429", "rate limit", "quota", "timeout", "500", "503", "exhausted"])
 
     def _calculate_wait_time(self, e: Exception, current_backoff: float) -> float:
-        """Parses 'retry-after' or uses exponential backoff."""
+        """Uses the response's retry-after / reset headers, then hints in the message, then backoff."""
+        headers = headers_from_error(e)
+        if headers is not None:
+            hint = headers.retry_after
+            if hint is None and headers.remaining_tokens == 0:
+                hint = headers.reset_tokens
+            if hint is None and headers.remaining_requests == 0:
+                hint = headers.reset_requests
+            if hint is not None:
+                return hint + 0.5
+
         try:
             # Simple regex for "5s", "10m", etc.
             err = str(e).lower()
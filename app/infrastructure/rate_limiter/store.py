@@ -0,0 +1,269 @@
+"""
+Shared State Backends for Rate Limiting.
+
+By default every worker process keeps its own bucket and breaker, so N uvicorn
+workers make N times the configured request rate. A shared store moves that
+state out of the process so the limits hold across workers and one worker's
+429 cools all of them down.
+
+Selected with RATE_LIMIT_BACKEND:
+    memory  – per-process state (default, no store)
+    sqlite  – file-locked SQLite database shared by all workers on a host
+    redis   – network store shared across hosts (requires the redis package)
+
+Shared state uses wall-clock time because monotonic clocks are not comparable
+between processes. Store operations are awaitable so a slow store never
+stalls the event loop: SQLite runs on its own thread, Redis uses redis.asyncio.
+"""
+
+import os
+import asyncio
+import sqlite3
+import tempfile
+import threading
+import time
+import logging
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from app.core.exceptions import ConfigurationError
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_SQLITE_PATH = os.getenv(
+    "RATE_LIMIT_SQLITE_PATH", os.path.join(tempfile.gettempdir(), "ocr_rag_rate_limits.db")
+)
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "redis://localhost:6379/0")
+
+
+class StateStore(ABC):
+    """Atomic bucket and cooldown operations keyed by limiter name."""
+
+    @abstractmethod
+    async def consume(self, key: str, cost: float, capacity: float, refill_rate: float) -> float:
+        """Takes `cost` tokens if available. Returns 0.0 on success, else seconds until they are."""
+
+    @abstractmethod
+    async def wait_time(self, key: str, cost: float, capacity: float, refill_rate: float) -> float:
+        """Seconds until `cost` tokens are available, without consuming."""
+
+    @abstractmethod
+    async def adjust(self, key: str, delta: float, capacity: float, refill_rate: float) -> None:
+        """Charges (positive) or refunds (negative) tokens; the balance may go negative."""
+
+    @abstractmethod
+    async def cap(self, key: str, available: float, capacity: float, refill_rate: float) -> None:
+        """Lowers the balance to `available` if it is currently higher."""
+
+    @abstractmethod
+    async def set_cooldown(self, key: str, seconds: float) -> None:
+        """Starts a cooldown of `seconds` for the key, replacing any current one."""
+
+    @abstractmethod
+    async def clear_cooldown(self, key: str) -> None:
+        """Ends the key's cooldown."""
+
+    @abstractmethod
+    async def cooldown_remaining(self, key: str) -> float:
+        """Seconds left in the key's cooldown; 0.0 when none."""
+
+
+def _refill(tokens: float, last: float, now: float, capacity: float, refill_rate: float) -> float:
+    return min(capacity, tokens + max(0.0, now - last) * refill_rate)
+
+
+class SQLiteStateStore(StateStore):
+    """
+    Host-wide store. Updates run in a BEGIN IMMEDIATE transaction, which takes
+    SQLite's write lock, so read-modify-write is atomic across processes.
+    Peeks are plain reads (WAL readers never wait for the writer). Calls run
+    on one dedicated thread, so lock waits never block the event loop.
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_SQLITE_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ratelimit-sqlite")
+        self._conn = sqlite3.connect(path, timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL NOT NULL, last_refill REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cooldowns (key TEXT PRIMARY KEY, retry_after REAL NOT NULL)"
+        )
+        logger.info(f"Rate limiter state shared via SQLite at {path}")
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def _peek(self, key: str, cost: float, capacity: float, refill_rate: float) -> float:
+        with self._lock:
+            row = self._conn.execute("SELECT tokens, last_refill FROM buckets WHERE key = ?", (key,)).fetchone()
+        tokens = capacity if row is None else _refill(row[0], row[1], time.time(), capacity, refill_rate)
+        return 0.0 if tokens >= cost else (cost - tokens) / refill_rate
+
+    def _bucket_op(self, key: str, cost: float, capacity: float, refill_rate: float, mode: str) -> float:
+        with self._lock:
+            cur = self._conn.cursor()
+            cur.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = cur.execute("SELECT tokens, last_refill FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = capacity if row is None else _refill(row[0], row[1], now, capacity, refill_rate)
+
+                wait = 0.0
+                if mode == "adjust":
+                    tokens = min(capacity, tokens - cost)
+                elif mode == "cap":
+                    tokens = min(tokens, cost)
+                elif tokens >= cost:
+                    tokens -= cost
+                else:
+                    wait = (cost - tokens) / refill_rate
+
+                cur.execute(
+                    "INSERT OR REPLACE INTO buckets (key, tokens, last_refill) VALUES (?, ?, ?)",
+                    (key, tokens, now),
+                )
+                cur.execute("COMMIT")
+                return wait
+            except Exception:
+                cur.execute("ROLLBACK")
+                raise
+
+    def _execute(self, sql: str, params: tuple):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    async def consume(self, key: str, cost: float, capacity: float, refill_rate: float) -> float:
+        return await self._run(self._bucket_op, key, cost, capacity, refill_rate, "consume")
+
+    async def wait_time(self, key: str, cost: float, capacity: float, refill_rate: float) -> float:
+        return await self._run(self._peek, key, cost, capacity, refill_rate)
+
+    async def adjust(self, key: str, delta: float, capacity: float, refill_rate: float) -> None:
+        await self._run(self._bucket_op, key, delta, capacity, refill_rate, "adjust")
+
+    async def cap(self, key: str, available: float, capacity: float, refill_rate: float) -> None:
+        await self._run(self._bucket_op, key, available, capacity, refill_rate, "cap")
+
+    async def set_cooldown(self, key: str, seconds: float) -> None:
+        await self._run(
+            self._execute,
+            "INSERT OR REPLACE INTO cooldowns (key, retry_after) VALUES (?, ?)",
+            (key, time.time() + seconds),
+        )
+
+    async def clear_cooldown(self, key: str) -> None:
+        await self._run(self._execute, "DELETE FROM cooldowns WHERE key = ?", (key,))
+
+    async def cooldown_remaining(self, key: str) -> float:
+        row = await self._run(self._execute, "SELECT retry_after FROM cooldowns WHERE key = ?", (key,))
+        return max(0.0, row[0] - time.time()) if row else 0.0
+
+
+class RedisStateStore(StateStore):
+    """
+    Network store over redis.asyncio. The bucket update runs as a Lua script
+    using the Redis server clock, so it is atomic and consistent across hosts.
+    Cooldowns are plain keys with a TTL.
+    """
+
+    _BUCKET_SCRIPT = """
+    local capacity = tonumber(ARGV[1])
+    local rate = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local mode = ARGV[4]
+    local t = redis.call("TIME")
+    local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+    local tokens = tonumber(redis.call("HGET", KEYS[1], "tokens"))
+    local last = tonumber(redis.call("HGET", KEYS[1], "last"))
+    if tokens == nil then
+        tokens = capacity
+        last = now
+    end
+    tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+    local wait = 0
+    if mode == "adjust" then
+        tokens = math.min(capacity, tokens - cost)
+    elseif mode == "cap" then
+        tokens = math.min(tokens, cost)
+    elseif tokens >= cost then
+        if mode == "consume" then tokens = tokens - cost end
+    else
+        wait = (cost - tokens) / rate
+    end
+    if mode ~= "peek" then
+        redis.call("HSET", KEYS[1], "tokens", tokens, "last", now)
+        redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate) + 60)
+    end
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str = RATE_LIMIT_REDIS_URL, prefix: str = "ratelimit"):
+        try:
+            import redis.asyncio as redis
+        except ImportError as e:
+            raise ConfigurationError(
+                "RATE_LIMIT_BACKEND=redis requires the 'redis' package", config_key="RATE_LIMIT_BACKEND"
+            ) from e
+
+        self.prefix = prefix
+        self._client = redis.Redis.from_url(url, socket_timeout=1.0)
+        self._bucket_script = self._client.register_script(self._BUCKET_SCRIPT)
+        logger.info(f"Rate limiter state shared via Redis at {url}")
+
+    async def _bucket_op(self, key: str, cost: float, capacity: float, refill_rate: float, mode: str) -> float:
+        result = await self._bucket_script(
+            keys=[f"{self.prefix}:{key}:bucket"],
+            args=[capacity, refill_rate, cost, mode],
+        )
+        return float(result)
+
+    async def consume(self, key: str, cost: float, capacity: float, refill_rate: float) -> float:
+        return await self._bucket_op(key, cost, capacity, refill_rate, "consume")
+
+    async def wait_time(self, key: str, cost: float, capacity: float, refill_rate: float) -> float:
+        return await self._bucket_op(key, cost, capacity, refill_rate, "peek")
+
+    async def adjust(self, key: str, delta: float, capacity: float, refill_rate: float) -> None:
+        await self._bucket_op(key, delta, capacity, refill_rate, "adjust")
+
+    async def cap(self, key: str, available: float, capacity: float, refill_rate: float) -> None:
+        await self._bucket_op(key, available, capacity, refill_rate, "cap")
+
+    async def set_cooldown(self, key: str, seconds: float) -> None:
+        await self._client.set(f"{self.prefix}:{key}:cooldown", "1", px=max(1, int(seconds * 1000)))
+
+    async def clear_cooldown(self, key: str) -> None:
+        await self._client.delete(f"{self.prefix}:{key}:cooldown")
+
+    async def cooldown_remaining(self, key: str) -> float:
+        ttl_ms = await self._client.pttl(f"{self.prefix}:{key}:cooldown")
+        return ttl_ms / 1000.0 if ttl_ms and ttl_ms > 0 else 0.0
+
+
+_store: Optional[StateStore] = None
+_store_initialized = False
+
+
+def get_state_store() -> Optional[StateStore]:
+    """Process-wide store for RATE_LIMIT_BACKEND; None means per-process memory state."""
+    global _store, _store_initialized
+    if _store_initialized:
+        return _store
+
+    if RATE_LIMIT_BACKEND == "sqlite":
+        _store = SQLiteStateStore()
+    elif RATE_LIMIT_BACKEND == "redis":
+        _store = RedisStateStore()
+    elif RATE_LIMIT_BACKEND != "memory":
+        raise ConfigurationError(
+            f"Unsupported RATE_LIMIT_BACKEND: '{RATE_LIMIT_BACKEND}'. Use 'memory', 'sqlite' or 'redis'.",
+            config_key="RATE_LIMIT_BACKEND",
+        )
+    _store_initialized = True
+    return _store
@@ -5,6 +5,7 @@ Configuration types and Enums for Rate Limiting.
 
 from enum import Enum
 from dataclasses import dataclass
+from typing import Optional
 
 class APIProvider(Enum):
     """Supported API providers."""
@@ -21,13 +22,19 @@ class LimitConfig:
     max_retries: int
     initial_backoff: float
     max_backoff: float
+    tokens_per_minute: Optional[int] = None  # LLM token budget (TPM); None = requests only
+    initial_concurrency: int = 4             # starting in-flight cap, adapted by AIMD
+    max_concurrency: int = 32
+    # Window of x-ratelimit-limit-requests: 60 = per minute (resize the request
+    # bucket from it), anything else (Groq reports per day) = quota guard only
+    request_limit_window: float = 60.0
 
     @classmethod
     def default_for(cls, provider: APIProvider) -> "LimitConfig":
         """Returns optimized defaults for each provider."""
         defaults = {
-            APIProvider.GEMINI_FREE: cls(10, 10.0 / 60.0, 60.0, 5, 5.0, 120.0), # 10 RPM
-            APIProvider.GROQ: cls(25, 25.0 / 60.0, 15.0, 3, 2.0, 30.0),         # 25 RPM
+            APIProvider.GEMINI_FREE: cls(10, 10.0 / 60.0, 60.0, 5, 5.0, 120.0, 250_000), # 10 RPM, 250k TPM
+            APIProvider.GROQ: cls(25, 25.0 / 60.0, 15.0, 3, 2.0, 30.0, 12_000, request_limit_window=86_400.0),  # 25 RPM, 12k TPM
             APIProvider.HUGGINGFACE: cls(10, 10.0 / 60.0, 20.0, 3, 5.0, 60.0),  # 10 RPM
         }
         return defaults.get(provider, defaults[APIProvider.GEMINI_FREE])
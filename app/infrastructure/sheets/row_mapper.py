@@ -9,6 +9,8 @@ from datetime import datetime as dt
 from datetime import datetime
 from typing import Dict, Any, List, Optional
 
+from app.core.document_model import CanonicalDocument
+
 logger = logging.getLogger(__name__)
 
 class RowMapper:
@@ -40,7 +42,7 @@ class RowMapper:
 
     def _map_bank_statement(self, doc_data: Dict[str, Any]) -> List[List[Any]]:
         """Maps bank statement transactions to rows."""
-        transactions = doc_data.get("transactions", [])
+        transactions = CanonicalDocument.from_document(doc_data).transactions
         rows = []
 
         if not transactions:
@@ -54,12 +56,7 @@ class RowMapper:
             return rows
 
         for tx in transactions:
-            rows.append([
-                tx.get("date", doc_data.get("date")),
-                tx.get("description", ""),
-                float(tx.get("debit", 0)),
-                float(tx.get("credit", 0))
-            ])
+            rows.append([tx.date, tx.description, tx.debit, tx.credit])
         return rows
 
     def _extract_date(self, doc_data: Dict[str, Any]) -> str:
@@ -73,36 +70,19 @@ class RowMapper:
             except Exception:
                 pass
 
-        # 2. Fallback to document fields
-        return (
-            doc_data.get("date") 
-            or self._get_nested(doc_data, "transaction_info", "date")
-            or self._get_nested(doc_data, "invoice_details", "date")
-            or self._get_nested(doc_data, "invoice_details", "invoice_date")
-            or doc_data.get("invoice_date")
-            or datetime.now().strftime("%Y-%m-%d")
-        )
+        # 2. Fallback to the canonical document date
+        return CanonicalDocument.from_document(doc_data).date or datetime.now().strftime("%Y-%m-%d")
 
     def _extract_description(self, doc_data: Dict[str, Any], sheet_name: str) -> str:
         """Extracts description based on the target sheet (Sales vs Purchase)."""
         if sheet_name == "Sales":
             return (
-                doc_data.get("customer_name")
-                or self._get_nested(doc_data, "customer_info", "name")
-                or self._get_nested(doc_data, "bill_to", "name")
-                or doc_data.get("bill_to")
-                or doc_data.get("client_name")
+                CanonicalDocument.from_document(doc_data).customer_name
                 or doc_data.get("description", "Unknown Customer")
             )
         elif sheet_name == "Purchase":
             return (
-                doc_data.get("vendor_name")
-                or doc_data.get("store_name")
-                or doc_data.get("merchant_name")
-                or self._get_nested(doc_data, "store_info", "name")
-                or self._get_nested(doc_data, "supplier_info", "name")
-                or self._get_nested(doc_data, "vendor", "name")
-                or doc_data.get("vendor")
+                CanonicalDocument.from_document(doc_data).vendor_name
                 or doc_data.get("description", "Unknown Vendor")
             )
         
@@ -113,35 +93,5 @@ class RowMapper:
         )
 
     def _extract_total_amount(self, doc_data: Dict[str, Any]) -> str:
-        """Complex fallback logic for finding the total amount."""
-        amount = (
-            doc_data.get("total_amount")
-            or self._get_nested(doc_data, "summary", "total_amount")
-            or self._get_nested(doc_data, "summary", "amount_due")
-            or self._get_nested(doc_data, "summary", "grand_total")
-            or self._get_nested(doc_data, "summary", "total")
-            or self._get_nested(doc_data, "totals", "total_amount")
-            or self._get_nested(doc_data, "totals", "grand_total")
-            or self._get_nested(doc_data, "totals", "total")
-            or self._get_payment_info_amount(doc_data)
-            or self._get_nested(doc_data, "invoice_details", "total_amount")
-            or self._get_nested(doc_data, "invoice_details", "grand_total")
-            or doc_data.get("amount_due")
-            or doc_data.get("grand_total")
-            or doc_data.get("total")
-            or doc_data.get("amount")
-            or "0.00"
-        )
-        return str(amount)
-
-    def _get_nested(self, data: Dict, parent: str, field: str) -> Any:
-        """Helper to safely get nested dictionary values."""
-        parent_obj = data.get(parent)
-        return parent_obj.get(field) if isinstance(parent_obj, dict) else None
-
-    def _get_payment_info_amount(self, data: Dict) -> Any:
-        """Helper for list-based payment info."""
-        payment_info = data.get("payment_info")
-        if isinstance(payment_info, list) and len(payment_info) > 0:
-            return payment_info[0].get("amount")
-        return None
+        """Reads the canonical total (resolved once at parse time)."""
+        return CanonicalDocument.from_document(doc_data).total_text or "0.00"
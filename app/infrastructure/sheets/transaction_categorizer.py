@@ -1,8 +1,10 @@
 import re
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from difflib import SequenceMatcher
 import logging
 
+from app.core.document_model import CanonicalDocument
+
 logger = logging.getLogger(__name__)
 
 class TransactionCategorizer:
@@ -110,6 +112,15 @@ class TransactionCategorizer:
             )
             return 0.0
 
+    def _best_match(self, company_name: str, names: List[str]) -> Tuple[float, str]:
+        """Highest similarity over every candidate name, with the name that scored it."""
+        best_match, best_name = 0.0, ""
+        for name in names:
+            similarity = self.fuzzy_match(company_name, name)
+            if similarity > best_match:
+                best_match, best_name = similarity, name
+        return best_match, best_name
+
     def find_company_match(
         self, company_name: str, doc_data: Dict
     ) -> Tuple[Optional[str], float, str]:
@@ -126,59 +137,11 @@ class TransactionCategorizer:
             confidence: similarity score
             matched_name: the actual name that was matched
         """
-        # Fields to check for issuer
-        issuer_fields = [
-            "issuer_name",
-            "vendor_name",
-            "store_name",
-            "merchant_name",
-            "seller_name",
-            "from_company",
-        ]
-
-        # Fields to check for receiver
-        receiver_fields = [
-            "receiver_name",
-            "customer_name",
-            "client_name",
-            "buyer_name",
-            "to_company",
-            "bill_to",
-        ]
-
         try:
-            best_issuer_match = 0.0
-            best_issuer_name = ""
-
-            best_receiver_match = 0.0
-            best_receiver_name = ""
-
-            for field in issuer_fields:
-                value = doc_data.get(field)
-                if value:
-                    # Handle nested dictionaries
-                    if isinstance(value, dict):
-                        value = value.get("name", "")
-
-                    if isinstance(value, str):
-                        similarity = self.fuzzy_match(company_name, value)
-                        if similarity > best_issuer_match:
-                            best_issuer_match = similarity
-                            best_issuer_name = value
-
-            # Check receiver fields
-            for field in receiver_fields:
-                value = doc_data.get(field)
-                if value:
-                    # Handle nested dictionaries
-                    if isinstance(value, dict):
-                        value = value.get("name", "")
-
-                    if isinstance(value, str):
-                        similarity = self.fuzzy_match(company_name, value)
-                        if similarity > best_receiver_match:
-                            best_receiver_match = similarity
-                            best_receiver_name = value
+            doc = CanonicalDocument.from_document(doc_data)
+
+            best_issuer_match, best_issuer_name = self._best_match(company_name, doc.vendor_names)
+            best_receiver_match, best_receiver_name = self._best_match(company_name, doc.customer_names)
 
             # Determine role based on best match
             if (
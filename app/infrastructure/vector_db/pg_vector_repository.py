@@ -1,20 +1,101 @@
+import os
+import struct
 import asyncpg
-from typing import List, Dict, Optional, Tuple
+import numpy as np
+from typing import Any, List, Dict, Optional, Sequence, Tuple, Union
+
+from app.core.exceptions import DatabaseError
+from app.infrastructure.embeddings.quantization import RESCORE_TABLE
+
+Vector = Union[np.ndarray, Sequence[float]]
+
+# Schema holding pgvector's `vector` type; empty = look it up
+PGVECTOR_SCHEMA = os.getenv("PGVECTOR_SCHEMA", "")
+
+# Single-row table naming the embedding version/model of the live vectors
+EMBEDDING_CONFIG_TABLE = "embedding_config"
+
+
+def encode_vector(vector: Vector) -> bytes:
+    """pgvector binary send format: int16 dim, int16 unused, dim big-endian float32."""
+    values = np.asarray(vector, dtype=">f4").reshape(-1)
+    return struct.pack(">HH", values.size, 0) + values.tobytes()
+
+
+def decode_vector(data: bytes) -> np.ndarray:
+    """pgvector binary value as a zero-copy (big-endian, read-only) numpy view."""
+    dim, _ = struct.unpack_from(">HH", data)
+    return np.frombuffer(data, dtype=">f4", count=dim, offset=4)
+
+
+async def register_vector_codec(conn: asyncpg.Connection) -> None:
+    """
+    Exchanges `vector` values in pgvector's binary format instead of text, so
+    no float is printed or parsed on either side. Pass as the pool's `init`.
+    The type is looked up in whichever schema pgvector was installed into
+    (Supabase uses `extensions`) unless PGVECTOR_SCHEMA is set.
+    """
+    schema = PGVECTOR_SCHEMA or await conn.fetchval(
+        "SELECT t.typnamespace::regnamespace::text FROM pg_type t "
+        "JOIN pg_depend d ON d.objid = t.oid AND d.deptype = 'e' "
+        "JOIN pg_extension e ON e.oid = d.refobjid AND e.extname = 'vector' "
+        "WHERE t.typname = 'vector'"
+    )
+    if schema is None:
+        raise DatabaseError(
+            "pgvector 'vector' type not found; run CREATE EXTENSION vector", operation="register_vector_codec"
+        )
+    await conn.set_type_codec(
+        "vector", schema=schema, encoder=encode_vector, decoder=decode_vector, format="binary"
+    )
+
+
+async def record_embedding_config(conn: asyncpg.Connection, version: str, model: str, dimension: int) -> None:
+    """
+    Records which embedding version/model produced the live `embeddings` table,
+    so writers and searchers on another model can refuse (SupabaseVectorService).
+    """
+    await conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {EMBEDDING_CONFIG_TABLE} ("
+        "id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id), version TEXT NOT NULL, model TEXT NOT NULL, "
+        "dimension INTEGER NOT NULL, updated_at TIMESTAMPTZ NOT NULL DEFAULT now())"
+    )
+    await conn.execute(
+        f"INSERT INTO {EMBEDDING_CONFIG_TABLE} (id, version, model, dimension) VALUES (TRUE, $1, $2, $3) "
+        "ON CONFLICT (id) DO UPDATE SET version = EXCLUDED.version, model = EXCLUDED.model, "
+        "dimension = EXCLUDED.dimension, updated_at = now()",
+        version,
+        model,
+        dimension,
+    )
+
 
 class PgVectorRepository:
 
     def __init__(self, pool: asyncpg.Pool):
+        """`pool` should be created with init=register_vector_codec (see create())."""
         self.pool = pool
 
+    @classmethod
+    async def create(cls, dsn: str, **pool_kwargs: Any) -> "PgVectorRepository":
+        """Repository over a new pool whose connections use the binary vector codec."""
+        pool = await asyncpg.create_pool(dsn, init=register_vector_codec, **pool_kwargs)
+        return cls(pool)
+
     async def add_document(
         self,
         document_key: str,
         user_id: str,
         company_id: str,
         content: str,
-        embedding: List[float],
-    ):
-        """Adds or updates a document embedding."""
+        embedding: Vector,
+        rescore: Optional[Tuple[bytes, float]] = None,
+    ) -> int:
+        """
+        Adds or updates a document embedding and returns its row id. `rescore`
+        (int8 codes, scale) of the full vector goes to RESCORE_TABLE in the
+        same transaction.
+        """
         query = """
         INSERT INTO embeddings
         (document_key, user_id, company_id, content, embedding)
@@ -23,20 +104,73 @@ class PgVectorRepository:
             content = EXCLUDED.content,
             embedding = EXCLUDED.embedding,
             deleted = FALSE
+        RETURNING id
         """
         async with self.pool.acquire() as conn:
-            await conn.execute(
-                query,
-                document_key,
-                user_id,
-                company_id,
-                content,
-                embedding,
-            )
+            async with conn.transaction():
+                row_id = await conn.fetchval(
+                    query,
+                    document_key,
+                    user_id,
+                    company_id,
+                    content,
+                    embedding,
+                )
+                if rescore is not None:
+                    await conn.execute(
+                        f"INSERT INTO {RESCORE_TABLE} (id, codes, scale) VALUES ($1, $2, $3) "
+                        "ON CONFLICT (id) DO UPDATE SET codes = EXCLUDED.codes, scale = EXCLUDED.scale",
+                        row_id,
+                        *rescore,
+                    )
+        return row_id
+
+    async def search_candidates(
+        self,
+        query_embedding: Vector,
+        threshold: float,
+        count: int,
+        user_id: Optional[str],
+        company_id: Optional[str],
+        with_rescore: bool = False,
+    ) -> List[asyncpg.Record]:
+        """
+        match_embeddings rows. With `with_rescore`, each row also carries the
+        RESCORE_TABLE `codes`/`scale` of its key's newest live row (NULL if it
+        has none), fetched in the same query.
+        """
+        if not with_rescore:
+            query = "SELECT * FROM match_embeddings($1, $2, $3, $4, $5)"
+        else:
+            query = f"""
+            SELECT c.*, r.codes, r.scale
+            FROM match_embeddings($1, $2, $3, $4, $5) c
+            LEFT JOIN LATERAL (
+                SELECT e.id FROM embeddings e
+                WHERE e.document_key = c.document_key AND e.user_id = c.user_id
+                  AND e.company_id = c.company_id AND NOT e.deleted
+                ORDER BY e.id DESC LIMIT 1
+            ) live ON TRUE
+            LEFT JOIN {RESCORE_TABLE} r ON r.id = live.id
+            """
+        async with self.pool.acquire() as conn:
+            return await conn.fetch(query, query_embedding, threshold, count, user_id, company_id)
+
+    async def get_embedding_config(self) -> Optional[Dict]:
+        """The embedding_config row, or None if the table was never rebuilt."""
+        async with self.pool.acquire() as conn:
+            try:
+                row = await conn.fetchrow(f"SELECT * FROM {EMBEDDING_CONFIG_TABLE} LIMIT 1")
+            except asyncpg.UndefinedTableError:
+                return None
+        return dict(row) if row else None
+
+    async def close(self):
+        await self.pool.close()
 
     async def search(
         self,
-        query_embedding: List[float],
+        query_embedding: Vector,
         user_id: str,
         company_id: str,
         top_k: int = 5,
@@ -53,7 +187,7 @@ class PgVectorRepository:
         async with self.pool.acquire() as conn:
             rows = await conn.fetch(
                 query,
-                list(query_embedding),
+                query_embedding,
                 threshold,
                 top_k,
                 user_id,
@@ -1,12 +1,35 @@
 import os
+import time
+import asyncio
 import logging
+import functools
 from typing import List, Dict, Tuple, Optional
 import numpy as np
 from app.infrastructure.storage.supabase_service import SupabaseService
-from app.core.exceptions import DatabaseError
+from app.core.exceptions import ConfigurationError, DatabaseError
+from app.infrastructure.embeddings.embedding_service import get_embedding_service
+from app.infrastructure.embeddings.quantization import (
+    EMBEDDING_RESCORE_MULTIPLIER,
+    EMBEDDING_STORAGE_DIMENSION,
+    RESCORE_TABLE,
+    pack_int8,
+    storage_is_lossy,
+    storage_vector,
+    unpack_int8,
+)
+from app.infrastructure.vector_db.pg_vector_repository import EMBEDDING_CONFIG_TABLE, PgVectorRepository
 
 logger = logging.getLogger(__name__)
 
+# Expected re-embedding version of the live table (reembed_embeddings.py); empty = any
+EMBEDDING_VERSION = os.getenv("EMBEDDING_VERSION", "")
+# How long a successful check of embedding_config is trusted
+EMBEDDING_CONFIG_CHECK_S = float(os.getenv("EMBEDDING_CONFIG_CHECK_S", "60"))
+# Direct Postgres DSN: async inserts/searches send vectors in pgvector's binary
+# format over asyncpg. Without it they go through PostgREST as JSON float lists.
+DATABASE_URL = os.getenv("DATABASE_URL", "")
+VECTOR_DB_POOL_SIZE = int(os.getenv("VECTOR_DB_POOL_SIZE", "10"))
+
 class SupabaseVectorService:
     """
     Adapter for Supabase PG Vector that mimics the FAISSService interface.
@@ -16,12 +39,90 @@ class SupabaseVectorService:
     def __init__(self):
         self.supabase_service = SupabaseService()
         self.client = self.supabase_service.supabase
+        self.rescore = EMBEDDING_STORAGE_DIMENSION > 0 and EMBEDDING_RESCORE_MULTIPLIER > 0
+        if storage_is_lossy():
+            logger.warning(
+                f"EMBEDDING_STORAGE_DIMENSION={EMBEDDING_STORAGE_DIMENSION}: embeddings are stored and searched "
+                f"truncated WITHOUT rescoring, which is lossy (recall@10 ~0.7 at 256 dims). Create the "
+                f"{RESCORE_TABLE} table and set EMBEDDING_RESCORE_MULTIPLIER to re-rank against full vectors."
+            )
+        self._config_checked_until = 0.0
+        self._repository: Optional[PgVectorRepository] = None
+        self._repository_lock = asyncio.Lock()
+        if not DATABASE_URL:
+            logger.warning(
+                "DATABASE_URL is not set: vectors are sent to Supabase as JSON float lists via PostgREST. "
+                "Set it to use the binary pgvector transport."
+            )
+
+    async def _get_repository(self) -> Optional[PgVectorRepository]:
+        """asyncpg repository (binary vector codec), created on first use; None without DATABASE_URL."""
+        if not DATABASE_URL:
+            return None
+        if self._repository is None:
+            async with self._repository_lock:
+                if self._repository is None:
+                    self._repository = await PgVectorRepository.create(
+                        DATABASE_URL, min_size=1, max_size=VECTOR_DB_POOL_SIZE
+                    )
+        return self._repository
+
+    async def close(self):
+        if self._repository is not None:
+            await self._repository.close()
+            self._repository = None
+
+    def _check_embedding_config(self):
+        """
+        Refuses to write or search when the table was rebuilt for another model,
+        dimension or version than this process embeds with. Tables never rebuilt
+        have no embedding_config row and are accepted.
+        """
+        if time.monotonic() < self._config_checked_until:
+            return
+        try:
+            rows = self.client.table(EMBEDDING_CONFIG_TABLE).select("*").limit(1).execute().data or []
+        except Exception as e:
+            logger.debug(f"No {EMBEDDING_CONFIG_TABLE} table readable: {e}")
+            rows = []
+        self._verify_embedding_config(rows)
+
+    async def _check_embedding_config_async(self, repository: PgVectorRepository):
+        if time.monotonic() < self._config_checked_until:
+            return
+        config = await repository.get_embedding_config()
+        self._verify_embedding_config([config] if config else [])
+
+    def _verify_embedding_config(self, rows: List[Dict]):
+        verified = True
+        if rows:
+            config = rows[0]
+            embedding = get_embedding_service()
+            model = embedding.backend.cache_namespace
+            dimension = min(EMBEDDING_STORAGE_DIMENSION or embedding.embedding_dim, embedding.embedding_dim)
+            problems = []
+            if model is None:
+                verified = False  # the backend has not reported its model yet; check again next call
+            elif config["model"] != model:
+                problems.append(f"model {config['model']} (configured: {model})")
+            if config["dimension"] != dimension:
+                problems.append(f"dimension {config['dimension']} (configured: {dimension})")
+            if EMBEDDING_VERSION and config["version"] != EMBEDDING_VERSION:
+                problems.append(f"version {config['version']} (configured: {EMBEDDING_VERSION})")
+            if problems:
+                raise ConfigurationError(
+                    f"Vector table was built with {', '.join(problems)}; refusing to mix embedding spaces",
+                    config_key="EMBEDDING_VERSION",
+                )
+        if verified:
+            self._config_checked_until = time.monotonic() + EMBEDDING_CONFIG_CHECK_S
 
     def add_document(self, document_key: str, embedding: np.ndarray, metadata: Dict) -> str:
         """
         Synchronous wrapper for document indexing to Supabase.
         """
         logger.info(f"SupabaseVectorService: Attempting to add document {document_key}")
+        self._check_embedding_config()
         try:
             # metadata contains user_id, company_id, text_summary etc.
             user_id = metadata.get("user_id")
@@ -34,8 +135,8 @@ class SupabaseVectorService:
                 logger.error(f"SupabaseVectorService: Missing required metadata for doc {document_key}")
                 raise ValueError("user_id and company_id are required in metadata")
 
-            # Convert numpy array to list for JSON serialization
-            emb_list = embedding.tolist() if isinstance(embedding, np.ndarray) else embedding
+            # Truncate to the column's dimension (EMBEDDING_STORAGE_DIMENSION), then list for JSON
+            emb_list = storage_vector(embedding).tolist()
             logger.info(f"SupabaseVectorService: Embedding size: {len(emb_list)}")
 
             data = {
@@ -50,6 +151,8 @@ class SupabaseVectorService:
             # Upsert using document_key + user_id + company_id if you want to prevent duplicates
             logger.info(f"SupabaseVectorService: Executing insert into 'embeddings' table...")
             response = self.client.table("embeddings").insert(data).execute()
+            if self.rescore and response.data:
+                self._add_rescore_vector(response.data[0]["id"], embedding)
             
             # logger.info(f"SupabaseVectorService: Insert response: {response}")
             logger.info(f"Successfully stored embedding for doc {document_key} in Supabase")
@@ -69,39 +172,149 @@ class SupabaseVectorService:
         """
         Similarity search using the match_embeddings RPC function.
         """
+        self._check_embedding_config()
         try:
-            emb_list = query_embedding.tolist() if isinstance(query_embedding, np.ndarray) else query_embedding
-            
+            emb_list = storage_vector(query_embedding).tolist()
+            match_threshold = score_threshold or 0.1 # similarity score [0, 1]
+
             # Call RPC
             rpc_params = {
                 "query_embedding": emb_list,
-                "match_threshold": score_threshold or 0.1, # similarity score [0, 1]
-                "match_count": top_k,
+                "match_threshold": match_threshold,
+                "match_count": top_k * EMBEDDING_RESCORE_MULTIPLIER if self.rescore else top_k,
                 "p_user_id": user_id,
                 "p_company_id": company_id
             }
 
             response = self.client.rpc("match_embeddings", rpc_params).execute()
             results = response.data or []
+            if self.rescore and results:
+                results = self._rescore(query_embedding, results, top_k, match_threshold, user_id, company_id)
 
-            # Format to (doc_key, similarity, metadata)
-            formatted_results = []
-            for item in results:
-                formatted_results.append((
-                    item["document_key"],
-                    float(item["similarity"]),
-                    {
-                        "content": item["content"],
-                        "user_id": item["user_id"],
-                        "company_id": item["company_id"]
-                    }
-                ))
-            
-            return formatted_results
+            return _format_results(results)
         except Exception as e:
             logger.error(f"Supabase RPC search failed: {e}")
             raise DatabaseError(f"Supabase Vector search failed: {e}")
 
+    async def add_document_async(self, document_key: str, embedding: np.ndarray, metadata: Dict) -> str:
+        """
+        Indexes over asyncpg with binary vectors when DATABASE_URL is set,
+        otherwise runs add_document (PostgREST) in the executor.
+        """
+        repository = await self._get_repository()
+        if repository is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self.add_document, document_key, embedding, metadata)
+
+        await self._check_embedding_config_async(repository)
+        try:
+            user_id = metadata.get("user_id")
+            company_id = metadata.get("company_id")
+            if not user_id or not company_id:
+                raise ValueError("user_id and company_id are required in metadata")
+            await repository.add_document(
+                document_key,
+                user_id,
+                company_id,
+                metadata.get("text_summary", ""),
+                storage_vector(embedding),
+                rescore=pack_int8(embedding) if self.rescore else None,
+            )
+            logger.info(f"Successfully stored embedding for doc {document_key} in Supabase")
+            return document_key
+        except Exception as e:
+            logger.error(f"SupabaseVectorService: Failed to add document {document_key}: {str(e)}", exc_info=True)
+            raise DatabaseError(f"Supabase Vector insert failed: {e}")
+
+    async def search_async(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        score_threshold: Optional[float] = None,
+        user_id: Optional[str] = None,
+        company_id: Optional[str] = None,
+    ) -> List[Tuple[str, float, Dict]]:
+        """
+        search() over asyncpg with binary vectors when DATABASE_URL is set; the
+        rescoring vectors come back in the same query.
+        """
+        repository = await self._get_repository()
+        if repository is None:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                None,
+                functools.partial(
+                    self.search, query_embedding, top_k=top_k, score_threshold=score_threshold,
+                    user_id=user_id, company_id=company_id,
+                ),
+            )
+
+        await self._check_embedding_config_async(repository)
+        try:
+            match_threshold = score_threshold or 0.1
+            rows = await repository.search_candidates(
+                storage_vector(query_embedding),
+                match_threshold,
+                top_k * EMBEDDING_RESCORE_MULTIPLIER if self.rescore else top_k,
+                user_id,
+                company_id,
+                with_rescore=self.rescore,
+            )
+            results = [dict(r) for r in rows]
+            if self.rescore and results:
+                full = {
+                    r["document_key"]: _as_vector(r["codes"], r["scale"]) if r["codes"] is not None else None
+                    for r in results
+                }
+                results = _rerank(query_embedding, results, full, top_k, match_threshold)
+            return _format_results(results)
+        except Exception as e:
+            logger.error(f"Supabase vector search failed: {e}")
+            raise DatabaseError(f"Supabase Vector search failed: {e}")
+
+    def _add_rescore_vector(self, row_id: int, embedding: np.ndarray):
+        """Stores the full vector int8-quantized in the rescoring side table."""
+        codes, scale = pack_int8(embedding)
+        try:
+            self.client.table(RESCORE_TABLE).insert({"id": row_id, "codes": "\\x" + codes.hex(), "scale": scale}).execute()
+        except Exception as e:
+            # The row is still searchable; it keeps its truncated score
+            logger.warning(f"Failed to store rescoring vector for embeddings row {row_id}: {e}")
+
+    def _rescore(
+        self,
+        query_embedding: np.ndarray,
+        results: List[Dict],
+        top_k: int,
+        match_threshold: float,
+        user_id: Optional[str],
+        company_id: Optional[str],
+    ) -> List[Dict]:
+        """
+        Re-ranks truncated-search candidates by cosine similarity on their int8
+        full vectors, fetched for the candidates' live rows only. Inserts are
+        append-only, so the newest row of a key wins.
+        """
+        query = (
+            self.client.table("embeddings")
+            .select(f"id, document_key, {RESCORE_TABLE}(codes, scale)")
+            .in_("document_key", list({item["document_key"] for item in results}))
+            .eq("deleted", False)
+            .order("id")
+        )
+        if user_id:
+            query = query.eq("user_id", user_id)
+        if company_id:
+            query = query.eq("company_id", company_id)
+        full = {}
+        for r in query.execute().data or []:
+            packed = r.get(RESCORE_TABLE)
+            if isinstance(packed, list):
+                packed = packed[0] if packed else None
+            full[r["document_key"]] = _as_vector(packed["codes"], packed["scale"]) if packed else None
+
+        return _rerank(query_embedding, results, full, top_k, match_threshold)
+
     def delete_document(self, document_key: str):
         """Soft deletes a document in Supabase."""
         try:
@@ -146,6 +359,47 @@ class SupabaseVectorService:
             logger.error(f"Failed to fetch all docs from Supabase: {e}")
             return []
 
+def _as_vector(codes, scale: float) -> np.ndarray:
+    """RESCORE_TABLE row as a float vector; PostgREST returns bytea as a '\\x..' hex string."""
+    if isinstance(codes, str):
+        codes = bytes.fromhex(codes[2:] if codes.startswith("\\x") else codes)
+    return unpack_int8(codes, scale)
+
+
+def _format_results(results: List[Dict]) -> List[Tuple[str, float, Dict]]:
+    """match_embeddings rows as (doc_key, similarity, metadata)."""
+    return [
+        (
+            item["document_key"],
+            float(item["similarity"]),
+            {
+                "content": item["content"],
+                "user_id": item["user_id"],
+                "company_id": item["company_id"],
+            },
+        )
+        for item in results
+    ]
+
+
+def _rerank(
+    query_embedding: np.ndarray,
+    results: List[Dict],
+    full: Dict[str, Optional[np.ndarray]],
+    top_k: int,
+    match_threshold: float,
+) -> List[Dict]:
+    """Replaces each candidate's similarity with the full-vector cosine where one is stored."""
+    q = np.asarray(query_embedding, dtype=np.float32).reshape(-1)
+    q = q / max(float(np.linalg.norm(q)), 1e-12)
+    for item in results:
+        vector = full.get(item["document_key"])
+        if vector is not None and len(vector) == len(q):
+            item["similarity"] = float(vector @ q) / max(float(np.linalg.norm(vector)), 1e-12)
+    results = [item for item in results if float(item["similarity"]) >= match_threshold]
+    results.sort(key=lambda item: float(item["similarity"]), reverse=True)
+    return results[:top_k]
+
 # Singleton instance management (similar to FAISS)
 _supabase_vector_service = None
 
@@ -154,3 +408,8 @@ def get_supabase_vector_service() -> SupabaseVectorService:
     if _supabase_vector_service is None:
         _supabase_vector_service = SupabaseVectorService()
     return _supabase_vector_service
+
+async def close_supabase_vector_service() -> None:
+    """Closes the asyncpg pool, if one was opened."""
+    if _supabase_vector_service is not None:
+        await _supabase_vector_service.close()
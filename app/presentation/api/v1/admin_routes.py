@@ -0,0 +1,42 @@
+"""
+Read-only admin routes exposing live rate limiter and embedding service state.
+The state spans every tenant (company ids, API key fingerprints), so each route
+requires a user listed in ADMIN_USER_IDS.
+"""
+
+import logging
+from fastapi import APIRouter, Depends, HTTPException
+
+from app.presentation.auth_middleware import require_admin
+from app.infrastructure.rate_limiter import list_rate_limiters
+from app.infrastructure.rate_limiter.store import RATE_LIMIT_BACKEND
+from app.infrastructure.embeddings.embedding_service import get_embedding_service
+
+router = APIRouter(prefix="/api/v1/admin", tags=["Admin"])
+logger = logging.getLogger(__name__)
+
+
+@router.get("/rate-limiters")
+async def rate_limiters(current_user: dict = Depends(require_admin)):
+    """Every registered rate limiter with its buckets, queues, counters and latency histograms."""
+    limiters = list_rate_limiters()
+    return {
+        "backend": RATE_LIMIT_BACKEND,
+        "count": len(limiters),
+        "limiters": [await limiter.get_state() for limiter in limiters.values()],
+    }
+
+
+@router.get("/rate-limiters/{name}")
+async def rate_limiter(name: str, current_user: dict = Depends(require_admin)):
+    """Live state of one rate limiter by registry name (e.g. "rag_groq" or "groq_processing:<key fingerprint>")."""
+    limiter = list_rate_limiters().get(name)
+    if limiter is None:
+        raise HTTPException(status_code=404, detail=f"No rate limiter named '{name}'")
+    return await limiter.get_state()
+
+
+@router.get("/embeddings")
+async def embeddings(current_user: dict = Depends(require_admin)):
+    """Embedding backend health, per-call latency split (queue/network/server), batch sizes, failures and cache stats."""
+    return get_embedding_service().get_state()
@@ -2,7 +2,7 @@ from fastapi import APIRouter, UploadFile, BackgroundTasks, HTTPException, Depen
 from fastapi.responses import FileResponse
 import logging
 import os
-from typing import Optional 
+from typing import List, Optional 
 from pathlib import Path
 from PIL import Image
 import io
@@ -21,6 +21,8 @@ router = APIRouter(prefix="/api/v1", tags=["Uploads"])
 upload_orchestrator = UploadOrchestrator()
 
 HEIC_EXTENSIONS = {".heic", ".heif"}
+# Files accepted by one /process-images call
+UPLOAD_MAX_FILES = int(os.getenv("UPLOAD_MAX_FILES", "50"))
 ALLOWED_IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".webp", ".heic", ".heif", ".pdf"}
 
 
@@ -102,6 +104,42 @@ async def process_image(
         raise HTTPException(status_code=500, detail="An internal error occurred while processing the document.")
 
 
+@router.post("/process-images")
+async def process_images(
+    files: List[UploadFile],
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Bulk variant of /process-image: short documents are parsed together in
+    batched LLM calls. Returns one result per file, in upload order.
+    """
+    try:
+        if not files:
+            raise ValueError("No files uploaded")
+        if len(files) > UPLOAD_MAX_FILES:
+            raise ValueError(f"Too many files: {len(files)} (max {UPLOAD_MAX_FILES})")
+        for file in files:
+            _validate_file_extension(file.filename)
+
+        files = [await _convert_heic_to_jpeg(file) for file in files]
+
+        results = await upload_orchestrator.handle_bulk_upload(
+            files=files,
+            background_tasks=background_tasks,
+            current_user=current_user
+        )
+        return {"status": "success", "results": results}
+
+    except ValueError as e:
+        logger.warning(f"Validation error during bulk upload: {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+
+    except Exception as e:
+        logger.exception(f"Unexpected error during bulk document processing: {e}")
+        raise HTTPException(status_code=500, detail="An internal error occurred while processing the documents.")
+
+
 @router.post("/process-document", response_model=ProcessDocumentResponse)
 async def process_document(file: UploadFile):
     """
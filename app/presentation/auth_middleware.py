@@ -104,4 +104,14 @@ async def get_current_user(
         "companies": ["test-company-1", "test-company-456"],
         "activeCompany": x_active_company,
         "companyName": x_company_name,
-    }
\ No newline at end of file
+    }
+
+# Comma-separated user ids allowed on the admin routes; empty means nobody
+ADMIN_USER_IDS = {u.strip() for u in os.getenv("ADMIN_USER_IDS", "").split(",") if u.strip()}
+
+
+async def require_admin(current_user: dict = Depends(get_current_user)) -> dict:
+    """Restricts a route to users listed in ADMIN_USER_IDS (cross-tenant operational data)."""
+    if current_user.get("userId") not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
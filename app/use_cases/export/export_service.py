@@ -4,6 +4,7 @@ from typing import Dict, Any, Optional, Tuple
 from app.infrastructure.firebase import DocumentService
 from app.utils.firebase_to_csv import FirebaseToCSV
 from app.utils.excel_templates import ExcelTemplateFactory
+from app.core.document_model import CANONICAL_KEY
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +33,8 @@ class ExportService:
         Fetches document data and generates a flattened CSV.
         """
         data = await self.firebase_service.get_document_async(user_id, company_id, doc_id)
+        # The canonical block duplicates the raw fields and would multiply item rows
+        data = {k: v for k, v in data.items() if k != CANONICAL_KEY}
         
         flattened_rows = self.csv_util.flatten_for_csv(data)
         csv_text = self.csv_util.generate_csv_from_rows(flattened_rows, exclude_fields=self.EXCLUDE_FIELDS)
@@ -12,6 +12,7 @@ except ImportError:
 from app.infrastructure.ocr.tesseract_service import OCRService
 from app.infrastructure.parser.gemini_parser_service import GeminiParserService
 from app.presentation.schemas.parsed_data_model import ParsedData
+from app.core.document_model import CanonicalDocument
 
 logger = logging.getLogger(__name__)
 
@@ -44,15 +45,17 @@ class AnonymousProcessor:
         parsed_result = await self.parser_service.parse_async(ocr_text)
         
         # 3. Map to pydantic model
+        doc = CanonicalDocument.from_document(parsed_result)
+        canonical = doc.to_dict()
         return ParsedData(
             document_type=parsed_result.get("document_type", "other"),
-            total_amount=parsed_result.get("total_amount"),
-            date=parsed_result.get("date"),
-            vendor_name=parsed_result.get("vendor_name"),
-            customer_name=parsed_result.get("customer_name"),
-            account_number=parsed_result.get("account_number"),
-            line_items=parsed_result.get("line_items") or parsed_result.get("items"),
-            transactions=parsed_result.get("transactions"),
+            total_amount=doc.total_amount,
+            date=doc.date,
+            vendor_name=doc.vendor_name,
+            customer_name=doc.customer_name,
+            account_number=doc.account_number,
+            line_items=canonical["line_items"] or None,
+            transactions=canonical["transactions"] or None,
             raw_text_length=len(ocr_text)
         )
 
@@ -5,8 +5,11 @@ services and converts low-level errors into application exceptions
 that are easier to handle at the API layer.
 """
 
+import asyncio
+import os
 from pathlib import Path
 from datetime import datetime
+from typing import List, Optional, Tuple
 
 from app.utils.key_generator import KeyGenerator
 from fastapi import UploadFile
@@ -18,6 +21,10 @@ from app.core.exceptions import BaseAppException, ExternalServiceError, Database
 import logging
 logger = logging.getLogger(__name__)
 
+# Parse through the streaming endpoint and incremental JSON parser, reserving the
+# document key as soon as the document type has streamed in
+PARSER_STREAMING = os.getenv("PARSER_STREAMING", "false").lower() == "true"
+
 
 class DocumentProcessor:
     """Main coordinator: OCR -> Gemini Parser -> Save JSON in Firebase
@@ -56,10 +63,10 @@ class DocumentProcessor:
                 "OCR extraction failed", service_name="ocr", original_error=e
             )
 
-    async def _parse_text(self, ocr_text: str, image_ref: str, user_id: str = None) -> dict:
+    async def _parse_text(self, ocr_text: str, image_ref: str, user_id: str = None, company_id: str = None) -> dict:
         logger.info("Parsing OCR text with parser service")
         try:
-            parsed = await self.parser.parse_async(ocr_text, image_ref, user_id=user_id)
+            parsed = await self.parser.parse_async(ocr_text, image_ref, user_id=user_id, tenant_id=company_id)
             logger.info("Parsing complete")
             return parsed
         except Exception as e:
@@ -68,6 +75,55 @@ class DocumentProcessor:
                 "Parser service failed", service_name="parser", original_error=e
             )
 
+    async def _parse_text_streaming(
+        self, ocr_text: str, image_ref: str, user_id: str, company_id: str
+    ) -> Tuple[dict, Optional[str]]:
+        """
+        Streams the parse and returns (parsed, document_key).
+        Key generation (a Firebase counter round trip) starts as soon as the
+        document_type header field streams in, overlapping the rest of the
+        generation (long transaction lists). On "done" the reserved key is kept
+        if the final type still matches; otherwise None is returned and _store
+        generates a fresh one. A reserved number is skipped when the type
+        changes or the parse fails.
+        """
+        logger.info("Streaming OCR text through parser service")
+        parsed = None
+        key_task: Optional[asyncio.Task] = None
+        key_type = None
+        try:
+            async for kind, key, value in self.parser.parse_stream_async(
+                ocr_text, image_ref, user_id=user_id, tenant_id=company_id
+            ):
+                if kind == "field" and key == "document_type" and key_task is None:
+                    key_type = value
+                    key_task = asyncio.create_task(
+                        self._generate_document_key({"document_type": value}, user_id, company_id)
+                    )
+                elif kind == "done":
+                    parsed = value
+        except BaseException as e:
+            if key_task is not None:
+                key_task.cancel()
+            if not isinstance(e, Exception):
+                raise
+            logger.exception("Streaming parser service failed")
+            raise ExternalServiceError(
+                "Parser service failed", service_name="parser", original_error=e
+            )
+
+        logger.info("Parsing complete")
+        if key_task is None:
+            return parsed, None
+        document_key = await key_task
+        if parsed.get("document_type", "other") != key_type:
+            logger.info(
+                f"Document type changed from {key_type} to {parsed.get('document_type')} after streaming; "
+                f"discarding reserved key {document_key}"
+            )
+            return parsed, None
+        return parsed, document_key
+
     async def _generate_document_key(
         self, parsed_data: dict, user_id: str, company_id: str
     ) -> str:
@@ -97,6 +153,79 @@ class DocumentProcessor:
                 original_error=e,
             )
 
+    async def _read_text(self, image_path: str, image_url: str = None, file: UploadFile = None) -> str:
+        """OCR from the uploaded bytes when available, else from the URL or local path."""
+        if file:
+            logger.info(f"Extracting text directly from uploaded file: {file.filename}")
+            content = await file.read()
+            ocr_text = await self.ocr.extract_text_from_bytes_async(content, file.filename)
+            # Ensure we reset for any other potential consumers
+            await file.seek(0)
+            return ocr_text
+        return await self._extract_text(image_url if image_url else image_path)
+
+    async def _store(
+        self, parsed_data: dict, user_id: str, company_id: str, image_url: str = None, document_key: str = None
+    ) -> dict:
+        """Generates the document key (unless one was reserved) and saves the parsed document."""
+        parsed_data["document_key"] = document_key or await self._generate_document_key(
+            parsed_data, user_id, company_id
+        )
+        if image_url:
+            parsed_data["image_url"] = image_url
+        saved_result = await self._save_to_firebase(parsed_data, user_id, company_id)
+        saved_result.pop("status")
+        return saved_result
+
+    async def process_images_async(
+        self,
+        uploads: List[dict],
+        user_id: str,
+        company_id: str,
+    ) -> List[dict]:
+        """
+        Bulk variant of process_image_async for many documents of one user.
+        `uploads` holds image_path / image_url / file per document. OCR runs
+        concurrently, then all texts go through parse_batch_async, which packs
+        short documents into shared LLM calls. Results are in input order; a
+        document that fails comes back as {"error": ...} without failing the rest.
+        """
+        texts = await asyncio.gather(
+            *(self._read_text(u["image_path"], u.get("image_url"), u.get("file")) for u in uploads),
+            return_exceptions=True,
+        )
+        results: List[Optional[dict]] = [None] * len(uploads)
+        ready = []
+        for i, text in enumerate(texts):
+            if isinstance(text, BaseException):
+                logger.warning(f"OCR failed for upload {i}: {text}")
+                results[i] = {"error": str(text)}
+            else:
+                ready.append(i)
+
+        if ready:
+            try:
+                parsed = await self.parser.parse_batch_async(
+                    [texts[i] for i in ready],
+                    [uploads[i].get("image_url") or uploads[i]["image_path"] for i in ready],
+                    user_id=user_id,
+                    tenant_id=company_id,
+                )
+            except Exception as e:
+                logger.exception("Batch parser service failed")
+                raise ExternalServiceError(
+                    "Parser service failed", service_name="parser", original_error=e
+                )
+            logger.info(f"Batch parsing complete for {len(ready)} document(s)")
+
+            saved = await asyncio.gather(
+                *(self._store(data, user_id, company_id, uploads[i].get("image_url")) for i, data in zip(ready, parsed)),
+                return_exceptions=True,
+            )
+            for i, outcome in zip(ready, saved):
+                results[i] = {"error": str(outcome)} if isinstance(outcome, BaseException) else outcome
+        return results
+
     async def process_image_async(
         self, 
         image_path: str, 
@@ -109,32 +238,20 @@ class DocumentProcessor:
         """
         try:
             # Prioritize direct file content if available to avoid redundant downloads/local reads
-            if file:
-                logger.info(f"Extracting text directly from uploaded file: {file.filename}")
-                content = await file.read()
-                ocr_text = await self.ocr.extract_text_from_bytes_async(content, file.filename)
-                # Ensure we reset for any other potential consumers
-                await file.seek(0)
-            else:
-                # Fallback to URL or local path
-                source_path = image_url if image_url else image_path
-                ocr_text = await self._extract_text(source_path)
+            ocr_text = await self._read_text(image_path, image_url, file)
 
-            parsed_data = await self._parse_text(ocr_text, image_url or image_path, user_id=user_id)
-
-            # Generate or fallback document key
-            parsed_data["document_key"] = await self._generate_document_key(
-                parsed_data, user_id, company_id
-            )
-
-            if image_url:
-                parsed_data["image_url"] = image_url
+            document_key = None
+            if PARSER_STREAMING:
+                parsed_data, document_key = await self._parse_text_streaming(
+                    ocr_text, image_url or image_path, user_id, company_id
+                )
+            else:
+                parsed_data = await self._parse_text(
+                    ocr_text, image_url or image_path, user_id=user_id, company_id=company_id
+                )
 
-            saved_result = await self._save_to_firebase(
-                parsed_data, user_id, company_id
-            )
-            saved_result.pop("status")
-            return saved_result
+            # Generate or fallback document key, then save
+            return await self._store(parsed_data, user_id, company_id, image_url, document_key)
         except (BaseAppException, ExternalServiceError, DatabaseError):
             raise
         except Exception as e:
@@ -1,5 +1,6 @@
+import asyncio
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from fastapi import UploadFile, BackgroundTasks
 
 from app.infrastructure.storage.supabase_service import SupabaseStorageService
@@ -61,6 +62,62 @@ class UploadOrchestrator:
             file=file
         )
         
+        return self._finish(processing_result, image_url, background_tasks, user_id, company_name, company_id)
+
+    async def handle_bulk_upload(
+        self,
+        files: List[UploadFile],
+        background_tasks: BackgroundTasks,
+        current_user: Dict[str, Any],
+    ) -> List[Dict[str, Any]]:
+        """
+        Handles many uploads of one user at once. Short documents are parsed
+        together in batched LLM calls, so bulk uploads are not capped by the
+        provider's requests-per-minute limit. One result per file, in order;
+        failed files get {"status": "error", ...} without failing the rest.
+        """
+        user_id = current_user["userId"]
+        company_name = current_user["companyName"]
+        company_id = current_user["activeCompany"]
+
+        logger.info(f"Bulk uploading {len(files)} documents for user: {user_id}, company: {company_name}")
+
+        # 1. Save uploaded files
+        stored = await asyncio.gather(*(self.storage_service.save_file(f) for f in files), return_exceptions=True)
+        uploads = [
+            {"image_path": r["path"], "image_url": r["url"], "file": f}
+            for f, r in zip(files, stored) if not isinstance(r, BaseException)
+        ]
+
+        # 2. Process files (OCR + batched parsing + saving to Firebase)
+        processed = iter(await self.document_processor.process_images_async(uploads, user_id, company_id))
+        upload_urls = iter(u["image_url"] for u in uploads)
+
+        responses = []
+        for f, r in zip(files, stored):
+            if isinstance(r, BaseException):
+                logger.warning(f"Failed to store {f.filename}: {r}")
+                responses.append({"status": "error", "filename": f.filename, "error": "Failed to store file"})
+                continue
+            result, image_url = next(processed), next(upload_urls)
+            if "error" in result:
+                responses.append({"status": "error", "filename": f.filename, "error": result["error"]})
+                continue
+            response = self._finish(result, image_url, background_tasks, user_id, company_name, company_id)
+            response["filename"] = f.filename
+            responses.append(response)
+        return responses
+
+    def _finish(
+        self,
+        processing_result: Dict[str, Any],
+        image_url: str,
+        background_tasks: BackgroundTasks,
+        user_id: str,
+        company_name: Optional[str],
+        company_id: str,
+    ) -> Dict[str, Any]:
+        """Categorizes a processed document and schedules indexing and sheet sync."""
         document_key = processing_result["document_key"]
         full_data = processing_result.get("full_data", {})
 
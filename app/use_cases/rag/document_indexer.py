@@ -11,6 +11,7 @@ from datetime import datetime
 from app.infrastructure.embeddings.embedding_service import get_embedding_service
 from app.infrastructure.vector_db.faiss_service import get_faiss_service
 from app.core.exceptions import DatabaseError, ExternalServiceError, BaseAppException
+from app.core.document_model import CANONICAL_KEY
 
 import logging
 from dotenv import load_dotenv
@@ -54,7 +55,7 @@ class DocumentIndexer:
             data_to_embed = parsed_data.copy()
 
             # Remove non-semantic/internal fields to save tokens
-            for k in ("document_key", "image_url"):
+            for k in ("document_key", "image_url", CANONICAL_KEY):
                 if k in data_to_embed:
                     data_to_embed.pop(k, None)
 
@@ -101,14 +102,17 @@ class DocumentIndexer:
             metadata = self._prepare_metadata(document_key, parsed_data, summary)
 
             logger.info(f"DocumentIndexer: Dispatching to vector_db.add_document for {document_key} (Type: {type(self.vector_db).__name__})")
-            loop = asyncio.get_running_loop()
-            await loop.run_in_executor(
-                None,
-                self._add_document_to_vector_db,
-                document_key,
-                embedding,
-                metadata,
-            )
+            if hasattr(self.vector_db, "add_document_async"):
+                await self._add_document_to_vector_db_async(document_key, embedding, metadata)
+            else:
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(
+                    None,
+                    self._add_document_to_vector_db,
+                    document_key,
+                    embedding,
+                    metadata,
+                )
 
             logger.info(
                 "Successfully indexed document",
@@ -168,6 +172,21 @@ class DocumentIndexer:
             logger.error("Preparing metadata failed", exc_info=True)
             raise BaseAppException(f"Failed to prepare metadata: {e}")
 
+    async def _add_document_to_vector_db_async(self, document_key: str, embedding, metadata: Dict):
+        """Add a document through the vector DB's async path. Wraps DB errors."""
+        try:
+            await self.vector_db.add_document_async(document_key, embedding, metadata)
+        except DatabaseError:
+            logger.error(
+                f"Vector DB operation failed for {document_key}", exc_info=True
+            )
+            raise
+        except Exception as e:
+            logger.error(f"Failed to add document to vector DB: {e}", exc_info=True)
+            raise DatabaseError(
+                f"Failed to add document to vector DB: {e}", operation="add_document"
+            )
+
     def _add_document_to_vector_db(self, document_key: str, embedding, metadata: Dict):
         """Add a document to the vector DB (blocking). Wraps DB errors."""
         try:
@@ -27,6 +27,7 @@ class LLMFactory:
         Reads from environment variables:
             RAG_LLM_PROVIDER  – "groq" or "gemini"  (default: "groq")
             RAG_LLM_MODEL     – model name           (default: "llama-3.3-70b-versatile")
+            LLM_STUB_URL      – base URL of stub_llm_server.py; overrides the provider
 
         Returns:
             (llm, rate_limiter)
@@ -36,6 +37,10 @@ class LLMFactory:
 
         logger.info(f"LLMFactory: creating LLM  provider={provider}  model={model_name}")
 
+        stub_url = os.getenv("LLM_STUB_URL")
+        if stub_url and provider in ("groq", "gemini", "google"):
+            return LLMFactory._create_stub(model_name, provider, stub_url)
+
         if provider == "groq":
             return LLMFactory._create_groq(model_name)
         elif provider in ("gemini", "google"):
@@ -61,6 +66,7 @@ class LLMFactory:
         llm = ChatGroq(
             model=model_name,
             groq_api_key=api_key,
+            http_async_client=limiter.http_async_client(),
             temperature=0,
             timeout=30,
             max_retries=2,
@@ -68,6 +74,28 @@ class LLMFactory:
         logger.info(f"LLMFactory: Groq LLM ready  model={model_name}")
         return llm, limiter
 
+    # ------------------------------------------------------------------ #
+    #  Local stub (load testing)
+    # ------------------------------------------------------------------ #
+    @staticmethod
+    def _create_stub(model_name: str, provider: str, stub_url: str) -> Tuple[Any, Any]:
+        # Same limiter as the real provider so load tests reflect production limits
+        if provider == "groq":
+            limiter = get_rate_limiter(provider=APIProvider.GROQ, name="rag_groq")
+        else:
+            limiter = get_rate_limiter(provider=APIProvider.GEMINI_FREE, name="rag_gemini")
+        llm = ChatGroq(
+            model=model_name,
+            groq_api_key="stub",
+            http_async_client=limiter.http_async_client(),
+            base_url=stub_url,
+            temperature=0,
+            timeout=30,
+            max_retries=2,
+        )
+        logger.info(f"LLMFactory: stub LLM ready  model={model_name}  url={stub_url}")
+        return llm, limiter
+
     # ------------------------------------------------------------------ #
     #  Gemini
     # ------------------------------------------------------------------ #
@@ -1,9 +1,13 @@
 from datetime import datetime, timezone
+import asyncio
+import functools
 import json
 import logging
 from typing import List, Dict, Tuple, Optional, Any
 from langchain_core.messages import HumanMessage, SystemMessage
 
+from app.core.document_model import CanonicalDocument, CANONICAL_KEY
+
 logger = logging.getLogger(__name__)
 
 class QueryAnalyzer:
@@ -61,7 +65,9 @@ class ContextRetriever:
 
         if want_all_docs and is_aggregation:
             logger.info(f"Full scan requested for user {user_id}")
-            all_docs = self.vector_db.get_all_documents()
+            # Vector DB clients are synchronous; keep them off the event loop
+            loop = asyncio.get_running_loop()
+            all_docs = await loop.run_in_executor(None, self.vector_db.get_all_documents)
             user_docs = [
                 (key, 1.0, meta)
                 for key, meta in all_docs
@@ -72,10 +78,8 @@ class ContextRetriever:
 
         # Generate query embedding
         try:
-            query_embedding = self.embedding_service.generate_embeddings_batch([query])
-            if query_embedding is not None and len(query_embedding) > 0:
-                query_embedding = query_embedding[0]
-            else:
+            query_embedding = await self.embedding_service.generate_embedding_async(query)
+            if query_embedding is None or len(query_embedding) == 0:
                 return []
         except Exception as e:
             logger.error(f"Embedding generation failed: {e}")
@@ -83,8 +87,14 @@ class ContextRetriever:
 
         # Search in vector DB
         k = 100 if is_aggregation else top_k
-        return self.vector_db.search(
-            query_embedding, top_k=k, user_id=user_id, company_id=company_id
+        if hasattr(self.vector_db, "search_async"):
+            return await self.vector_db.search_async(query_embedding, top_k=k, user_id=user_id, company_id=company_id)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            functools.partial(
+                self.vector_db.search, query_embedding, top_k=k, user_id=user_id, company_id=company_id
+            ),
         )
 
 
@@ -126,6 +136,36 @@ class PromptManager:
             except Exception:
                 return datetime.min.replace(tzinfo=timezone.utc)
 
+    @staticmethod
+    def document_fields(metadata: Dict) -> Dict:
+        """Metadata with the canonical fields (when stored) taking precedence."""
+        canonical = metadata.get(CANONICAL_KEY)
+        if not isinstance(canonical, dict):
+            return metadata
+        doc = CanonicalDocument.from_dict(canonical)
+        fields = dict(metadata)
+        fields.update(
+            document_type=doc.document_type,
+            total_amount=doc.total_amount,
+            date=doc.date,
+            vendor_name=doc.vendor_name,
+            currency=doc.currency or metadata.get("currency"),
+        )
+        return fields
+
+    def build_sources(self, documents: List[Tuple[str, float, Dict]]) -> List[Dict[str, Any]]:
+        """Source citations returned alongside the chat answer."""
+        sources = []
+        for doc_key, score, metadata in documents:
+            fields = self.document_fields(metadata)
+            sources.append({
+                "document_key": doc_key,
+                "store_name": fields.get("store_name", fields.get("vendor_name") or "Unknown"),
+                "date": fields.get("date") or "Unknown",
+                "total_amount": fields.get("total_amount", "0.00"),
+            })
+        return sources
+
     def build_context_string(self, documents: List[Tuple[str, float, Dict]]) -> str:
         """Format retrieved documents into a human-readable context string, sorted by date.
         Pre-cleans data to remove currency symbols and sensitive IDs.
@@ -142,6 +182,7 @@ class PromptManager:
 
         context_parts = []
         for i, (doc_key, score, metadata) in enumerate(sorted_docs, 1):
+            metadata = self.document_fields(metadata)
             # Create a clean readable summary
             lines = [f"Document {i} (Reference: {doc_key})"]
             
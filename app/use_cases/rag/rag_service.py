@@ -53,20 +53,12 @@ class RAGService:
             messages = self.prompt_manager.build_messages(query, context_str)
             
             response = await self.rate_limiter.execute_with_retry(
-                self.llm.ainvoke, messages, priority=0
+                self.llm.ainvoke, messages, priority=0, tenant=company_id or user_id
             )
             
             bot_response = response.content or "I'm sorry, I couldn't generate a response. Please try rephrasing your question."
             
-            sources = [
-                {
-                    "document_key": doc_key,
-                    "store_name": meta.get("store_name", meta.get("vendor_name", "Unknown")),
-                    "date": meta.get("date", "Unknown"),
-                    "total_amount": meta.get("total_amount", "0.00"),
-                }
-                for doc_key, score, meta in documents
-            ]
+            sources = self.prompt_manager.build_sources(documents)
             
             return {
                 "response": bot_response,
@@ -104,15 +96,7 @@ class RAGService:
             context_str = self.prompt_manager.build_context_string(documents)
             messages = self.prompt_manager.build_messages(query, context_str)
 
-            sources = [
-                {
-                    "document_key": doc_key,
-                    "store_name": meta.get("store_name", meta.get("vendor_name", "Unknown")),
-                    "date": meta.get("date", "Unknown"),
-                    "total_amount": meta.get("total_amount", "0.00"),
-                }
-                for doc_key, score, meta in documents
-            ]
+            sources = self.prompt_manager.build_sources(documents)
 
             metadata = {
                 'query_type': analysis['query_type'],
@@ -120,9 +104,13 @@ class RAGService:
             }
             yield f"metadata:{json.dumps(metadata)}\n"
 
-            await self.rate_limiter._scheduler.wait_for_slot(priority=0)
-            
-            async for chunk in self.llm.astream(messages):
+            stream = self.rate_limiter.stream_with_retry(
+                lambda: self.llm.astream(messages),
+                priority=0,
+                payload=messages,
+                tenant=company_id or user_id,
+            )
+            async for chunk in stream:
                 yield f"data:{chunk}\n"
 
         except Exception as e:
@@ -0,0 +1,357 @@
+"""Re-embedding Job
+Rebuilds the `embeddings` table for a new embedding model or dimension without
+mixing vectors from different spaces.
+
+    1. backfill – stream live rows in id order (keyset pages), re-embed their
+                  `content` in large batches with bounded concurrency and upsert
+                  them into `embeddings_<version>`. Progress is checkpointed to a
+                  JSON file, so an interrupted run resumes where it stopped.
+    2. catch-up – re-embed rows inserted or whose content changed after the
+                  backfill passed them; drop rows deleted since.
+    3. switch   – under a write lock (reads continue), run a last catch-up, then
+                  rename `embeddings` -> `embeddings_before_<version>` and
+                  `embeddings_<version>` -> `embeddings` and record the version
+                  and model in `embedding_config`, in one transaction.
+
+The int8 rescoring side table (`embedding_rescore`, see quantization.py), if
+present, is rebuilt alongside as `embedding_rescore_<version>` and renamed with it.
+
+`content` is the exact text the indexer embedded, so no Firebase reads are
+needed. Vectors always come from the backend, never the embedding cache. The previous table is kept for rollback. If the dimension changes,
+`match_embeddings` must accept the new size; pass its new definition as
+`switch_sql` so it is replaced in the same transaction.
+"""
+
+import os
+import re
+import json
+import time
+import asyncio
+import logging
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+import asyncpg
+import numpy as np
+
+from app.core.exceptions import ConfigurationError, DatabaseError
+from app.infrastructure.embeddings.embedding_service import EmbeddingService
+from app.infrastructure.embeddings.quantization import RESCORE_TABLE, pack_int8, truncate_dimension
+from app.infrastructure.vector_db.pg_vector_repository import record_embedding_config
+
+logger = logging.getLogger(__name__)
+
+LIVE_TABLE = "embeddings"
+REEMBED_BATCH_SIZE = int(os.getenv("REEMBED_BATCH_SIZE", "256"))
+# Batches being embedded/written at once
+REEMBED_CONCURRENCY = int(os.getenv("REEMBED_CONCURRENCY", "4"))
+REEMBED_CHECKPOINT_DIR = os.getenv("REEMBED_CHECKPOINT_DIR", "data/reembedding")
+
+_VERSION = re.compile(r"^[a-z0-9_]{1,40}$")
+
+
+@dataclass
+class ReembeddingCheckpoint:
+    """Progress of one versioned rebuild, persisted after every contiguous batch."""
+    version: str
+    dimension: int
+    model: str = ""
+    last_id: Any = None
+    processed: int = 0
+    backfill_done: bool = False
+    switched: bool = False
+    started_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["ReembeddingCheckpoint"]:
+        if not os.path.exists(path):
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(**json.load(f))
+
+    def save(self, path: str):
+        self.updated_at = time.time()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(asdict(self), f, indent=2)
+        os.replace(tmp, path)  # atomic: a crash never leaves a half-written checkpoint
+
+
+class ReembeddingJob:
+    """
+    Resumable rebuild of the vector table into `embeddings_<version>`.
+    `pool` connections must use the binary vector codec (PgVectorRepository.create).
+    """
+
+    def __init__(
+        self,
+        pool: asyncpg.Pool,
+        embedding_service: EmbeddingService,
+        version: str,
+        storage_dimension: Optional[int] = None,
+        batch_size: int = REEMBED_BATCH_SIZE,
+        concurrency: int = REEMBED_CONCURRENCY,
+        checkpoint_dir: str = REEMBED_CHECKPOINT_DIR,
+    ):
+        if not _VERSION.match(version):
+            raise ConfigurationError(
+                f"Invalid re-embedding version '{version}': use lowercase letters, digits and '_'",
+                config_key="version",
+            )
+        self.pool = pool
+        self.embedding_service = embedding_service
+        self.version = version
+        self.dimension = min(storage_dimension or embedding_service.embedding_dim, embedding_service.embedding_dim)
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+        self.target_table = f"{LIVE_TABLE}_{version}"
+        self.previous_table = f"{LIVE_TABLE}_before_{version}"
+        self.target_rescore_table = f"{RESCORE_TABLE}_{version}"
+        self.previous_rescore_table = f"{RESCORE_TABLE}_before_{version}"
+        self.checkpoint_path = os.path.join(checkpoint_dir, f"{version}.json")
+        self.checkpoint = self._load_checkpoint()
+        self._columns: List[str] = []
+        self._rescore = False
+        self.model: Optional[str] = None
+
+    def _load_checkpoint(self) -> ReembeddingCheckpoint:
+        checkpoint = ReembeddingCheckpoint.load(self.checkpoint_path)
+        if checkpoint is None:
+            return ReembeddingCheckpoint(version=self.version, dimension=self.dimension)
+        if checkpoint.dimension != self.dimension:
+            raise ConfigurationError(
+                f"Checkpoint for '{self.version}' was built at dimension {checkpoint.dimension}, "
+                f"not {self.dimension}; use a new version",
+                config_key="EMBEDDING_DIMENSION",
+            )
+        return checkpoint
+
+    # ------------------------------------------------------------------ #
+    #  Schema
+    # ------------------------------------------------------------------ #
+    async def prepare(self):
+        """
+        Creates the versioned table (same columns, keys and indexes) at the new
+        dimension, and the rescoring side table for it if the live one exists;
+        that table gets the untruncated vectors, int8-quantized.
+        """
+        self.model = await self.embedding_service.model_id()
+        if not self.model:
+            raise ConfigurationError("Embedding backend did not report its model", config_key="EMBEDDING_BACKEND")
+        if self.checkpoint.model and self.checkpoint.model != self.model:
+            raise ConfigurationError(
+                f"Checkpoint for '{self.version}' was built with {self.checkpoint.model}, "
+                f"not {self.model}; use a new version",
+                config_key="EMBEDDING_BACKEND",
+            )
+        self.checkpoint.model = self.model
+
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = 'public' AND table_name = $1 ORDER BY ordinal_position",
+                LIVE_TABLE,
+            )
+            self._columns = [r["column_name"] for r in rows]
+            if "id" not in self._columns or "content" not in self._columns:
+                raise DatabaseError(f"{LIVE_TABLE} has no id/content columns", operation="reembed_prepare")
+            if await conn.fetchval("SELECT to_regclass($1)", self.target_table) is None:
+                async with conn.transaction():
+                    await conn.execute(f"CREATE TABLE {self.target_table} (LIKE {LIVE_TABLE} INCLUDING ALL)")
+                    await conn.execute(
+                        f"ALTER TABLE {self.target_table} ALTER COLUMN embedding TYPE vector({self.dimension})"
+                    )
+            self._rescore = await conn.fetchval("SELECT to_regclass($1)", RESCORE_TABLE) is not None
+            if self._rescore and await conn.fetchval("SELECT to_regclass($1)", self.target_rescore_table) is None:
+                async with conn.transaction():
+                    await conn.execute(
+                        f"CREATE TABLE {self.target_rescore_table} (LIKE {RESCORE_TABLE} INCLUDING ALL)"
+                    )
+                    await conn.execute(
+                        f"ALTER TABLE {self.target_rescore_table} ADD FOREIGN KEY (id) "
+                        f"REFERENCES {self.target_table}(id) ON DELETE CASCADE"
+                    )
+
+    # ------------------------------------------------------------------ #
+    #  Embedding and writes
+    # ------------------------------------------------------------------ #
+    async def _embed(self, rows: List[asyncpg.Record]) -> np.ndarray:
+        """Full-precision vectors; the stored column is truncated in _write."""
+        return await self.embedding_service.generate_embeddings_batch_async(
+            [r["content"] or "" for r in rows], "document", use_cache=False
+        )
+
+    async def _write(self, conn: asyncpg.Connection, rows: List[asyncpg.Record], vectors: np.ndarray):
+        """Idempotent upsert by id, so batches replayed after a resume are harmless."""
+        columns = ", ".join(self._columns)
+        placeholders = ", ".join(f"${i + 1}" for i in range(len(self._columns)))
+        updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in self._columns if c != "id")
+        query = (
+            f"INSERT INTO {self.target_table} ({columns}) OVERRIDING SYSTEM VALUE VALUES ({placeholders}) "
+            f"ON CONFLICT (id) DO UPDATE SET {updates}"
+        )
+        stored = truncate_dimension(vectors, self.dimension)
+        records = [
+            tuple(stored[i] if c == "embedding" else row[c] for c in self._columns)
+            for i, row in enumerate(rows)
+        ]
+        await conn.executemany(query, records)
+        if self._rescore:
+            await conn.executemany(
+                f"INSERT INTO {self.target_rescore_table} (id, codes, scale) VALUES ($1, $2, $3) "
+                f"ON CONFLICT (id) DO UPDATE SET codes = EXCLUDED.codes, scale = EXCLUDED.scale",
+                [(row["id"], *pack_int8(vectors[i])) for i, row in enumerate(rows)],
+            )
+
+    async def _process(self, rows: List[asyncpg.Record], conn: Optional[asyncpg.Connection] = None):
+        vectors = await self._embed(rows)
+        if conn is not None:
+            await self._write(conn, rows, vectors)
+            return
+        async with self.pool.acquire() as conn:
+            await self._write(conn, rows, vectors)
+
+    # ------------------------------------------------------------------ #
+    #  Backfill
+    # ------------------------------------------------------------------ #
+    async def _fetch_page(self, after: Any) -> List[asyncpg.Record]:
+        async with self.pool.acquire() as conn:
+            if after is None:
+                return await conn.fetch(
+                    f"SELECT * FROM {LIVE_TABLE} ORDER BY id LIMIT $1", self.batch_size
+                )
+            return await conn.fetch(
+                f"SELECT * FROM {LIVE_TABLE} WHERE id > $1 ORDER BY id LIMIT $2", after, self.batch_size
+            )
+
+    async def backfill(self):
+        """
+        Streams pages in id order while up to `concurrency` batches are embedded
+        and written. The checkpoint only advances past pages whose predecessors
+        have all finished, so a resume never skips a row.
+        """
+        if self.checkpoint.backfill_done:
+            return
+        in_flight: Dict[int, asyncio.Task] = {}
+        page_ends: Dict[int, Tuple[Any, int]] = {}
+        next_page = next_commit = 0
+        after = self.checkpoint.last_id
+        exhausted = False
+
+        try:
+            while not exhausted or in_flight:
+                while not exhausted and len(in_flight) < self.concurrency:
+                    rows = await self._fetch_page(after)
+                    if not rows:
+                        exhausted = True
+                        break
+                    after = rows[-1]["id"]
+                    page_ends[next_page] = (after, len(rows))
+                    in_flight[next_page] = asyncio.create_task(self._process(rows))
+                    next_page += 1
+                if not in_flight:
+                    break
+
+                done, _ = await asyncio.wait(in_flight.values(), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    task.result()  # a failed batch stops the run; the checkpoint is still safe
+                finished = {page for page, task in in_flight.items() if task.done()}
+                for page in finished:
+                    del in_flight[page]
+
+                advanced = False
+                while next_commit < next_page and next_commit not in in_flight:
+                    last_id, count = page_ends.pop(next_commit)
+                    self.checkpoint.last_id = last_id if isinstance(last_id, int) else str(last_id)
+                    self.checkpoint.processed += count
+                    next_commit += 1
+                    advanced = True
+                if advanced:
+                    self.checkpoint.save(self.checkpoint_path)
+                    logger.info(f"Re-embedding {self.version}: {self.checkpoint.processed} rows")
+        except BaseException:
+            for task in in_flight.values():
+                task.cancel()
+            await asyncio.gather(*in_flight.values(), return_exceptions=True)
+            raise
+
+        self.checkpoint.backfill_done = True
+        self.checkpoint.save(self.checkpoint_path)
+
+    # ------------------------------------------------------------------ #
+    #  Catch-up and switch
+    # ------------------------------------------------------------------ #
+    async def catch_up(self, conn: Optional[asyncpg.Connection] = None) -> int:
+        """Re-embeds rows that are new or changed since the backfill and drops deleted ones."""
+        stale_query = (
+            f"SELECT e.* FROM {LIVE_TABLE} e LEFT JOIN {self.target_table} t ON t.id = e.id "
+            f"WHERE t.id IS NULL OR t.content IS DISTINCT FROM e.content ORDER BY e.id"
+        )
+        flags = [c for c in self._columns if c not in ("id", "content", "embedding")]
+        sync_query = (
+            f"UPDATE {self.target_table} t SET {', '.join(f'{c} = e.{c}' for c in flags)} FROM {LIVE_TABLE} e "
+            f"WHERE t.id = e.id AND ({' OR '.join(f't.{c} IS DISTINCT FROM e.{c}' for c in flags)})"
+        ) if flags else None
+        delete_query = (
+            f"DELETE FROM {self.target_table} t "
+            f"WHERE NOT EXISTS (SELECT 1 FROM {LIVE_TABLE} e WHERE e.id = t.id)"
+        )
+
+        async def run(c: asyncpg.Connection) -> int:
+            stale = await c.fetch(stale_query)
+            for start in range(0, len(stale), self.batch_size):
+                await self._process(stale[start:start + self.batch_size], c)
+            if sync_query:
+                await c.execute(sync_query)  # soft deletes and other metadata
+            await c.execute(delete_query)
+            return len(stale)
+
+        if conn is not None:
+            return await run(conn)
+        async with self.pool.acquire() as c:
+            return await run(c)
+
+    async def switch(self, switch_sql: Optional[str] = None):
+        """
+        Atomically makes the versioned table the live one. Writers wait on the
+        lock during the final catch-up; readers keep going until the renames,
+        which hold them only until commit, and see either the old or the new table.
+        """
+        if not self._columns:
+            await self.prepare()
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute(f"LOCK TABLE {LIVE_TABLE} IN EXCLUSIVE MODE")
+                count = await self.catch_up(conn)
+                await conn.execute(f"ALTER TABLE {LIVE_TABLE} RENAME TO {self.previous_table}")
+                await conn.execute(f"ALTER TABLE {self.target_table} RENAME TO {LIVE_TABLE}")
+                if self._rescore:
+                    await conn.execute(f"ALTER TABLE {RESCORE_TABLE} RENAME TO {self.previous_rescore_table}")
+                    await conn.execute(f"ALTER TABLE {self.target_rescore_table} RENAME TO {RESCORE_TABLE}")
+                await record_embedding_config(conn, self.version, self.model, self.dimension)
+                if switch_sql:
+                    await conn.execute(switch_sql)
+        self.checkpoint.switched = True
+        self.checkpoint.save(self.checkpoint_path)
+        logger.info(
+            f"Switched reads to re-embedded table (version {self.version}, {count} rows caught up); "
+            f"previous table kept as {self.previous_table}"
+        )
+
+    async def run(self, switch: bool = False, switch_sql: Optional[str] = None) -> ReembeddingCheckpoint:
+        """prepare -> backfill -> catch-up, then optionally switch. Safe to re-run."""
+        if self.checkpoint.switched:
+            logger.info(f"Re-embedding {self.version} already switched")
+            return self.checkpoint
+        await self.prepare()
+        await self.backfill()
+        count = await self.catch_up()
+        logger.info(f"Re-embedding {self.version}: backfill complete, {count} rows caught up")
+        if switch:
+            await self.switch(switch_sql)
+        return self.checkpoint
+
+    def status(self) -> Dict[str, Any]:
+        return {"target_table": self.target_table, "checkpoint_path": self.checkpoint_path, **asdict(self.checkpoint)}
@@ -1,5 +1,17 @@
 from typing import Dict, Any, List, Optional
 from app.core.logger import logger
+from app.core.document_model import CanonicalDocument, CanonicalLineItem
+
+
+def get_line_items(data: Dict[str, Any]) -> List[CanonicalLineItem]:
+    """
+    Canonical line items for a document. Falls back to a single synthesized
+    item (see find_items_in_data) when the document has no item list.
+    """
+    items = CanonicalDocument.from_document(data).line_items
+    if items:
+        return items
+    return [CanonicalLineItem.from_raw(i) for i in (find_items_in_data(data) or [])]
 
 def find_items_in_data(data: Dict[str, Any]) -> Optional[List[Dict]]:
     """
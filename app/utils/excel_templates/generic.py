@@ -1,5 +1,6 @@
 from typing import Dict, Any
 from .generator import ExcelGenerator
+from app.core.document_model import CANONICAL_KEY
 
 class GenericTemplate:
     """Generic template for other document types"""
@@ -25,6 +26,7 @@ class GenericTemplate:
             'company_id', 'image_url', 'document_key',
             'user_id', 'created_at', 'document_type'
         ]
+        data = {k: v for k, v in data.items() if k != CANONICAL_KEY}
 
         row = 3
         border = generator.create_border()
@@ -1,7 +1,8 @@
 from typing import Dict, Any
 from .generator import ExcelGenerator
 from app.core.logger import logger
-from .base import find_items_in_data
+from .base import get_line_items
+from app.core.document_model import CanonicalDocument
 
 class InvoiceTemplate:
     """Professional invoice template with complete data display"""
@@ -10,6 +11,7 @@ class InvoiceTemplate:
     def generate(data: Dict[str, Any], generator: ExcelGenerator) -> ExcelGenerator:
         """Generate a beautifully formatted invoice with all data"""
         ws = generator.ws
+        doc = CanonicalDocument.from_document(data)
 
         # Debug: Print data structure to understand what fields are available
         if isinstance(data, dict):
@@ -34,36 +36,7 @@ class InvoiceTemplate:
 
         # Company/Vendor Information (Top)
         row = 3
-        vendor_name = (
-            data.get('vendor_name') or
-            data.get('supplier_name') or
-            data.get('company_name') or
-            data.get('store_name') or
-            data.get('business_name') or
-            data.get('seller_name') or
-            data.get('from_company') or
-            ''
-        )
-
-        if not vendor_name:
-            vendor_info_obj = data.get('vendor_info', data.get('supplier_info', {}))
-            if isinstance(vendor_info_obj, dict):
-                vendor_name = (
-                    vendor_info_obj.get('name') or
-                    vendor_info_obj.get('company_name') or
-                    vendor_info_obj.get('business_name') or
-                    ''
-                )
-
-            if not vendor_name and 'invoice_details' in data:
-                invoice_details = data.get('invoice_details', {})
-                if isinstance(invoice_details, dict):
-                    vendor_name = (
-                        invoice_details.get('vendor_name') or
-                        invoice_details.get('from') or
-                        invoice_details.get('issued_by') or
-                        ''
-                    )
+        vendor_name = doc.vendor_name or ''
 
         if vendor_name:
             generator.merge_and_write(f'A{row}', f'E{row}', vendor_name,
@@ -97,7 +70,7 @@ class InvoiceTemplate:
         row += 1  # Spacing
 
         generator.write_cell(f'A{row}', 'DATE:', font=generator.create_font(bold=True))
-        generator.write_cell(f'B{row}', generator.format_date(data.get('date', '')))
+        generator.write_cell(f'B{row}', generator.format_date(doc.date or ''))
         row += 1
         invoice_num = data.get('invoice_number', data.get('invoice_id', data.get('invoice_no', '')))
         if invoice_num:
@@ -106,7 +79,7 @@ class InvoiceTemplate:
             row += 1
 
         generator.write_cell(f'A{row}', 'BILL TO:', font=generator.create_font(bold=True))
-        generator.write_cell(f'B{row}', data.get('customer_name', ''))
+        generator.write_cell(f'B{row}', doc.customer_name or '')
         row += 1
 
         customer_info = data.get('customer_info', {})
@@ -143,36 +116,30 @@ class InvoiceTemplate:
         generator.write_cell(f'D{row}', 'PRICE PER UNIT', font=generator.create_font(bold=True), alignment=generator.create_alignment(horizontal='right'), fill=header_fill, border=border)
         generator.write_cell(f'E{row}', 'TOTAL', font=generator.create_font(bold=True), alignment=generator.create_alignment(horizontal='right'), fill=header_fill, border=border)
 
-        items = find_items_in_data(data)
+        items = get_line_items(data)
         if not items:
             logger.warning("⚠️ No line items found in invoice data")
-            items = []
 
         row += 1
         sn = 1
 
-        if items and isinstance(items, list):
-            for item in items:
-                if isinstance(item, dict):
-                    desc = item.get('description', item.get('item', item.get('name', '')))
-                    quantity = item.get('quantity', item.get('qty', 1))
-                    price = item.get('price', item.get('unit_price', item.get('rate', 0)))
-                    total = item.get('total', item.get('amount', (float(price) * float(quantity)) if price and quantity else 0))
-
-                    generator.write_cell(f'A{row}', str(sn), alignment=generator.create_alignment(horizontal='center'), border=border)
-                    generator.write_cell(f'B{row}', desc, border=border)
-                    generator.write_cell(f'C{row}', str(quantity), alignment=generator.create_alignment(horizontal='center'), border=border)
-                    generator.write_cell(f'D{row}', generator.format_currency(price), alignment=generator.create_alignment(horizontal='right'), border=border)
-                    generator.write_cell(f'E{row}', generator.format_currency(total), alignment=generator.create_alignment(horizontal='right'), border=border)
-                    row += 1
-                    sn += 1
+        for item in items:
+            quantity = int(item.quantity) if item.quantity.is_integer() else item.quantity
+
+            generator.write_cell(f'A{row}', str(sn), alignment=generator.create_alignment(horizontal='center'), border=border)
+            generator.write_cell(f'B{row}', item.description, border=border)
+            generator.write_cell(f'C{row}', str(quantity), alignment=generator.create_alignment(horizontal='center'), border=border)
+            generator.write_cell(f'D{row}', generator.format_currency(item.price), alignment=generator.create_alignment(horizontal='right'), border=border)
+            generator.write_cell(f'E{row}', generator.format_currency(item.total), alignment=generator.create_alignment(horizontal='right'), border=border)
+            row += 1
+            sn += 1
 
         row += 1
-        subtotal = data.get('subtotal', data.get('total_amount', 0))
+        subtotal = data.get('subtotal', doc.total_amount)
         tax_rate = data.get('tax_rate', 0)
         tax = data.get('tax', data.get('sales_tax', 0))
         other = data.get('other', data.get('other_charges', 0))
-        total = data.get('total_amount', data.get('total', 0))
+        total = doc.total_amount
 
         generator.write_cell(f'D{row}', 'SUBTOTAL:', font=generator.create_font(bold=True), alignment=generator.create_alignment(horizontal='right'))
         generator.write_cell(f'E{row}', generator.format_currency(subtotal), alignment=generator.create_alignment(horizontal='right'))
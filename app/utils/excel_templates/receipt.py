@@ -1,7 +1,8 @@
 from typing import Dict, Any
 from .generator import ExcelGenerator
 from app.core.logger import logger
-from .base import find_items_in_data
+from .base import get_line_items
+from app.core.document_model import CanonicalDocument
 
 class ReceiptTemplate:
     """Receipt template with complete data display"""
@@ -9,6 +10,8 @@ class ReceiptTemplate:
     @staticmethod
     def generate(data: Dict[str, Any], generator: ExcelGenerator) -> ExcelGenerator:
         """Generate a receipt format with all data"""
+        doc = CanonicalDocument.from_document(data)
+
         # Set column widths
         generator.set_column_width('A', 8)   # S.N
         generator.set_column_width('B', 35)  # Items
@@ -25,7 +28,7 @@ class ReceiptTemplate:
 
         # Store/Vendor info
         row = 3
-        vendor_name = data.get('vendor_name', data.get('store_name', ''))
+        vendor_name = doc.vendor_name or ''
         if vendor_name:
             generator.merge_and_write(f'A{row}', f'E{row}', vendor_name,
                                      font=generator.create_font(bold=True, size=14),
@@ -52,7 +55,7 @@ class ReceiptTemplate:
         # Receipt details on LEFT
         row += 1
         generator.write_cell(f'A{row}', 'DATE:', font=generator.create_font(bold=True))
-        generator.write_cell(f'B{row}', generator.format_date(data.get('date', '')))
+        generator.write_cell(f'B{row}', generator.format_date(doc.date or ''))
 
         row += 1
         receipt_num = data.get('receipt_number', data.get('receipt_id', ''))
@@ -74,33 +77,27 @@ class ReceiptTemplate:
         generator.write_cell(f'E{row}', 'TOTAL', font=generator.create_font(bold=True), alignment=generator.create_alignment(horizontal='right'), fill=header_fill, border=border)
 
         # Items
-        items = find_items_in_data(data)
+        items = get_line_items(data)
         if not items:
             logger.warning("No items found in receipt data")
-            items = []
 
         row += 1
         sn = 1
 
-        if items and isinstance(items, list):
-            for item in items:
-                if isinstance(item, dict):
-                    desc = item.get('description', item.get('item', item.get('name', '')))
-                    quantity = item.get('quantity', item.get('qty', 1))
-                    price = item.get('price', item.get('unit_price', 0))
-                    total = item.get('total', item.get('amount', (float(price) * float(quantity)) if price and quantity else 0))
-
-                    generator.write_cell(f'A{row}', str(sn), alignment=generator.create_alignment(horizontal='center'), border=border)
-                    generator.write_cell(f'B{row}', desc, border=border)
-                    generator.write_cell(f'C{row}', str(quantity), alignment=generator.create_alignment(horizontal='center'), border=border)
-                    generator.write_cell(f'D{row}', generator.format_currency(price), alignment=generator.create_alignment(horizontal='right'), border=border)
-                    generator.write_cell(f'E{row}', generator.format_currency(total), alignment=generator.create_alignment(horizontal='right'), border=border)
-                    row += 1
-                    sn += 1
+        for item in items:
+            quantity = int(item.quantity) if item.quantity.is_integer() else item.quantity
+
+            generator.write_cell(f'A{row}', str(sn), alignment=generator.create_alignment(horizontal='center'), border=border)
+            generator.write_cell(f'B{row}', item.description, border=border)
+            generator.write_cell(f'C{row}', str(quantity), alignment=generator.create_alignment(horizontal='center'), border=border)
+            generator.write_cell(f'D{row}', generator.format_currency(item.price), alignment=generator.create_alignment(horizontal='right'), border=border)
+            generator.write_cell(f'E{row}', generator.format_currency(item.total), alignment=generator.create_alignment(horizontal='right'), border=border)
+            row += 1
+            sn += 1
 
         # Total
         row += 1
-        total = data.get('total_amount', data.get('total', 0))
+        total = doc.total_amount
         generator.write_cell(f'D{row}', 'TOTAL:', font=generator.create_font(bold=True, size=12), alignment=generator.create_alignment(horizontal='right'), fill=generator.create_fill('E7E6E6'))
         generator.write_cell(f'E{row}', generator.format_currency(total), font=generator.create_font(bold=True, size=12), alignment=generator.create_alignment(horizontal='right'), fill=generator.create_fill('E7E6E6'))
 
@@ -0,0 +1,101 @@
+"""
+Latency and throughput benchmark for the embedding backends.
+
+Embeds the same synthetic receipt summaries with each backend at several
+batch sizes and concurrency levels, and reports per-call latency percentiles
+and texts/second. The cache and micro-batcher are bypassed so the numbers
+are the backend's own.
+
+Usage:
+    python benchmark_embeddings.py --backends remote,hashing --texts 512 \\
+        --batch-sizes 1,8,32 --concurrency 1,8
+    (remote uses EMBEDDING_SERVER_URL; local needs sentence-transformers)
+"""
+
+import argparse
+import asyncio
+import random
+import time
+from typing import List
+
+from app.infrastructure.embeddings.backends import create_embedding_backend
+from app.infrastructure.embeddings.embedding_service import EMBEDDING_DIMENSION
+
+VENDORS = ["Walmart", "Shell", "Amazon", "Starbucks", "Home Depot", "Uber", "Costco", "Target"]
+DOC_TYPES = ["receipt", "invoice", "bank statement", "utility bill"]
+
+
+def synthetic_texts(count: int, seed: int = 7) -> List[str]:
+    rng = random.Random(seed)
+    texts = []
+    for i in range(count):
+        vendor = rng.choice(VENDORS)
+        texts.append(
+            f"Document type: {rng.choice(DOC_TYPES)}. Vendor: {vendor}. "
+            f"Date: {rng.randint(1, 28)} March 2026. Total: {rng.uniform(3, 900):.2f} USD. "
+            f"Items: {', '.join(rng.sample(['fuel', 'coffee', 'groceries', 'tools', 'ride', 'books', 'snacks'], 3))}. "
+            f"Reference {i}."
+        )
+    return texts
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def run(backend, texts: List[str], batch_size: int, concurrency: int):
+    batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+    queue: asyncio.Queue = asyncio.Queue()
+    for batch in batches:
+        queue.put_nowait(batch)
+    latencies: List[float] = []
+
+    async def worker():
+        while not queue.empty():
+            batch = queue.get_nowait()
+            started = time.perf_counter()
+            await backend.embed_async(batch, "document")
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return latencies, elapsed
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Embedding backend benchmark")
+    parser.add_argument("--backends", default="remote,hashing", help="comma-separated: remote, hashing, local")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-sizes", default="1,8,32")
+    parser.add_argument("--concurrency", default="1,8")
+    parser.add_argument("--dimension", type=int, default=EMBEDDING_DIMENSION)
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.texts)
+    batch_sizes = [int(x) for x in args.batch_sizes.split(",")]
+    concurrency_levels = [int(x) for x in args.concurrency.split(",")]
+
+    print(f"{'backend':<10}{'batch':>6}{'conc':>6}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'texts/s':>12}")
+    for name in args.backends.split(","):
+        try:
+            backend = create_embedding_backend(args.dimension, name.strip())
+            await backend.embed_async(texts[:2], "document")  # warm up (model load, connections)
+        except Exception as e:
+            print(f"{name:<10} unavailable: {e}")
+            continue
+        for batch_size in batch_sizes:
+            for concurrency in concurrency_levels:
+                latencies, elapsed = await run(backend, texts, batch_size, concurrency)
+                print(
+                    f"{name:<10}{batch_size:>6}{concurrency:>6}"
+                    f"{percentile(latencies, 50) * 1000:>10.1f}{percentile(latencies, 95) * 1000:>10.1f}"
+                    f"{max(latencies) * 1000:>10.1f}{len(texts) / elapsed:>12.0f}"
+                )
+        await backend.aclose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
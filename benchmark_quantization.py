@@ -0,0 +1,92 @@
+"""
+Recall and size benchmark for truncated / quantized embedding storage.
+
+Builds a synthetic clustered corpus whose variance decays across dimensions
+(like Matryoshka-trained embeddings, where the leading dimensions carry most
+of the signal), or loads real vectors from an .npy file, and compares each
+storage configuration against exact float32 search:
+    recall@k, bytes per vector (searched and total including the full-precision
+    rescoring copy), and query time, with and without rescoring.
+
+Usage:
+    python benchmark_quantization.py --docs 20000 --queries 200 --k 10
+    python benchmark_quantization.py --embeddings vectors.npy --k 10
+"""
+
+import argparse
+import time
+from typing import List, Set
+
+import numpy as np
+
+from app.infrastructure.embeddings.quantization import (
+    SUPPORTED_DTYPES,
+    QuantizedVectorIndex,
+    truncate_dimension,
+)
+
+
+def synthetic_corpus(docs: int, queries: int, dimension: int, clusters: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    spectrum = np.exp(-np.arange(dimension) / (dimension / 4.0)).astype(np.float32)
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32) * spectrum
+    labels = rng.integers(0, clusters, docs + queries)
+    noise = rng.standard_normal((docs + queries, dimension)).astype(np.float32) * spectrum * 0.6
+    vectors = truncate_dimension(centers[labels] + noise, dimension)
+    return vectors[:docs], vectors[docs:]
+
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> List[Set[int]]:
+    scores = queries @ corpus.T
+    return [set(np.argpartition(-row, k - 1)[:k]) for row in scores]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding quantization recall benchmark")
+    parser.add_argument("--docs", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=768)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rescore-multiplier", type=int, default=4)
+    parser.add_argument("--embeddings", help="optional .npy of real normalised vectors (last --queries rows are queries)")
+    args = parser.parse_args()
+
+    if args.embeddings:
+        vectors = truncate_dimension(np.load(args.embeddings), 0)
+        corpus, queries = vectors[:-args.queries], vectors[-args.queries:]
+    else:
+        corpus, queries = synthetic_corpus(args.docs, args.queries, args.dimension, args.clusters)
+    dimension = corpus.shape[1]
+    truth = exact_top_k(corpus, queries, args.k)
+    keys = [str(i) for i in range(len(corpus))]
+
+    storage_dims = [d for d in (dimension, 512, 256, 128) if d <= dimension]
+    print(f"{len(corpus)} docs, {len(queries)} queries, dim {dimension}, recall@{args.k} vs exact float32\n")
+    print(f"{'dtype':<9}{'dim':>6}{'rescore':>9}{'recall':>9}{'search B':>10}{'bytes/vec':>11}{'ms/query':>10}")
+    for dtype in SUPPORTED_DTYPES:
+        for storage_dim in storage_dims:
+            for multiplier in (0, args.rescore_multiplier):
+                if dtype == "float32" and storage_dim == dimension and multiplier:
+                    continue  # identical to exact search
+                index = QuantizedVectorIndex(dimension, storage_dim, dtype, rescore_multiplier=multiplier)
+                index.add(keys, corpus)
+
+                started = time.perf_counter()
+                hits = 0
+                for query, expected in zip(queries, truth):
+                    found = {int(key) for key, _ in index.search(query, args.k)}
+                    hits += len(found & expected)
+                per_query_ms = (time.perf_counter() - started) / len(queries) * 1000
+                nbytes = index.nbytes()
+
+                print(
+                    f"{dtype:<9}{storage_dim:>6}{('x' + str(multiplier)) if multiplier else '-':>9}"
+                    f"{hits / (len(queries) * args.k):>9.3f}{nbytes['search'] / len(corpus):>10.0f}"
+                    f"{(nbytes['search'] + nbytes['rescore']) / len(corpus):>11.0f}"
+                    f"{per_query_ms:>10.2f}"
+                )
+
+
+if __name__ == "__main__":
+    main()
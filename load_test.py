@@ -0,0 +1,131 @@
+"""
+Concurrent load test for the upload and chat endpoints.
+
+Drives /api/v1/process-image and /api/v1/chat at the same time and reports
+throughput and latency percentiles per endpoint. Pair it with
+stub_llm_server.py (LLM_STUB_URL) to benchmark without provider quota.
+
+Note: /process-image hands parsing to a background task, so its latency covers
+upload handling only; parser throughput shows up in the app logs and in how
+quickly chat answers start to reflect the new documents.
+
+Usage:
+    python load_test.py --base-url http://localhost:8000 --duration 60 \\
+        --upload-concurrency 4 --chat-concurrency 8 --image media/Receipt_1.png
+"""
+
+import argparse
+import asyncio
+import mimetypes
+import os
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List
+
+import httpx
+
+CHAT_QUERIES = [
+    "How much did I spend in total this month?",
+    "List my most recent invoices.",
+    "Which vendor did I pay the most?",
+    "Summarize my bank statement transactions.",
+]
+
+
+class Results:
+    """Latencies and status codes collected per endpoint."""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.statuses: Dict[str, Counter] = defaultdict(Counter)
+
+    def record(self, endpoint: str, status: str, seconds: float):
+        self.statuses[endpoint][status] += 1
+        if status.startswith("2"):
+            self.latencies[endpoint].append(seconds)
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+async def upload_worker(client: httpx.AsyncClient, image: str, results: Results, stop_at: float):
+    with open(image, "rb") as f:
+        content = f.read()
+    filename = os.path.basename(image)
+    content_type = mimetypes.guess_type(image)[0] or "application/octet-stream"
+
+    while time.monotonic() < stop_at:
+        started = time.monotonic()
+        try:
+            resp = await client.post("/api/v1/process-image", files={"file": (filename, content, content_type)})
+            status = str(resp.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        results.record("process-image", status, time.monotonic() - started)
+
+
+async def chat_worker(client: httpx.AsyncClient, worker_id: int, results: Results, stop_at: float):
+    i = worker_id
+    while time.monotonic() < stop_at:
+        started = time.monotonic()
+        try:
+            resp = await client.post("/api/v1/chat", json={"query": CHAT_QUERIES[i % len(CHAT_QUERIES)]})
+            status = str(resp.status_code)
+        except httpx.HTTPError as e:
+            status = type(e).__name__
+        results.record("chat", status, time.monotonic() - started)
+        i += 1
+
+
+def report(results: Results, elapsed: float):
+    print(f"\nDuration: {elapsed:.1f}s")
+    print(f"{'endpoint':<15}{'ok':>6}{'err':>6}{'req/s':>8}{'p50':>9}{'p90':>9}{'p99':>9}{'max':>9}")
+    for endpoint in sorted(results.statuses):
+        statuses = results.statuses[endpoint]
+        ok = sum(n for s, n in statuses.items() if s.startswith("2"))
+        errors = sum(statuses.values()) - ok
+        samples = results.latencies[endpoint]
+        if samples:
+            p50, p90, p99 = (percentile(samples, p) for p in (50, 90, 99))
+            latency = f"{p50:>8.2f}s{p90:>8.2f}s{p99:>8.2f}s{max(samples):>8.2f}s"
+        else:
+            latency = f"{'-':>9}" * 4
+        print(f"{endpoint:<15}{ok:>6}{errors:>6}{ok / elapsed:>8.2f}{latency}")
+        failed = {s: n for s, n in statuses.items() if not s.startswith("2")}
+        if failed:
+            print(f"{'':<15}errors: {dict(failed)}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Concurrent upload + chat load test")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run")
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--chat-concurrency", type=int, default=8)
+    parser.add_argument("--image", default=os.path.join("media", "Receipt_1.png"))
+    parser.add_argument("--token", default=os.getenv("LOAD_TEST_TOKEN"), help="bearer token, if auth is enabled")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    args = parser.parse_args()
+
+    headers = {"Authorization": f"Bearer {args.token}"} if args.token else {}
+    limits = httpx.Limits(max_connections=args.upload_concurrency + args.chat_concurrency)
+    results = Results()
+
+    async with httpx.AsyncClient(base_url=args.base_url, headers=headers, timeout=args.timeout, limits=limits) as client:
+        print(f"Running {args.upload_concurrency} upload + {args.chat_concurrency} chat workers "
+              f"against {args.base_url} for {args.duration:.0f}s")
+        started = time.monotonic()
+        stop_at = started + args.duration
+        workers = [upload_worker(client, args.image, results, stop_at) for _ in range(args.upload_concurrency)]
+        workers += [chat_worker(client, i, results, stop_at) for i in range(args.chat_concurrency)]
+        await asyncio.gather(*workers)
+        elapsed = time.monotonic() - started
+
+    report(results, elapsed)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
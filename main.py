@@ -8,6 +8,8 @@ from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.logger import setup_logging
 from app.config.config import config
+from app.infrastructure.embeddings.embedding_service import start_embedding_service, close_embedding_service
+from app.infrastructure.vector_db.supabase_vector_service import close_supabase_vector_service
 
 from app.presentation.api.v1.upload_routes import router as upload_router
 from app.presentation.api.v1.csv_routes import router as csv_router
@@ -18,6 +20,7 @@ from app.presentation.api.v1.company_delete import router as company_router
 from app.presentation.api.v1.privacy_policy import router as privacy_policy_router
 from app.presentation.api.v1.terms_and_conditions import router as terms_and_conditions_router
 from app.presentation.api.v1.groq_routes import router as groq_router
+from app.presentation.api.v1.admin_routes import router as admin_router
 
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -40,11 +43,14 @@ async def lifespan(app: FastAPI):
     # Startup Logic
     # run_preflight_checks()
     logger.info("Receipt AI System starting up")
+    await start_embedding_service()
     
     yield
     
     # Shutdown Logic
     logger.info("Receipt AI System shutting down")
+    await close_embedding_service()
+    await close_supabase_vector_service()
 
 def create_app() -> FastAPI:
     """Factory to create and configure the FastAPI application."""
@@ -72,6 +78,7 @@ def create_app() -> FastAPI:
     app.include_router(privacy_policy_router)
     app.include_router(terms_and_conditions_router)
     app.include_router(groq_router)
+    app.include_router(admin_router)
 
     app.mount("/media", StaticFiles(directory="media"), name="media")
     app.mount("/static", StaticFiles(directory="static", html=True), name="static")
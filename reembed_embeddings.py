@@ -0,0 +1,98 @@
+"""
+Rebuild the vector table after changing the embedding model or dimension.
+
+Re-embeds every row of `embeddings` into `embeddings_<version>` with the
+currently configured backend (EMBEDDING_BACKEND / EMBEDDING_SERVER_URL),
+checkpointing progress; re-running the same command resumes. With --switch
+the new table replaces the live one atomically once it has caught up, and
+the version and model are recorded in `embedding_config`; app instances on a
+different model (or a different EMBEDDING_VERSION, if set) then refuse to
+write or search until they are redeployed with the new configuration.
+
+Usage:
+    python reembed_embeddings.py --version v2 --dimension 512
+    python reembed_embeddings.py --version v2 --dimension 512 --switch \\
+        --switch-sql match_embeddings_512.sql
+    python reembed_embeddings.py --version v2 --status
+    (connects with DATABASE_URL, or --dsn)
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.infrastructure.embeddings.embedding_service import EMBEDDING_DIMENSION, EmbeddingService
+from app.infrastructure.embeddings.quantization import EMBEDDING_STORAGE_DIMENSION
+from app.infrastructure.vector_db.pg_vector_repository import PgVectorRepository
+from app.use_cases.rag.reembedding_job import (
+    REEMBED_BATCH_SIZE,
+    REEMBED_CHECKPOINT_DIR,
+    REEMBED_CONCURRENCY,
+    ReembeddingCheckpoint,
+    ReembeddingJob,
+)
+
+
+async def run(args):
+    if args.status:
+        checkpoint = ReembeddingCheckpoint.load(os.path.join(args.checkpoint_dir, f"{args.version}.json"))
+        print(json.dumps(checkpoint.__dict__ if checkpoint else {"version": args.version, "started": False}, indent=2))
+        return
+
+    dsn = args.dsn or os.getenv("DATABASE_URL", "")
+    if not dsn:
+        raise SystemExit("Set DATABASE_URL or pass --dsn")
+    switch_sql = None
+    if args.switch_sql:
+        with open(args.switch_sql, "r", encoding="utf-8") as f:
+            switch_sql = f.read()
+
+    service = EmbeddingService(dimension=args.dimension)
+    repository = await PgVectorRepository.create(dsn, min_size=1, max_size=args.concurrency + 1)
+    try:
+        job = ReembeddingJob(
+            repository.pool,
+            service,
+            args.version,
+            storage_dimension=args.storage_dimension or None,
+            batch_size=args.batch_size,
+            concurrency=args.concurrency,
+            checkpoint_dir=args.checkpoint_dir,
+        )
+        await job.run(switch=args.switch, switch_sql=switch_sql)
+        print(json.dumps(job.status(), indent=2))
+        print(f"Embedding metrics: {json.dumps(service.metrics.snapshot()['latency_s']['total'])}")
+    finally:
+        await repository.pool.close()
+        await service.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable re-embedding of the vector table")
+    parser.add_argument("--version", required=True, help="suffix of the new table, e.g. v2 -> embeddings_v2")
+    parser.add_argument("--dimension", type=int, default=EMBEDDING_DIMENSION, help="dimension requested from the model")
+    parser.add_argument(
+        "--storage-dimension", type=int, default=EMBEDDING_STORAGE_DIMENSION,
+        help="dimension stored in the new table (0 = --dimension)",
+    )
+    parser.add_argument("--batch-size", type=int, default=REEMBED_BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=REEMBED_CONCURRENCY)
+    parser.add_argument("--checkpoint-dir", default=REEMBED_CHECKPOINT_DIR)
+    parser.add_argument("--switch", action="store_true", help="switch reads to the new table when done")
+    parser.add_argument("--switch-sql", help="SQL file run in the switch transaction (e.g. new match_embeddings)")
+    parser.add_argument("--status", action="store_true", help="print the checkpoint and exit")
+    parser.add_argument("--dsn", help="Postgres DSN (default DATABASE_URL)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
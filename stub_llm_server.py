@@ -0,0 +1,194 @@
+"""
+Local stand-in for the Groq / OpenAI-compatible chat completions API.
+
+Lets the upload and chat pipelines be benchmarked without spending provider
+quota. Point the app at it with:
+
+    LLM_STUB_URL=http://localhost:9100
+
+Both LLMModelFactory (parser) and LLMFactory (RAG) then talk to this server
+through ChatGroq, with their usual rate limiters still in front.
+
+Usage:
+    python stub_llm_server.py --port 9100 --latency-median-ms 800 --latency-sigma 0.5 --error-rate 0.05
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CANNED_DOCUMENT = {
+    "document_type": "receipt",
+    "total_amount": 42.5,
+    "date": "2025-01-15",
+    "vendor_name": "Stub Coffee Co",
+    "items": [
+        {"description": "Flat white", "quantity": 2, "price": 4.25, "total": 8.5},
+        {"description": "Bagel", "quantity": 1, "price": 34.0, "total": 34.0},
+    ],
+}
+
+CANNED_CHAT = (
+    "Based on your documents, total spending this month is 42.50 across 1 receipt. "
+    "**Relevant Document Insights:**\n- **Stub Coffee Co**: 42.50 on 15 Jan 2025"
+)
+
+
+class StubSettings:
+    """Runtime behaviour of the stub, set from the command line."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.latency_median = args.latency_median_ms / 1000.0
+        self.latency_sigma = args.latency_sigma
+        self.error_rate = args.error_rate
+        self.retry_after = args.retry_after
+        self.stream_chunks = args.stream_chunks
+        self.document = CANNED_DOCUMENT
+        self.chat = CANNED_CHAT
+        if args.responses:
+            with open(args.responses) as f:
+                canned = json.load(f)
+            self.document = canned.get("document", self.document)
+            self.chat = canned.get("chat", self.chat)
+
+    def sample_latency(self) -> float:
+        """Log-normal latency around the configured median."""
+        if self.latency_median <= 0:
+            return 0.0
+        return random.lognormvariate(math.log(self.latency_median), self.latency_sigma)
+
+
+def _completion_text(settings: StubSettings, messages: List[Dict[str, Any]]) -> str:
+    """Picks a canned answer that matches the kind of prompt received."""
+    system = " ".join(m.get("content") or "" for m in messages if m.get("role") == "system")
+    user = " ".join(m.get("content") or "" for m in messages if m.get("role") == "user")
+
+    if "document analysis assistant" not in system:
+        return settings.chat
+    if "BATCH MODE" in system:
+        count = len(re.findall(r"<<<DOCUMENT \d+>>>", user)) or 1
+        return json.dumps({"documents": [{"doc_index": i, **settings.document} for i in range(1, count + 1)]})
+    return json.dumps(settings.document)
+
+
+def _usage(messages: List[Dict[str, Any]], text: str) -> Dict[str, int]:
+    prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+    completion_tokens = len(text) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def create_app(settings: StubSettings) -> FastAPI:
+    app = FastAPI(title="Stub LLM Server")
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.post("/openai/v1/chat/completions")
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        model = body.get("model", "stub-model")
+
+        if random.random() < settings.error_rate:
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": str(settings.retry_after)},
+                content={"error": {
+                    "message": f"Rate limit reached for model {model}. Please try again in {settings.retry_after}s.",
+                    "type": "requests",
+                    "code": "rate_limit_exceeded",
+                }},
+            )
+
+        text = _completion_text(settings, messages)
+        latency = settings.sample_latency()
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if body.get("stream"):
+            return StreamingResponse(
+                _stream(settings, text, latency, completion_id, created, model),
+                media_type="text/event-stream",
+            )
+
+        await asyncio.sleep(latency)
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": created,
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": _usage(messages, text),
+        }
+
+    return app
+
+
+async def _stream(settings: StubSettings, text: str, latency: float, completion_id: str, created: int, model: str):
+    """Server-sent events: first token after ~30% of the latency, the rest spread evenly."""
+    pieces = [text[i:i + max(1, len(text) // settings.stream_chunks)] for i in range(0, len(text), max(1, len(text) // settings.stream_chunks))]
+    await asyncio.sleep(latency * 0.3)
+    per_chunk = (latency * 0.7) / max(1, len(pieces))
+
+    def event(delta: Dict[str, Any], finish: Optional[str] = None) -> str:
+        chunk = {
+            "id": completion_id,
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+        }
+        return f"data: {json.dumps(chunk)}\n\n"
+
+    yield event({"role": "assistant", "content": ""})
+    for piece in pieces:
+        yield event({"content": piece})
+        await asyncio.sleep(per_chunk)
+    yield event({}, finish="stop")
+    yield "data: [DONE]\n\n"
+
+
+def positive_int(value: str) -> int:
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-median-ms", type=float, default=800.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="log-normal sigma; 0 gives a fixed latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--retry-after", type=int, default=2, help="retry-after seconds sent with 429s")
+    parser.add_argument("--stream-chunks", type=positive_int, default=20)
+    parser.add_argument("--responses", help='JSON file with optional "document" and "chat" canned answers')
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(StubSettings(args)), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()